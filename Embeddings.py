@@ -1,84 +1,242 @@
 import time
 import os
+import threading
 from langchain.vectorstores import Chroma
 from langchain.embeddings import HuggingFaceEmbeddings
 from langchain.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from embedding_cache import EmbeddingCache, file_hash
+from source_registry import SourceRegistry
+
+# watchdog nutzt unter Linux inotify; ohne das Paket wird der Ordner weiterhin abgefragt
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
 
 path = "pdf_files"
 chroma = "chroma_db"
-embedding = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-vectorstore = Chroma(persist_directory=chroma, embedding_function=embedding)
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+# Ruhezeit nach dem letzten Datei-Event, bevor die gesammelten Änderungen übernommen werden
+DEBOUNCE_SECONDS = 2.0
+# Spätestens nach dieser Zeit wird auch bei andauernden Events synchronisiert
+MAX_DELAY_SECONDS = 30.0
+# Abfrageintervall ohne watchdog
+POLL_INTERVAL = 10
+# Vollständiger Abgleich auch mit watchdog (falls Events verloren gehen, z. B. Überlauf der inotify-Queue)
+RESCAN_INTERVAL = 600
+# Chunks pro add_documents-Aufruf
+ADD_BATCH_SIZE = 256
 
-already_processed = set()
 
-if not os.path.exists(path):
-    os.makedirs(path)
-    print(f"Ordner /'{path}' wurde erstellt.")
+class PendingPaths:
+    """Sammelt geänderte Pfade und gibt sie erst nach einer Ruhephase gebündelt heraus.
 
-documents = []
-try:
-    while True:
-        print("Suche nach Änderungen...")
-        
-        # Schleife über vorhandene Dateien
-        for pdf_file in os.listdir(path):
-            if pdf_file.endswith(".pdf"):
-                pdf_path = os.path.join(path, pdf_file)
-                
-                # Prüfen, ob diese Datei neu ist
-                if pdf_path not in already_processed:
-                    print(f"Verarbeite neue Datei: {pdf_path}")
-                    
-                    loader = PyPDFLoader(pdf_path)
-                    pages = loader.load()
-                    
-                    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-                    chunks = text_splitter.split_documents(pages)
-                    # chunk ist ein Document-Objekt mit den Attributen: chunk.page_content (Textinhalt) // chunk.metadata (eine Dictionary mit Metadaten) 
-                    # chunk in LangChain in der Regel ein Objekt vom Typ Document ist und kein verschachteltes Dictionary, chunk["metadata"]["id"] ist nicht erlaubt
-                    # for chunk in chunks:                    
-                    #     chunk.metadata["id"]= 1
-                    #     print(chunk)
-                    documents.extend(chunks)
-                    already_processed.add(pdf_path)
-        
-        # Wenn neue Dokumente gefunden wurden, Chroma aktualisieren
-        if documents:
-            print("Aktualisiere Chroma-Datenbank...")
-            vectorstore.add_documents(documents)
-            vectorstore.persist()
-            
-            # Leere die Liste, damit nur **neue** Chunks beim nächsten Durchgang hinzukommen
-            documents = []
-            print(vectorstore.get())
-        
-        current_pdfs_on_disk = set()
-        for pdf_file in os.listdir(path):
-            if pdf_file.endswith(".pdf"):
-                pdf_path = os.path.join(path, pdf_file)
-                current_pdfs_on_disk.add(pdf_path)
-
-        deleted_pdfs = already_processed - current_pdfs_on_disk
-        if deleted_pdfs:
-            print("Folgende Dateien gelten als gelöscht und werden aus der Datenbank entfernt:")
-            for deleted_file in deleted_pdfs:
-                print(deleted_file)
-
-            # Für jede gelöschte Datei die Einträge in Chroma löschen
-            for deleted_file in deleted_pdfs:
-                # Hier löschen wir nach dem Metadatum "source", 
-                # das beim Erstellen der Chunks als PDF-Pfad gesetzt wurde
-                vectorstore.delete(where={"source": deleted_file})
-
-                # Optional: Aus dem Set entfernen, damit wir es nicht nochmal löschen
-                already_processed.remove(deleted_file)
-
-            vectorstore.persist()
-            print(vectorstore.get())
-        else:
-            print("Keine gelöschten PDF-Dateien gefunden.")
-        print("Keine neuen PDFs gefunden. Warte 10 Sekunden...")
-        time.sleep(10) 
-except KeyboardInterrupt:
-    print("Skript wird beendet...")
\ No newline at end of file
+    Beim Kopieren vieler Dateien kommen pro Datei mehrere Events (create, modify, close); sie werden
+    zusammengefasst, bis `debounce` Sekunden lang nichts passiert oder `max_delay` erreicht ist.
+    """
+
+    def __init__(self, debounce=DEBOUNCE_SECONDS, max_delay=MAX_DELAY_SECONDS):
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._paths = set()
+        self._first = None
+        self._last = None
+        self._cond = threading.Condition()
+
+    def add(self, pdf_path):
+        with self._cond:
+            now = time.monotonic()
+            self._paths.add(pdf_path)
+            self._first = self._first or now
+            self._last = now
+            self._cond.notify()
+
+    def wait(self, timeout):
+        """Gibt die gesammelten Pfade zurück, sobald sie reif sind, sonst nach `timeout` eine leere Menge."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if self._paths and (now - self._last >= self.debounce or now - self._first >= self.max_delay):
+                    paths, self._paths, self._first, self._last = self._paths, set(), None, None
+                    return paths
+                if now >= deadline:
+                    return set()
+                wait_for = deadline - now
+                if self._paths:
+                    wait_for = min(wait_for, self.debounce - (now - self._last), self.max_delay - (now - self._first))
+                self._cond.wait(max(wait_for, 0.01))
+
+
+class PdfEventHandler(FileSystemEventHandler):
+    """Leitet Events zu PDFs (anlegen, ändern, löschen, umbenennen) an `PendingPaths` weiter."""
+
+    def __init__(self, folder, pending):
+        self.folder = folder
+        self.pending = pending
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        for event_path in (event.src_path, getattr(event, "dest_path", "")):
+            if event_path and str(event_path).endswith(".pdf"):
+                self.pending.add(os.path.join(self.folder, os.path.basename(event_path)))
+
+
+class FolderSync:
+    """Hält Chroma inkrementell synchron mit einem PDF-Ordner.
+
+    Das Quellenverzeichnis dient als persistentes Manifest (Pfad, Größe, Änderungszeit, Hash ->
+    Chunk-IDs). Eine Datei wird nur gehasht, wenn sich Größe oder Änderungszeit geändert haben,
+    und nur neu eingebettet, wenn sich der Inhalt geändert hat. Ein Neustart kostet damit nur ein
+    `stat` pro Datei.
+    """
+
+    def __init__(self, folder, vectorstore, embedding_cache, source_registry):
+        self.folder = folder
+        self.vectorstore = vectorstore
+        self.embedding_cache = embedding_cache
+        self.source_registry = source_registry
+
+    def scan(self):
+        """Vergleicht den Ordner mit dem Manifest, gibt die neuen, geänderten und gelöschten Pfade zurück."""
+        changed = set()
+        on_disk = set()
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".pdf") or not entry.is_file():
+                    continue
+                pdf_path = os.path.join(self.folder, entry.name)
+                on_disk.add(pdf_path)
+                if self._stat_changed(pdf_path, entry.stat()):
+                    changed.add(pdf_path)
+        known = {source for source in self.source_registry.sources() if os.path.dirname(source) == self.folder}
+        return changed | (known - on_disk)
+
+    def _stat_changed(self, pdf_path, stat):
+        known = self.source_registry.get(pdf_path)
+        return known is None or known["bytes"] != stat.st_size or known.get("mtime_ns") != stat.st_mtime_ns
+
+    def _load_chunks(self, pdf_path, content_hash):
+        chunks = self.embedding_cache.load_chunks(content_hash, pdf_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        if chunks is not None:
+            print(f"{len(chunks)} Chunks von {pdf_path} aus dem Cache übernommen.")
+            return chunks
+        pages = PyPDFLoader(pdf_path).load()
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, add_start_index=True)
+        chunks = text_splitter.split_documents(pages)
+        self.embedding_cache.store_chunks(content_hash, chunks, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        return chunks
+
+    def apply(self, paths):
+        """Übernimmt Hinzufügen, Ändern und Löschen der Pfade gebündelt in Chroma."""
+        # Das Manifest wird einmal pro Abgleich geschrieben, nicht nach jeder Datei
+        with self.source_registry.batch():
+            self._apply(paths)
+
+    def _apply(self, paths):
+        removed = {}     # Pfad -> alte Chunk-IDs
+        added = {}       # Pfad -> (Chunks, Hash, Größe, Änderungszeit)
+        for pdf_path in sorted(paths):
+            known = self.source_registry.get(pdf_path)
+            try:
+                stat = os.stat(pdf_path)
+            except FileNotFoundError:
+                if known is not None:
+                    removed[pdf_path] = known["chunk_ids"]
+                continue
+            if not self._stat_changed(pdf_path, stat):
+                continue
+
+            try:
+                content_hash = file_hash(pdf_path)
+                if known is not None and known["content_hash"] in (content_hash, None):
+                    # Gleicher Inhalt (z. B. touch oder Kopie); Einträge aus der Zeit vor dem Manifest
+                    # (ohne Hash) werden einmalig übernommen statt neu eingebettet
+                    self.source_registry.update_file_info(pdf_path, stat.st_size, stat.st_mtime_ns, content_hash)
+                    continue
+                chunks = self._load_chunks(pdf_path, content_hash)
+            except Exception as e:
+                # Z. B. eine noch nicht fertig kopierte Datei: das nächste Event versucht es erneut
+                print(f"Datei {pdf_path} konnte nicht verarbeitet werden: {str(e)}")
+                continue
+            if known is not None:
+                removed[pdf_path] = known["chunk_ids"]
+            added[pdf_path] = (chunks, content_hash, stat.st_size, stat.st_mtime_ns)
+
+        if removed:
+            chunk_ids = [chunk_id for ids in removed.values() for chunk_id in ids]
+            if chunk_ids:
+                self.vectorstore.delete(ids=chunk_ids)
+            for pdf_path in removed:
+                self.source_registry.remove(pdf_path)
+            gone = [pdf_path for pdf_path in removed if pdf_path not in added]
+            if gone:
+                print(f"{len(gone)} gelöschte Dateien aus der Datenbank entfernt: {', '.join(gone)}")
+
+        if added:
+            documents = [chunk for chunks, _, _, _ in added.values() for chunk in chunks]
+            print(f"Aktualisiere Chroma-Datenbank: {len(added)} Dateien, {len(documents)} Chunks...")
+            chunk_ids = []
+            for start in range(0, len(documents), ADD_BATCH_SIZE):
+                chunk_ids.extend(self.vectorstore.add_documents(documents[start:start + ADD_BATCH_SIZE]))
+            ids_per_source = {}
+            for chunk_id, doc in zip(chunk_ids, documents):
+                ids_per_source.setdefault(doc.metadata["source"], []).append(chunk_id)
+            for pdf_path, (_, content_hash, num_bytes, mtime_ns) in added.items():
+                self.source_registry.add(pdf_path, ids_per_source.get(pdf_path, []), num_bytes=num_bytes, content_hash=content_hash, mtime_ns=mtime_ns)
+
+        if removed or added:
+            self.vectorstore.persist()
+            print(self.source_registry.summary())
+
+    def run(self):
+        start_time = time.time()
+        self.apply(self.scan())
+        print(f"Abgleich beim Start in {time.time() - start_time:.2f}s ({self.source_registry.summary()})")
+
+        if Observer is None:
+            print(f"watchdog ist nicht installiert, der Ordner wird alle {POLL_INTERVAL} Sekunden geprüft.")
+            while True:
+                time.sleep(POLL_INTERVAL)
+                self.apply(self.scan())
+
+        pending = PendingPaths()
+        observer = Observer()
+        observer.schedule(PdfEventHandler(self.folder, pending), self.folder, recursive=False)
+        observer.start()
+        print(f"Beobachte /'{self.folder}' auf Änderungen...")
+        last_scan = time.monotonic()
+        try:
+            while True:
+                paths = pending.wait(timeout=1.0)
+                if time.monotonic() - last_scan >= RESCAN_INTERVAL:
+                    paths |= self.scan()
+                    last_scan = time.monotonic()
+                if paths:
+                    self.apply(paths)
+        finally:
+            observer.stop()
+            observer.join()
+
+
+if __name__ == "__main__":
+    if not os.path.exists(path):
+        os.makedirs(path)
+        print(f"Ordner /'{path}' wurde erstellt.")
+
+    embedding = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+    # Gleicher Cache wie im Server: bereits berechnete Chunk-Vektoren werden wiederverwendet
+    embedding_cache = EmbeddingCache("embedding_cache", embedding, namespace="all-MiniLM-L6-v2")
+    vectorstore = Chroma(persist_directory=chroma, embedding_function=embedding_cache.embeddings)
+    source_registry = SourceRegistry(os.path.join(chroma, "source_registry_langchain.json"))
+    source_registry.bootstrap(vectorstore)
+
+    try:
+        FolderSync(path, vectorstore, embedding_cache, source_registry).run()
+    except KeyboardInterrupt:
+        print("Skript wird beendet...")
@@ -1,8 +1,109 @@
 import os
+import re
+import time
+import logging
+from pypdf import PdfReader
 from langchain_core.documents import Document
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
+# Felder des Anmeldeformulars (gleiches Schema wie die LLM-Extraktion)
+FORM_FIELDS = ["Thema", "Student", "Matrikelnummer", "E-Mail", "HS-Betreuer", "Externer Betreuer"]
+# Ohne diese Felder wird für die Datei weiterhin das Modell gefragt
+REQUIRED_FORM_FIELDS = ["Thema", "Student", "Matrikelnummer", "E-Mail", "HS-Betreuer"]
+# Erhöhen, wenn sich die Erkennung ändert (macht gespeicherte Ergebnisse ungültig)
+FORM_FIELDS_VERSION = 2
+
+# Reihenfolge ist wichtig: "E-Mail HS-Betreuer" ist keine Studenten-E-Mail, "Name des Betreuers" kein Student
+_LABEL_RULES = [
+    (("matrikel", "matrnr", "matnr"), (), "Matrikelnummer"),
+    (("mail",), ("betreu", "prüf", "pruef", "supervisor"), "E-Mail"),
+    (("mail", "telefon", "datum", "unterschrift"), (), None),
+    (("extern",), (), "Externer Betreuer"),
+    (("betreu", "erstprüf", "erstpruef", "supervisor", "prüfer", "pruefer"), (), "HS-Betreuer"),
+    (("thema", "titel", "topic", "title"), (), "Thema"),
+    (("vorname", "firstname"), (), "Vorname"),
+    (("nachname", "familienname", "lastname"), (), "Nachname"),
+    (("student", "studierend", "name"), (), "Student"),
+]
+_VALIDATORS = {
+    "Matrikelnummer": re.compile(r"^\d{5,9}$"),
+    "E-Mail": re.compile(r"^[^@\s]+@[^@\s]+\.[A-Za-z]{2,}$"),
+}
+# "Label: Wert" bzw. im Layout-Modus "Label    Wert" (mindestens zwei Leerzeichen)
+_LABEL_LINE = re.compile(r"^\s*([^:]{2,60}?)\s*(?::|\s{2,})\s*(.*?)\s*$")
+
+
+def _normalize_label(label):
+    return re.sub(r"[^a-z0-9äöüß]", "", label.lower())
+
+
+def _combined_name_label(normalized):
+    """Erkennt kombinierte Labels wie "Name, Vorname": True, wenn der Nachname zuerst steht, False bei "Vorname Name", sonst None."""
+    for keyword in ("vorname", "firstname"):
+        position = normalized.find(keyword)
+        if position >= 0:
+            rest = normalized[:position] + normalized[position + len(keyword):]
+            if "name" in rest:
+                return rest.find("name") < position
+    return None
+
+
+def match_form_label(label):
+    """Ordnet eine Feldbezeichnung (AcroForm-Name oder Text-Label) einem Schemafeld zu, sonst None."""
+    normalized = _normalize_label(label)
+    if not normalized or len(normalized) > 40:
+        return None
+    for keywords, excluded, field in _LABEL_RULES:
+        if any(keyword in normalized for keyword in keywords) and not any(word in normalized for word in excluded):
+            # "Name, Vorname" bzw. "Nachname, Vorname" enthält den vollständigen Namen
+            if field == "Vorname" and _combined_name_label(normalized) is not None:
+                return "Student"
+            return field
+    return None
+
+
+def _collect(pairs):
+    """Übernimmt (Label, Wert)-Paare ins Schema: erster gültiger Wert je Feld, Vor- und Nachname werden zusammengesetzt."""
+    fields = {}
+    for label, value in pairs:
+        field = match_form_label(label)
+        value = " ".join(str(value or "").split())
+        if field is None or not value or field in fields:
+            continue
+        if field == "Student" and value.count(",") == 1 and _combined_name_label(_normalize_label(label)):
+            # "Müller, Anna" -> "Anna Müller", wie beim Zusammensetzen aus Vor- und Nachname
+            last, first = value.split(",")
+            value = f"{first.strip()} {last.strip()}".strip()
+        validator = _VALIDATORS.get(field)
+        if validator is not None:
+            value = value.replace(" ", "") if field == "Matrikelnummer" else value
+            if not validator.match(value):
+                continue
+        fields[field] = value
+    first, last = fields.pop("Vorname", None), fields.pop("Nachname", None)
+    if "Student" not in fields and first and last:
+        fields["Student"] = f"{first} {last}"
+    return fields
+
+
+def _label_pairs(text):
+    """Findet "Label: Wert"-Zeilen; steht der Wert in der nächsten Zeile, wird diese genommen."""
+    # Im Layout-Modus stehen oft mehrere Felder in einer Zeile ("Student: ...    Matrikelnummer: ...")
+    lines = [
+        segment for line in text.splitlines()
+        for segment in re.split(r"\s{2,}(?=[^\s:][^:]{0,58}:)", line) if segment.strip()
+    ]
+    for i, line in enumerate(lines):
+        match = _LABEL_LINE.match(line)
+        if match is None:
+            continue
+        label, value = match.groups()
+        if not value and i + 1 < len(lines) and not _LABEL_LINE.match(lines[i + 1]):
+            value = lines[i + 1].strip()
+        yield label, value
+
+
 class PDFProcessor:
     def __init__(self, upload_folder: str):
         self.upload_folder = upload_folder
@@ -13,16 +114,59 @@ class PDFProcessor:
         return filepath
 
     def extract_text_chunks(self, filepath: str, chunk_size=200, chunk_overlap=50):
+        chunks = list(self.iter_text_chunks(filepath, chunk_size, chunk_overlap))
+        if not chunks:
+            return None
+
+        return chunks
+
+    def iter_text_chunks(self, filepath: str, chunk_size=200, chunk_overlap=50):
+        """Liest die PDF Seite für Seite und liefert die Chunks jeder Seite, sobald sie gesplittet ist.
+
+        Es liegt immer nur eine Seite im Speicher, die Chunks sind identisch mit `extract_text_chunks`.
+        """
         loader = PyPDFLoader(filepath)
-        pages = loader.load()  
 
         text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap
+            chunk_overlap=chunk_overlap,
+            # Position im Seitentext, damit überlappende Treffer beim Kontextaufbau zusammengefügt werden können
+            add_start_index=True
         )
 
-        chunks = text_splitter.split_documents(pages)
-        if not chunks:
-            return None
+        for page in loader.lazy_load():
+            yield from text_splitter.split_documents([page])
+
+    def iter_chunk_batches(self, filepath: str, batch_size=64, chunk_size=200, chunk_overlap=50):
+        """Fasst die gestreamten Chunks zu Batches von höchstens `batch_size` Chunks zusammen (z. B. für das Embedding)."""
+        batch = []
+        for chunk in self.iter_text_chunks(filepath, chunk_size, chunk_overlap):
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def extract_form_fields(self, filepath: str, max_pages=2):
+        """Schneller Weg ohne Modell: liest die Felder des Anmeldeformulars direkt aus der PDF.
 
-        return chunks
\ No newline at end of file
+        Zuerst die Werte ausgefüllter AcroForm-Felder, danach beschriftete Bereiche des Seitentexts
+        ("Thema: ...") der ersten `max_pages` Seiten. Rückgabe: nur die sicher erkannten Felder
+        (gleiche Schlüssel wie die LLM-Extraktion), bei nicht lesbaren Dateien ein leeres Dict.
+        """
+        start_time = time.perf_counter()
+        try:
+            reader = PdfReader(filepath)
+            fields = _collect((reader.get_form_text_fields() or {}).items())
+            for page in reader.pages[:max_pages]:
+                if all(field in fields for field in REQUIRED_FORM_FIELDS):
+                    break
+                text = page.extract_text(extraction_mode="layout") or ""
+                for field, value in _collect(_label_pairs(text)).items():
+                    fields.setdefault(field, value)
+        except Exception as e:
+            logging.warning(f"Formularfelder von {filepath} konnten nicht gelesen werden: {str(e)}")
+            return {}
+        logging.info(f"{len(fields)} Formularfelder aus {os.path.basename(filepath)} in {(time.perf_counter() - start_time) * 1000:.1f}ms gelesen")
+        return fields
@@ -1,59 +1,223 @@
-from flask import Flask, request, jsonify, send_from_directory
+import os
+# Greenlet-basierter Betrieb (eventlet/gevent) für viele gleichzeitige Streams: die Standardbibliothek
+# muss vor allen anderen Imports gepatcht werden. Standard bleibt der Threading-Modus.
+ASYNC_MODE = os.getenv("SOCKETIO_ASYNC_MODE", "threading")
+if ASYNC_MODE == "eventlet":
+    import eventlet
+    eventlet.monkey_patch()
+elif ASYNC_MODE == "gevent":
+    from gevent import monkey
+    monkey.patch_all()
+
+import time
+_import_start = time.perf_counter()
+
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from flask_socketio import SocketIO
 from werkzeug.utils import secure_filename
-import requests
-import json
-import os 
-import time
-from extract_info_llm import save_model_response_to_json_output, extract_information_with_model
-from test_models import query_model, evaluate_response
+from extract_info_llm import save_model_response_to_json_output, extract_information_with_model, extract_information_per_source, EXTRACTION_PROMPT_VERSION
+from extraction_store import ExtractionStore
+from evaluation import run_evaluation_matrix
 import logging
 import sys
-import psutil 
 import platform
 import asyncio
-from collections import OrderedDict
-from PDFProce import PDFProcessor
+import threading
+import uuid
+from PDFProce import PDFProcessor, FORM_FIELDS, REQUIRED_FORM_FIELDS, FORM_FIELDS_VERSION
+from ingestion import parse_pdfs_parallel
+from embedding_cache import EmbeddingCache, file_hash
+from jobs import JobQueue
+from retrieval import top_k_per_source, hybrid_search
+from bm25_index import BM25Index
+from query_cache import LRUCache, CachedQueryEmbeddings
+from answer_cache import AnswerCache
+from streaming import run_blocking, BackpressureEmitter, TokenCoalescer
+from generations import GenerationRegistry
+from model_scheduler import scheduler as model_scheduler
+from ollama_client import ollama, OllamaTimeout, CHAT_MODELS, EXTRACTION_MODELS, TEST_MODELS, DEFAULT_MODEL
+from source_registry import SourceRegistry
+from hardware_sampler import sampler as hardware_sampler, format_usage
+import metrics
+from metrics import TimedEmbeddings
 from collections import defaultdict
+from context_packer import pack_context, token_counter
+from startup import report as startup_report, LazyResource
+
+startup_report.record("imports", time.perf_counter() - _import_start)
 
 # Flask-App erstellen
 app = Flask(__name__, static_folder='./frontend/dist', static_url_path=None)
 CORS(app, resources={r"/api/*": {"origins": ["http://localhost:5173", "http://127.0.0.1:5173"]}})
-socketio = SocketIO(app, cors_allowed_origins= ["http://localhost:5173", "http://127.0.0.1:5173", "http://localhost:5000"] )#,engineio_logger=True  # In der Entwicklungsumgebung (React auf Port 5173), handelt es sich um Cross-Origin-Anfragen. Deshalb muss das Flask-Backend CORS erlauben
-
-# Konfiguriere das Logging
-logging.basicConfig(
-    level=logging.INFO,  # Stellt sicher, dass alle Logs ab INFO-Niveau erfasst werden
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(sys.stdout),  # Ausgabe auf der Konsole
-        logging.FileHandler("app.log")      # Log-Datei zum Speichern der Logs
-    ]
-)
-# Setze den werkzeug-Logger, um sowohl INFO- als auch ERROR-Logs anzuzeigen
-log = logging.getLogger('werkzeug')
-log.setLevel(logging.INFO)  # Zeigt sowohl INFO- als auch ERROR-Logs an
+socketio = SocketIO(app, async_mode=ASYNC_MODE, cors_allowed_origins= ["http://localhost:5173", "http://127.0.0.1:5173", "http://localhost:5000"] )#,engineio_logger=True  # In der Entwicklungsumgebung (React auf Port 5173), handelt es sich um Cross-Origin-Anfragen. Deshalb muss das Flask-Backend CORS erlauben
 
 persist_directory = "chroma_db"
 
-# Embedding-Modell
-embedding_model = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+# PDFs ab dieser Größe werden seitenweise gestreamt und in Batches eingebettet
+STREAMING_MIN_BYTES = 5 * 1024 * 1024
+STREAMING_BATCH_SIZE = 64
+
+# Gültigkeit (Sekunden) und Mindestähnlichkeit für zwischengespeicherte Chat-Antworten
+ANSWER_CACHE_TTL = 3600
+ANSWER_CACHE_SIMILARITY = 0.95
+
+# Beim Streamen wird nach so vielen Events eine Bestätigung des Clients abgewartet (Backpressure)
+STREAM_ACK_WINDOW = 32
+STREAM_ACK_TIMEOUT = 5.0
+# Tokens werden gebündelt gesendet: spätestens alle 50 ms oder ab 64 Zeichen (pro Client änderbar)
+STREAM_FRAME_INTERVAL = 0.05
+STREAM_FRAME_MAX_CHARS = 64
+
+# Modelltest: gleichzeitige Anfragen pro Modell und gleichzeitige Bewertungen (OpenAI)
+TESTMODEL_CONCURRENCY_PER_MODEL = 1
+TESTMODEL_GRADING_CONCURRENCY = 4
+
+# Embedding-Modell und Chroma beim Start im Hintergrund laden (sonst bei der ersten Nutzung bzw. beim ersten /readyz)
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "1") != "0"
+
+# Formularfelder in /api/getjson direkt lesen (abschaltbar, z. B. um Suche und Modell im Benchmark zu messen);
+# pro Anfrage mit "form_fast_path": false überschreibbar
+FORM_FAST_PATH = os.getenv("FORM_FAST_PATH", "1") != "0"
+
+# Anzahl der Kandidaten pro Quelle und Teilanfrage für /api/getjson
+GETJSON_TOP_K = 10
+# Gleichzeitige Extraktionen im Fan-out-Modus von /api/getjson (eine pro Datei)
+GETJSON_MAX_PARALLEL = 2
 
-# Chroma-Datenbank laden
-vectorstore = Chroma(persist_directory=persist_directory, embedding_function=embedding_model, collection_name="vectorstore") 
+def load_embedding_model():
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+
+def open_vectorstore():
+    from langchain_community.vectorstores import Chroma
+    return Chroma(persist_directory=persist_directory, embedding_function=embedding_cache.embeddings, collection_name="vectorstore")
+
+# Embedding-Modell und Chroma werden erst bei der ersten Nutzung geladen (oder vorab im Warm-up),
+# der Server nimmt also sofort Anfragen an; die Modulvariablen bleiben über Proxys gleich nutzbar
+embedding_resource = LazyResource("embedding_model", load_embedding_model)
+embedding_model = embedding_resource.proxy()
+
+# Aufrufe des Modells (nur Cache-Misses) werden in /api/metrics erfasst
+timed_embedding_model = TimedEmbeddings(embedding_model, metrics.embedding_latency)
+
+# Persistenter Cache für Chunks und Embeddings (Schlüssel: Hash von Datei- bzw. Chunk-Inhalt)
+embedding_cache = EmbeddingCache("embedding_cache", timed_embedding_model, namespace="all-MiniLM-L6-v2")
+
+# Chroma-Datenbank, Embeddings laufen über den Cache
+vectorstore_resource = LazyResource("vectorstore", open_vectorstore)
+vectorstore = vectorstore_resource.proxy()
 # collection_metadata={"hnsw:space": "cosine"}
 
-# Ordner für Uploads erstellen
+# Verzeichnis der Quellen (source -> Chunk-IDs, Anzahl, Größe, Zeitpunkt, Hash), ersetzt vectorstore.get()-Abfragen
+# (Chroma wird dafür nur beim allerersten Start in start_services() geöffnet)
+source_registry = SourceRegistry(os.path.join(persist_directory, "source_registry.json"))
+
+# LRU-Caches für Anfrage-Embeddings und Suchergebnisse (query, source, k) -> Ergebnisse
+query_embedder = CachedQueryEmbeddings(timed_embedding_model, maxsize=1024)
+retrieval_cache = LRUCache(maxsize=256)
+
+# Cache für Chat-Antworten (Modell, Inhalts-Hash, Frage), ähnliche Fragen werden über Embeddings erkannt
+answer_cache = AnswerCache(embedder=query_embedder, ttl=ANSWER_CACHE_TTL, similarity_threshold=ANSWER_CACHE_SIMILARITY)
+
+def load_bm25_index():
+    index = BM25Index(os.path.join(persist_directory, "bm25_index.json"))
+    index.bootstrap(vectorstore)
+    return index
+
+# Invertierter Index (BM25) über den Chunk-Texten für die hybride Suche; Laden (und ggf. Kompaktieren)
+# schreibt auf die Platte und läuft daher erst in start_services() bzw. bei der ersten Suche
+bm25_resource = LazyResource("bm25_index", load_bm25_index)
+bm25_index = bm25_resource.proxy()
+
+# Extraktionsergebnisse pro Dokument (Inhalts-Hash, Modell, Prompt-Version) für inkrementelles getjson
+extraction_store = ExtractionStore(os.path.join(persist_directory, "extraction_store.json"))
+
+# Laufende Chat-Generierungen pro Socket-Session (für stop/disconnect)
+generations = GenerationRegistry()
+# Bündelungsfenster pro Socket-Session: sid -> (Intervall in s, max. Zeichen)
+stream_settings = {}
+
+# Hintergrund-Jobs für die Verarbeitung hochgeladener PDFs
+ingestion_jobs = JobQueue(socketio.start_background_task)
+
+# Ordner für Uploads (wird in start_services() erstellt)
 UPLOAD_FOLDER = os.path.join("uploads") 
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 
-logging.info("Server gestartet")
-logging.info(f"CPU-Modell: {platform.processor()}")
-logging.info(f"Aktuelle CPU-Auslastung:{psutil.cpu_percent(interval=1)}%")
+# Liest Formularfelder direkt aus den PDFs (schneller Weg vor der LLM-Extraktion)
+form_reader = PDFProcessor(upload_folder=UPLOAD_FOLDER)
+
+warmup_started = threading.Event()
+
+def warm_up():
+    """Lädt Chroma und das Embedding-Modell (inkl. erster Anfrage) im Hintergrund.
+
+    Schlägt etwas fehl (z. B. Chroma gesperrt, Download des Modells), wird `warmup_started`
+    zurückgesetzt, damit das nächste /readyz den Warm-up erneut startet.
+    """
+    try:
+        ready = vectorstore_resource.warm_up()
+        if embedding_resource.warm_up():
+            with startup_report.phase("embedding_first_query"):
+                embedding_model.embed_query("warm-up")
+        else:
+            ready = False
+    except Exception as e:
+        logging.error(f"Warm-up fehlgeschlagen: {str(e)}")
+        ready = False
+    if not ready:
+        warmup_started.clear()
+        logging.warning("Warm-up unvollständig, wird beim nächsten /readyz erneut versucht")
+        return
+    logging.info(f"Bereit für Suchanfragen nach {time.time() - startup_report.started:.2f}s")
+
+def start_warm_up():
+    if not warmup_started.is_set():
+        warmup_started.set()
+        socketio.start_background_task(warm_up)
+
+def start_services():
+    """Startet den Serverbetrieb: Logging, Verzeichnisse, BM25-Index, Sampler, Vorladen der Modelle, Warm-up.
+
+    Das Modul selbst hat beim Import keine Seiteneffekte, denn die Worker-Prozesse der Ingestion
+    (forkserver/spawn) importieren es erneut als `__mp_main__`. Aufruf genau einmal im Serverprozess.
+    """
+    # Konfiguriere das Logging
+    logging.basicConfig(
+        level=logging.INFO,  # Stellt sicher, dass alle Logs ab INFO-Niveau erfasst werden
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=[
+            logging.StreamHandler(sys.stdout),  # Ausgabe auf der Konsole
+            logging.FileHandler("app.log")      # Log-Datei zum Speichern der Logs
+        ]
+    )
+    # Setze den werkzeug-Logger, um sowohl INFO- als auch ERROR-Logs anzuzeigen
+    log = logging.getLogger('werkzeug')
+    log.setLevel(logging.INFO)  # Zeigt sowohl INFO- als auch ERROR-Logs an
+
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+    with startup_report.phase("source_registry"):
+        source_registry.bootstrap(vectorstore)
+    bm25_resource.get()
+    with startup_report.phase("extraction_store"):
+        extraction_store.prune(source_registry.content_hash(source) for source in source_registry.sources())
+
+    logging.info("Server gestartet")
+    logging.info(f"CPU-Modell: {platform.processor()}, {os.cpu_count()} Kerne")
+
+    # Ein gemeinsamer Sampler misst CPU/RAM (System, Server, Ollama) für alle Anfragen
+    # (die aktuelle Auslastung steht nach der ersten Messung in /api/hardware)
+    hardware_sampler.start(socketio.start_background_task)
+
+    # Häufig genutzte Modelle vorab laden, damit die erste Anfrage nicht auf das Laden wartet
+    socketio.start_background_task(model_scheduler.preload)
+
+    if STARTUP_WARMUP:
+        start_warm_up()
+
+startup_report.record("server_module", time.perf_counter() - _import_start)
 
 @app.route("/uploads/<filename>")
 def uploaded_file(filename):
@@ -79,10 +243,6 @@ def serve_frontend(path):
     with open(os.path.join(app.static_folder, 'index.html')) as file:
         return file.read(), 200, {'Content-Type': 'text/html'}
 
-documents = [] 
-already_processed = set() 
-file_urls = []
-lesen_error  = []
 # Situation	                            Verwendet
 # Datei-Upload (PDF, Bild)	            request.files
 # JSON-Daten (z. B. Text, Arrays)	    request.json
@@ -92,48 +252,290 @@ def handle_embedding():
     if "AllPdfs" not in request.files:
         logging.warning("Keine Datei hochgeladen")
         return jsonify({"error": "Keine Datei hochgeladen"}), 400
-    
-    file_urls.clear()
 
     files = request.files.getlist("AllPdfs")
-    # filenames = [file.filename for file in files]
-    
+    # Socket-ID des Clients, damit der Fortschritt nur an ihn gesendet wird. Ohne (gültige) ID, z. B. per curl
+    # oder vor dem Verbindungsaufbau ("undefined"), gibt es keine Events; der Status steht in /api/jobs/<job_id>
+    sid = request.form.get("sid")
+    if sid in ("", "undefined", "null"):
+        sid = None
+
+    # Speichern erfolgt im Request-Thread, da FileStorage-Objekte nach dem Request nicht mehr lesbar sind.
+    # Parsen, Embedding und Persistieren laufen im Hintergrund-Job.
+    processor = PDFProcessor(upload_folder=UPLOAD_FOLDER)
+    saved_files = []
     for file in files:
         # tnaa7i espace w sonderzeichen
         filename = secure_filename(file.filename)
+        filepath = processor.save_file(file, filename)
+        saved_files.append((file.filename, filename, filepath))
+
+    job_id = ingestion_jobs.submit(ingest_files, saved_files, sid)
+    logging.info(f"Ingestion-Job {job_id} mit {len(saved_files)} Dateien eingereiht.")
+
+    return jsonify({"job_id": job_id, "files": [name for name, _, _ in saved_files]}), 202
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job nicht gefunden"}), 404
+    return jsonify(job), 200
+
+@app.after_request
+def count_request(response):
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    metrics.http_requests_total.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    return response
+
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    """Prozess läuft und beantwortet HTTP-Anfragen (ohne Modelle oder Datenbank anzufassen)."""
+    return jsonify({"status": "ok", "uptime": round(time.time() - startup_report.started, 3)}), 200
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    """Bereit für Suchanfragen: Embedding-Modell und Chroma sind geladen. Sonst 503 (und Warm-up wird gestartet)."""
+    resources = {resource.name: resource.status() for resource in (embedding_resource, vectorstore_resource)}
+    ready = embedding_resource.ready and vectorstore_resource.ready
+    if not ready:
+        start_warm_up()
+    body = {"ready": ready, "resources": resources, "startup": startup_report.as_dict()}
+    return jsonify(body), 200 if ready else 503
+
+@app.route("/api/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Metriken (Latenz-Histogramme, Zähler pro Modell und Endpunkt) im Prometheus-Textformat."""
+    return Response(metrics.registry.render(), mimetype=metrics.MetricsRegistry.content_type)
+
+@app.route("/api/hardware", methods=["GET"])
+def hardware_usage():
+    """Auslastung der letzten `seconds` Sekunden (Standard 60) aus dem Ringpuffer."""
+    seconds = request.args.get("seconds", default=60, type=float)
+    usage = hardware_sampler.window(time.time() - seconds)
+    if usage is None:
+        return jsonify({"message": "Noch keine Messwerte"}), 503
+    return jsonify(usage), 200
+
+def report_progress(job_id, sid, name, stage, **infos):
+    """Speichert den Fortschritt einer Datei im Job und sendet ihn per Socket.IO."""
+    ingestion_jobs.set_file_stage(job_id, name, stage)
+    # Ohne sid würde socketio.emit an alle Clients senden
+    if sid is not None:
+        socketio.emit('ingest_progress', {"job_id": job_id, "file": name, "stage": stage, **infos}, to=sid)
+
+def stream_file(job_id, sid, name, filepath, content_hash):
+    """Verarbeitet eine große PDF seitenweise: jeder Batch wird sofort eingebettet und gespeichert.
+
+    Der Speicherbedarf bleibt unabhängig von der Seitenzahl, und die ersten Vektoren sind
+    durchsuchbar, bevor die letzte Seite gelesen wurde.
+    """
+    start_time = time.time()
+    processor = PDFProcessor(upload_folder=UPLOAD_FOLDER)
+    num_chunks = 0
+    try:
+        with embedding_cache.chunk_writer(content_hash) as write_chunks:
+            for batch in processor.iter_chunk_batches(filepath, batch_size=STREAMING_BATCH_SIZE):
+                write_chunks(batch)
+                chunk_ids = vectorstore.add_documents(batch)
+                source_registry.add(filepath, chunk_ids)
+                invalidate_retrieval_cache(filepath)
+                bm25_index.add(chunk_ids, [chunk.page_content for chunk in batch], [filepath] * len(batch))
+                num_chunks += len(batch)
+                report_progress(job_id, sid, name, "embedded", chunks=num_chunks, partial=True)
+    except Exception as e:
+        logging.error(f"Datei {filepath} konnte nicht gelesen werden: {str(e)}")
+        num_chunks = 0
+
+    elapsed_time = round(time.time() - start_time, 2)
+    if num_chunks == 0:
+        # Teilweise eingefügte Chunks wieder entfernen
+        delete_source(filepath)
+        report_progress(job_id, sid, name, "failed", error="Kein Text gefunden")
+    else:
+        vectorstore.persist()
+        source_registry.add(filepath, [], num_bytes=os.path.getsize(filepath), content_hash=content_hash)
+        logging.info(f"Datei {filepath} gestreamt, {num_chunks} Chunks in {elapsed_time}s.")
+        report_progress(job_id, sid, name, "persisted", chunks=num_chunks)
+    return {"name": name, "time": elapsed_time, "chunks": num_chunks, "streamed": True}
+
+def ingest_files(job_id, saved_files, sid=None):
+    """Hintergrund-Job: parst, chunkt, embeddet und persistiert die hochgeladenen PDFs.
 
-        # files sind bereits in Frontend gefiltert
-        if filename in already_processed:
+    Bricht der Job ab, erhält der Client trotzdem `ingest_done` (mit allen Dateien als Fehler und
+    der Meldung in `message`), damit der Upload nicht ewig als laufend angezeigt wird.
+    """
+    try:
+        # Das Quellenverzeichnis wird einmal am Ende des Jobs geschrieben statt nach jeder Datei bzw. jedem Batch
+        with source_registry.batch():
+            return _ingest_files(job_id, saved_files, sid)
+    except Exception as e:
+        names = [original_name for original_name, _, _ in saved_files]
+        for name in names:
+            ingestion_jobs.set_file_stage(job_id, name, "failed")
+        if sid is not None:
+            socketio.emit('ingest_done', {"job_id": job_id, "files": [], "error": names, "timings": [], "message": str(e)}, to=sid)
+        # Erneut werfen, damit die JobQueue den Job als fehlgeschlagen markiert
+        raise
+
+def _ingest_files(job_id, saved_files, sid):
+    file_urls = []
+    lesen_error = []
+    timings = []
+    timings_per_file = {}
+    documents = []
+    content_hashes = {}
+    chunks_per_file = {}
+    to_parse = {}
+    to_stream = {}
+
+    for original_name, _, _ in saved_files:
+        ingestion_jobs.set_file_stage(job_id, original_name, "saved")
+
+    for original_name, filename, filepath in saved_files:
+        content_hash = file_hash(filepath)
+        previous_hash = source_registry.content_hash(filepath)
+
+        # Gleicher Inhalt liegt bereits unter diesem Namen in der Datenbank (auch nach einem Neustart)
+        if previous_hash == content_hash:
             logging.info(f"Datei {filename} wurde bereits verarbeitet, wird übersprungen.")
-            continue  # Überspringe bereits verarbeitete Dateien
-        
-        already_processed.add(filename)
+            file_urls.append({"name": original_name, "url": f"http://localhost:5000/uploads/{filename}"})
+            report_progress(job_id, sid, original_name, "persisted", cached=True)
+            continue
+
+        # Geänderter Inhalt unter gleichem Namen (oder Eintrag ohne bekannten Hash): alte Embeddings entfernen
+        if source_registry.get(filepath) is not None:
+            logging.info(f"Inhalt von {filename} hat sich geändert, alte Embeddings werden ersetzt.")
+            delete_source(filepath)
+
+        content_hashes[filepath] = content_hash
+
+        # Gleicher Inhalt wurde schon einmal (z. B. unter anderem Namen) geparst
+        cached_chunks = embedding_cache.load_chunks(content_hash, filepath)
+        if cached_chunks:
+            logging.info(f"Datei {filename}: {len(cached_chunks)} Chunks aus dem Cache übernommen.")
+            timings_per_file[filepath] = {"name": original_name, "time": 0, "chunks": len(cached_chunks), "cached": True}
+            timings.append(timings_per_file[filepath])
+            chunks_per_file[filepath] = (original_name, filename, cached_chunks)
+            report_progress(job_id, sid, original_name, "chunked", chunks=len(cached_chunks), cached=True)
+            continue
+
+        # Große PDFs werden seitenweise gestreamt statt komplett im Prozess-Pool geladen
+        if os.path.getsize(filepath) >= STREAMING_MIN_BYTES:
+            to_stream[filepath] = (original_name, filename)
+        else:
+            to_parse[filepath] = (original_name, filename)
+
+    # Parsen und Chunken parallel im Prozess-Pool
+    for filepath, chunks, elapsed_time, error in parse_pdfs_parallel(list(to_parse), UPLOAD_FOLDER):
+        original_name, filename = to_parse[filepath]
+        timings_per_file[filepath] = {"name": original_name, "time": elapsed_time, "parse_time": elapsed_time, "chunks": len(chunks) if chunks else 0}
+        timings.append(timings_per_file[filepath])
+        metrics.ingestion_parse_duration.observe(elapsed_time)
 
-        processor = PDFProcessor(upload_folder=UPLOAD_FOLDER)
-        filepath = processor.save_file(file, filename)
-        chunks = processor.extract_text_chunks(filepath)
         if chunks is None:
-            lesen_error.extend(filename)
+            if error:
+                logging.error(f"Datei {filename} konnte nicht gelesen werden: {error}")
+            del content_hashes[filepath]
+            lesen_error.append(original_name)
+            report_progress(job_id, sid, original_name, "failed", error=error or "Kein Text gefunden")
             continue 
 
-        file_urls.append({"name": file.filename, "url": f"http://localhost:5000/uploads/{filename}"})
-
-        logging.info(f"Datei {filename} eingefuegt, {len(chunks)} Chunks extrahiert.")
-
-        global documents
+        report_progress(job_id, sid, original_name, "parsed", time=elapsed_time)
+        embedding_cache.store_chunks(content_hashes[filepath], chunks)
+        chunks_per_file[filepath] = (original_name, filename, chunks)
+        report_progress(job_id, sid, original_name, "chunked", chunks=len(chunks))
+        logging.info(f"Datei {filename} eingefuegt, {len(chunks)} Chunks extrahiert in {elapsed_time}s.")
+
+    # Embeddings pro Datei berechnen (landen im Cache), damit der Fortschritt pro Datei sichtbar ist
+    for filepath, (original_name, filename, chunks) in chunks_per_file.items():
+        start_time = time.time()
+        embedding_cache.embeddings.embed_documents([chunk.page_content for chunk in chunks])
+        timings_per_file[filepath]["time"] += time.time() - start_time
+        report_progress(job_id, sid, original_name, "embedded")
+        file_urls.append({"name": original_name, "url": f"http://localhost:5000/uploads/{filename}"})
         documents.extend(chunks)
 
-    # Chroma-Datenbank aktualisieren
+    # Chroma-Datenbank in einem einzigen Aufruf aktualisieren (Embeddings kommen jetzt alle aus dem Cache)
     if documents:
         logging.info("Aktualisiere Chroma-Datenbank...")
-        vectorstore.add_documents(documents)
+        start_time = time.time()
+        chunk_ids = vectorstore.add_documents(documents)
         vectorstore.persist()
-        logging.info("Chroma-Datenbank aktualisiert.")
-        logging.info("ChromaDB gespeicherte Daten:")
-        logging.info(vectorstore.get())
-        documents.clear()  
-
-    return jsonify({"files": file_urls, "error": lesen_error}), 200
+        bm25_index.add(chunk_ids, [doc.page_content for doc in documents], [doc.metadata["source"] for doc in documents])
+
+        ids_per_source = defaultdict(list)
+        for chunk_id, document in zip(chunk_ids, documents):
+            ids_per_source[document.metadata["source"]].append(chunk_id)
+        for filepath, ids in ids_per_source.items():
+            invalidate_retrieval_cache(filepath)
+            source_registry.add(filepath, ids, num_bytes=os.path.getsize(filepath), content_hash=content_hashes[filepath])
+
+        # Das gemeinsame Speichern zählt für jede Datei mit, damit die Dauer wie beim Streamen bis zum Persistieren reicht
+        store_time = time.time() - start_time
+        for filepath in chunks_per_file:
+            timings_per_file[filepath]["time"] = round(timings_per_file[filepath]["time"] + store_time, 2)
+
+        logging.info(f"Chroma-Datenbank aktualisiert ({len(documents)} Chunks aus {len(chunks_per_file)} Dateien).")
+        logging.info(f"ChromaDB gespeicherte Daten: {source_registry.summary()}")
+
+    for original_name, _, _ in chunks_per_file.values():
+        report_progress(job_id, sid, original_name, "persisted")
+
+    for filepath, (original_name, filename) in to_stream.items():
+        timing = stream_file(job_id, sid, original_name, filepath, content_hashes[filepath])
+        timings.append(timing)
+        if timing["chunks"] == 0:
+            lesen_error.append(original_name)
+            continue
+        file_urls.append({"name": original_name, "url": f"http://localhost:5000/uploads/{filename}"})
+
+    for timing in timings:
+        mode = "cached" if timing.get("cached") else "streamed" if timing.get("streamed") else "parsed"
+        metrics.ingestion_duration.observe(timing["time"], mode=mode)
+
+    result = {"files": file_urls, "error": lesen_error, "timings": timings}
+    if sid is not None:
+        socketio.emit('ingest_done', {"job_id": job_id, **result}, to=sid)
+    return result
+
+def invalidate_retrieval_cache(source):
+    """Verwirft zwischengespeicherte Suchergebnisse, die diese Quelle betreffen (auch Suchen ohne Quellenfilter)."""
+    removed = retrieval_cache.invalidate(lambda key: key[2] in (source, None))
+    if removed:
+        logging.info(f"{removed} Suchergebnisse für {source} aus dem Cache entfernt.")
+
+def delete_source(filepath):
+    """Entfernt alle Chunks einer Quelle aus Chroma und aus dem Quellenverzeichnis."""
+    invalidate_retrieval_cache(filepath)
+    answer_cache.evict_source(filepath)
+    extraction_store.evict_source(filepath)
+    entry = source_registry.remove(filepath)
+    if entry and entry["chunk_ids"]:
+        chunk_ids = entry["chunk_ids"]
+    else:
+        chunk_ids = vectorstore.get(where={"source": filepath}, include=[])["ids"]
+    if chunk_ids:
+        vectorstore.delete(ids=chunk_ids)
+        bm25_index.remove(chunk_ids)
+
+@app.route("/api/cache_stats", methods=["GET"])
+def cache_stats():
+    """Trefferquoten der Caches für Anfrage-Embeddings und Suchergebnisse."""
+    return jsonify({
+        "query_embeddings": query_embedder.cache.stats(),
+        "retrieval_results": retrieval_cache.stats(),
+        "answers": answer_cache.stats(),
+    }), 200
+
+@app.route("/api/sources", methods=["GET"])
+def list_sources():
+    """Liste der hochgeladenen Dokumente aus dem Quellenverzeichnis (ohne Zugriff auf die Vektordaten)."""
+    sources = [
+        dict(entry, name=os.path.basename(entry["source"]), url=f"http://localhost:5000/uploads/{os.path.basename(entry['source'])}")
+        for entry in source_registry.to_list()
+    ]
+    return jsonify({"count": len(sources), "sources": sources}), 200
 
 @app.route("/api/delete_embedding", methods=["POST"])
 def handle_delete_embedding():
@@ -148,18 +550,13 @@ def handle_delete_embedding():
             return jsonify({"error": "Kein Dateiname angegeben"}), 400
         
         # Embeddings aus ChromaDB entfernen
-        vectorstore.delete(where={"source": os.path.join(UPLOAD_FOLDER, filename)})
+        delete_source(os.path.join(UPLOAD_FOLDER, filename))
         vectorstore.persist()
 
         logging.info(f"Embeddings fuer {filename} geloescht.")
         logging.info(f"Chroma-Datenbank aktualisiert.")
 
-        logging.info("ChromaDB gespeicherte Daten:")
-        logging.info(vectorstore.get())
-
-
-        if filename in already_processed:
-            already_processed.remove(filename)
+        logging.info(f"ChromaDB gespeicherte Daten: {source_registry.summary()}")
 
         # Datei aus dem Upload-Ordner entfernen
         filepath = os.path.join(UPLOAD_FOLDER, filename)
@@ -180,11 +577,12 @@ def getJson():
     try:
         data = request.get_json() 
         model = data["model"]
+        per_source = data.get("mode") == "per_source" and model in EXTRACTION_MODELS
 
         logging.info("Button 'Extract all Infos' zum Erstellen der JSON-Datei angeklickt")
         
         # Prüft, wie viele Dateien untersucht werden
-        unique_sources = set(meta["source"] for meta in vectorstore.get()["metadatas"])
+        unique_sources = source_registry.sources()
         num_sources = len(unique_sources)
 
         if num_sources == 0:
@@ -193,6 +591,25 @@ def getJson():
 
         num_vectors = vectorstore._collection.count()
         logging.info(f"Anzahl der Vektoren in ChromaDB: {num_vectors}")
+
+        # Schneller Weg: vollständig ausgefüllte Formulare brauchen weder Suche noch Modell. Teilweise
+        # ausgefüllte laufen normal durch Suche und Extraktion, die gelesenen Felder ersetzen danach die Modellwerte
+        form_fields = {}
+        if model in EXTRACTION_MODELS and data.get("form_fast_path", FORM_FAST_PATH):
+            form_fields = read_form_fields(unique_sources)
+            logging.info(f"{sum(form_complete(fields) for fields in form_fields.values())} von {num_sources} Dateien vollständig aus Formularfeldern gelesen")
+
+        # Pro Datei gespeicherte Extraktionen (gleicher Inhalt, Modell, Prompt-Version) wiederverwenden,
+        # Suche und Modellaufruf nur für neue oder geänderte Dateien
+        retrieval_sources = [source for source in sorted(unique_sources) if not form_complete(form_fields.get(source))]
+        stored_results = {}
+        if per_source:
+            for source in retrieval_sources:
+                stored = extraction_store.get(source_registry.content_hash(source), EXTRACTION_MODELS[model], EXTRACTION_PROMPT_VERSION)
+                if stored is not None:
+                    stored_results[source] = stored
+            retrieval_sources = [source for source in retrieval_sources if source not in stored_results]
+            logging.info(f"{len(stored_results)} von {num_sources} Dateien aus gespeicherten Extraktionen übernommen")
         
         queries = [
             ("Anmeldung zur Bachelorarbeit", 2.5),
@@ -204,30 +621,24 @@ def getJson():
         aggregated_scores = defaultdict(float)
         doc_map = {}
 
-        for subquery, weight in queries:
-            # Die euklidische Distanz l2 misst den geradlinigen Abstand zwischen zwei Punkten im Raum. 
-            # Sie berücksichtigt sowohl die Richtung als auch die Länge der Vektoren. Je kleiner der Wert, desto ähnlicher sind die Punkte.
-            results = vectorstore.similarity_search_with_score(subquery, k=num_vectors)
-            for doc, score in results:
-                key = str(hash(doc.page_content))
-                relevance = weight * (1 / (score + 1e-5))
-
-                # Bonus falls alle Schlüsselwörter im Text vorhanden
-                words = subquery.split()
-                all_words_in_doc = all(word.lower() in doc.page_content.lower() for word in words)
-
-                if all_words_in_doc:
-                    for word in words:
-                        logging.info(f"Wort gefunden für Bonus: {word}")
-                    relevance *= 5
-
-                aggregated_scores[key] += relevance
+        # Die euklidische Distanz l2 misst den geradlinigen Abstand zwischen zwei Punkten im Raum. 
+        # Sie berücksichtigt sowohl die Richtung als auch die Länge der Vektoren. Je kleiner der Wert, desto ähnlicher sind die Punkte.
+        # Statt die ganze Collection pro Teilanfrage zu durchsuchen, werden pro Quelle nur die Top-k Kandidaten geholt
+        subqueries = [subquery for subquery, _ in queries]
+        # Die Scores sind hybride Distanzen: lexikalische Treffer aus dem BM25-Index verkleinern die Vektor-Distanz
+        retrieval_start = time.perf_counter()
+        for source, ids, texts, distances in top_k_per_source(vectorstore, query_embedder, bm25_index, subqueries, retrieval_sources, k=GETJSON_TOP_K, cache=retrieval_cache):
+            for j, (chunk_id, text) in enumerate(zip(ids, texts)):
+                for i, (subquery, weight) in enumerate(queries):
+                    aggregated_scores[chunk_id] += weight * (1 / (float(distances[i, j]) + 1e-5))
                 # Speichere nicht nur doc, sondern eine Struktur mit Inhalt und Source
-                doc_map[key] = {
-                    "text": doc.page_content,
-                    "source": doc.metadata.get("source", "Unbekannt")  # Fallback falls keine Quelle existiert
+                doc_map[chunk_id] = {
+                    "text": text,
+                    "source": source
                 }
 
+        metrics.retrieval_latency.observe(time.perf_counter() - retrieval_start, endpoint="getjson")
+
         ranked_docs = sorted(aggregated_scores.items(), key=lambda x: x[1], reverse=True)
 
         threshold = 0.1
@@ -257,25 +668,37 @@ def getJson():
             source: " ".join(texts) for source, texts in grouped_by_source.items()
         }       
         logging.info(combined_texts_per_source) 
-        print(vectorstore._collection._client.get_collection(name="vectorstore"))
         
         logging.info(f"Genutztes Model: {model}")
         logging.info(f"Anzahl der zu bearbeitenden Dateien: {num_sources}")
         logging.info("JSON file wird erstellt....")
-        
+
+        # Fan-out: jede Datei einzeln extrahieren, Ergebnisse pro Datei sofort an den Client
+        if per_source:
+            sources = sorted(unique_sources)
+            sid = data.get("sid")
+            if not sid:
+                results = extract_per_source(None, None, combined_texts_per_source, sources, EXTRACTION_MODELS[model], stored_results, form_fields)
+                return jsonify(results), 200
+            run_id = data.get("run_id") or uuid.uuid4().hex
+            socketio.start_background_task(extract_per_source, run_id, sid, combined_texts_per_source, sources, EXTRACTION_MODELS[model], stored_results, form_fields)
+            return jsonify({"run_id": run_id, "sources": [os.path.basename(source) for source in sources]}), 202
+
         response = {"message": "Modell nicht unterstützt"}  
+
+        # Mit Socket-Verbindung: jedes Objekt geht an den Client, sobald das Modell es fertig generiert hat
+        if model in EXTRACTION_MODELS and data.get("sid"):
+            run_id = data.get("run_id") or uuid.uuid4().hex
+            socketio.start_background_task(extract_streaming, run_id, data["sid"], combined_texts_per_source, EXTRACTION_MODELS[model], num_sources, form_fields)
+            return jsonify({"run_id": run_id, "sources": [os.path.basename(source) for source in sorted(unique_sources)]}), 202
         
-        if model == "Lama3.1":
-            # Llama
-            response_data_model_1, elapsed_time_model1 = extract_information_with_model(combined_texts_per_source, "llama3.1:8b", num_sources)
-            response = save_model_response_to_json_output(response_data_model_1, elapsed_time_model1, num_sources)
-        elif model == "DeepSeek" : 
-            #DeepSeek
-            response_data_model_2,elapsed_time_model2 = extract_information_with_model(combined_texts_per_source, "deepseek-r1:14b", num_sources)
-            response = save_model_response_to_json_output(response_data_model_2, elapsed_time_model2, num_sources)
-        elif model == "Mistral" :
-            response_data_model_2,elapsed_time_model2 = extract_information_with_model(combined_texts_per_source, "mistral", num_sources)
-            response = save_model_response_to_json_output(response_data_model_2, elapsed_time_model2, num_sources)
+        if model in EXTRACTION_MODELS and not retrieval_sources:
+            response = apply_form_fields([], form_fields, num_sources)
+        elif model in EXTRACTION_MODELS:
+            # Gleichzeitige getjson-Anfragen laufen modellweise gebündelt
+            with model_scheduler.use(EXTRACTION_MODELS[model]):
+                response_data, elapsed_time = extract_information_with_model(combined_texts_per_source, EXTRACTION_MODELS[model], len(retrieval_sources))
+            response = apply_form_fields(save_model_response_to_json_output(response_data, elapsed_time, num_sources), form_fields, num_sources)
 
         logging.info("JSON file erfolgreich erstellt")
 
@@ -284,13 +707,140 @@ def getJson():
         logging.info(f"Erstellung des JSON Files fehlgeschlagen:{str(e)}")
         return jsonify({"error": str(e)}), 500
 
+def read_form_fields(sources):
+    """Formularfelder pro Quelle (source -> Felder), gespeichert im Extraktions-Speicher wie die Modellergebnisse."""
+    form_fields = {}
+    for source in sources:
+        content_hash = source_registry.content_hash(source)
+        fields = extraction_store.get(content_hash, "formularfelder", FORM_FIELDS_VERSION)
+        if fields is None:
+            fields = form_reader.extract_form_fields(source)
+            extraction_store.put(content_hash, "formularfelder", FORM_FIELDS_VERSION, source, fields)
+        if fields:
+            form_fields[source] = fields
+    return form_fields
+
+def form_complete(fields):
+    return bool(fields) and all(field in fields for field in REQUIRED_FORM_FIELDS)
+
+def form_result(source, fields, num_sources):
+    """Ergebnis im Schema der LLM-Extraktion für ein vollständig ausgefülltes Formular."""
+    result = {field: fields.get(field, "Unbekannt") for field in FORM_FIELDS}
+    result.update({
+        "Dateiname": os.path.basename(source),
+        "Antwortzeit": "0s",
+        "Anzahl der untersuchten Dateien": num_sources,
+        "Formularfelder": sorted(fields),
+    })
+    return result
+
+def merge_form_fields(result, fields):
+    """Direkt gelesene Formularfelder haben Vorrang vor den Werten des Modells."""
+    if fields:
+        result.update(fields)
+        result["Formularfelder"] = sorted(fields)
+    return result
+
+def apply_form_fields(results, form_fields, num_sources):
+    """Ergänzt die Modellergebnisse (Liste) um Formularfelder und hängt die vollständigen Formulare an."""
+    partial = {os.path.basename(source): fields for source, fields in form_fields.items() if not form_complete(fields)}
+    for result in results:
+        merge_form_fields(result, partial.get(os.path.basename(str(result.get("Dateiname", "")))))
+    return results + [form_result(source, fields, num_sources) for source, fields in sorted(form_fields.items()) if form_complete(fields)]
+
+def extract_streaming(run_id, sid, texts_per_source, ollama_model, num_sources, form_fields=None):
+    """Gemeinsamer Prompt für alle Dateien, die Objekte werden beim Generieren einzeln gesendet."""
+    form_fields = form_fields or {}
+    sent = []
+
+    def publish(obj):
+        apply_form_fields([obj], {source: fields for source, fields in form_fields.items() if not form_complete(fields)}, num_sources)
+        sent.append(obj)
+        socketio.emit('extraction_result', {
+            "run_id": run_id, "source": obj.get("Dateiname"), "result": obj,
+            "done": len(sent), "total": num_sources,
+        }, to=sid)
+
+    complete = apply_form_fields([], form_fields, num_sources)
+    for obj in complete:
+        publish(obj)
+
+    try:
+        remaining = num_sources - len(complete)
+        if remaining:
+            with model_scheduler.use(ollama_model):
+                response_data, elapsed_time = extract_information_with_model(texts_per_source, ollama_model, remaining, on_object=publish)
+            results = apply_form_fields(save_model_response_to_json_output(response_data, elapsed_time, num_sources), form_fields, num_sources)
+        else:
+            results = complete
+        socketio.emit('extraction_done', {"run_id": run_id, "results": results}, to=sid)
+    except Exception as e:
+        logging.error(f"Erstellung des JSON Files fehlgeschlagen:{str(e)}")
+        socketio.emit('extraction_done', {"run_id": run_id, "results": sent, "error": str(e)}, to=sid)
+
+def extract_per_source(run_id, sid, texts_per_source, sources, ollama_model, stored_results=None, form_fields=None):
+    """Extrahiert jede Quelle einzeln (begrenzt parallel) und sendet jedes Ergebnis sofort per Socket.IO.
+
+    `stored_results` (source -> Ergebnis) werden ohne Modellaufruf übernommen, neue erfolgreiche
+    Ergebnisse werden im Extraktions-Speicher abgelegt.
+    """
+    stored_results = stored_results or {}
+    form_fields = form_fields or {}
+    start_time = time.time()
+    num_sources = len(sources)
+    results = []
+
+    def publish(source, result):
+        result["Anzahl der untersuchten Dateien"] = num_sources
+        results.append(result)
+        if sid is not None:
+            socketio.emit('extraction_result', {
+                "run_id": run_id, "source": os.path.basename(source), "result": result,
+                "done": len(results), "total": num_sources,
+            }, to=sid)
+
+    for source, fields in form_fields.items():
+        if form_complete(fields):
+            publish(source, form_result(source, fields, num_sources))
+
+    for source, result in stored_results.items():
+        publish(source, {**result, "Dateiname": os.path.basename(source), "Aus dem Speicher": True})
+
+    # Quellen ohne relevante Textstellen brauchen keinen Modellaufruf
+    for source in sources:
+        if source not in texts_per_source and source not in stored_results and not form_complete(form_fields.get(source)):
+            publish(source, merge_form_fields({
+                "Dateiname": os.path.basename(source),
+                "Thema": "Unbekannt, keine Relevante Infos gefunden",
+                "Student": "Unbekannt, keine Relevante Infos gefunden",
+                "HS-Betreuer": "Unbekannt, keine Relevante Infos gefunden",
+                "Antwortzeit": "0s",
+            }, form_fields.get(source)))
+
+    try:
+        # Alles aus Formularen bzw. dem Speicher: kein Modellplatz nötig (und kein Modellwechsel)
+        if texts_per_source:
+            with model_scheduler.use(ollama_model):
+                for source, result, ok in extract_information_per_source(texts_per_source, ollama_model, max_workers=GETJSON_MAX_PARALLEL):
+                    merge_form_fields(result, form_fields.get(source))
+                    if ok:
+                        extraction_store.put(source_registry.content_hash(source), ollama_model, EXTRACTION_PROMPT_VERSION, source, dict(result))
+                    publish(source, result)
+    except Exception as e:
+        logging.error(f"Extraktion pro Datei fehlgeschlagen: {str(e)}")
+        if sid is not None:
+            socketio.emit('extraction_done', {"run_id": run_id, "results": results, "error": str(e)}, to=sid)
+        return results
+
+    elapsed_time = round(time.time() - start_time, 2)
+    logging.info(f"Extraktion von {num_sources} Dateien einzeln in {elapsed_time}s abgeschlossen")
+    if sid is not None:
+        socketio.emit('extraction_done', {"run_id": run_id, "results": results, "time": elapsed_time}, to=sid)
+    return results
+
 @app.route("/api/testmodel", methods = ["POST"])
 def testmodels():
-    models = [
-        "llama3.1:8b",
-        "deepseek-r1:8b",
-        "mistral"
-    ]
+    models = TEST_MODELS
 
     # Testfragen (Kriterien für die CSV-Spalten)
     questions = [
@@ -303,86 +853,122 @@ def testmodels():
     data = request.get_json()
 
     file_path = os.path.join(UPLOAD_FOLDER, data["file"])
-    results = []
-    response_infos = []
-    
-    for model_name in models:
-        row = [model_name]  # Erste Spalte: Modellname
-        for question, Erwartete_Inhalte in questions:
-            logging.info(f"[{model_name}] '{question}'")
-            filter_criteria = {"source": file_path} 
-            similar_docs = vectorstore.similarity_search_with_score(question, k=5, filter=filter_criteria)            
-            for doc, score in similar_docs:
-                cleaned_text = doc.page_content.replace("\n", " ")
-                logging.info(f"Score: {score} / Vektor_text : {cleaned_text}")
-            
-            threshold = 1.5
-            # Kontext aus den Dokumenten extrahieren
-            context = "\n".join([doc.page_content for doc, score in similar_docs if score <= threshold ])
-            times, response , hardware = asyncio.run(query_model(model_name, question, context))
-            bewertung  = evaluate_response (response, Erwartete_Inhalte, context, question)
-            response_infos.append(OrderedDict([
-                    ("Model", model_name),
-                    ("Frage", question),
-                    ("Response", response),
-                    ("Antwortzeit", times),
-                    ("Antwort Bewertung", bewertung),
-                    ("Hardware Auslastung", hardware)
-                ]))
-            row.append(times)  # Zeiten in die Zeile einfügen
-        results.append(row)  # results = [[model_name1, times_question1, times_question2, times_question3], [model_name2, times_question1, times_question2, times_question3]...]
-    logging.info(results)
-    return jsonify({"results": results, "questions": questions, "allInfos": response_infos}), 200
-
-
-def boost_score(doc, score, user_input, boost_terms, boost_factor):
-    doc_text = doc.page_content.lower()
-    query_text = user_input.lower()
-
-    for term in boost_terms:
-        term_lower = term.lower()
-        if term_lower in query_text:
-            if term_lower in doc_text or (
-                term_lower == "student" and ("familienname" in doc_text or "vorname" in doc_text)
-            ):
-                score *= boost_factor  # mehrfach boosten
-    return score
-
-
-def call (user_input, model, source):
+    sid = data.get("sid")
+
+    def retrieve_test_context(question):
+        with metrics.retrieval_latency.time(endpoint="testmodel"):
+            similar_docs = hybrid_search(vectorstore, query_embedder, bm25_index, question, k=5, source=file_path, cache=retrieval_cache)
+        for doc, score in similar_docs:
+            cleaned_text = doc.page_content.replace("\n", " ")
+            logging.info(f"Score: {score} / Vektor_text : {cleaned_text}")
+        return similar_docs
+
+    def pack_test_context(similar_docs, model_name):
+        # Die Suche läuft einmal pro Frage, gepackt wird pro Modell (eigenes Token-Budget)
+        context, stats = pack_context(similar_docs, model_name, threshold=1.5)
+        metrics.context_tokens.inc(stats["packed_tokens"], endpoint="testmodel", model=model_name)
+        metrics.context_tokens_saved.inc(stats["saved_tokens"], endpoint="testmodel", model=model_name)
+        return context
+
+    def run_matrix(on_cell=None):
+        # Alle Zellen laufen in einer einzigen Event-Loop (statt asyncio.run pro Zelle)
+        return asyncio.run(run_evaluation_matrix(
+            models, questions, retrieve_test_context, on_cell=on_cell, pack_context=pack_test_context,
+            concurrency_per_model=TESTMODEL_CONCURRENCY_PER_MODEL, grading_concurrency=TESTMODEL_GRADING_CONCURRENCY
+        ))
+
+    # Ohne Socket-Verbindung wie bisher: eine Antwort mit allen Ergebnissen am Ende
+    if not sid:
+        results, response_infos = run_matrix()
+        logging.info(results)
+        return jsonify({"results": results, "questions": questions, "allInfos": response_infos}), 200
+
+    # Mit Socket-Verbindung: jede fertige Zelle wird sofort an die Seite gesendet
+    # Der Client schickt seine run_id mit, damit er auch Events vor der 202-Antwort zuordnen kann
+    run_id = data.get("run_id") or uuid.uuid4().hex
+
+    def run_in_background():
+        try:
+            results, response_infos = run_matrix(
+                lambda cell: socketio.emit('testmodel_cell', {"run_id": run_id, **cell}, to=sid)
+            )
+            logging.info(results)
+            socketio.emit('testmodel_done', {"run_id": run_id, "results": results, "questions": questions, "allInfos": response_infos}, to=sid)
+        except Exception as e:
+            logging.error(f"Modelltest fehlgeschlagen: {str(e)}")
+            socketio.emit('testmodel_done', {"run_id": run_id, "error": str(e)}, to=sid)
+
+    socketio.start_background_task(run_in_background)
+    return jsonify({"run_id": run_id, "models": models, "questions": questions}), 202
+
+
+def replay_cached_answer(sender, user_input, model, source):
+    """Sendet eine zwischengespeicherte Antwort über dieselben Events wie eine neue Generierung."""
+    content_hash = source_registry.content_hash(source) if source else None
+    if content_hash is None:
+        return False
+
+    start_time = time.time()
+    entry = run_blocking(ASYNC_MODE, answer_cache.lookup, model, content_hash, user_input)
+    if entry is None:
+        return False
+
+    logging.info(f"Antwort aus dem Cache (Frage: '{entry['question']}', ursprüngliche Antwortzeit: {entry['time']}s)")
+    metrics.generations_total.inc(model=model, status="cached")
+    sender.emit('response', {'response': entry["answer"]})
+    sender.emit('response_time', {'time': round(time.time() - start_time, 2), "model": model, "cached": True})
+    return True
+
+def retrieve_context(user_input, source, ollama_model=DEFAULT_MODEL):
+    """Sucht den Kontext für die Frage (läuft außerhalb der Event-Loop).
+
+    Überlappende Treffer werden zusammengefügt und in das Token-Budget von `ollama_model` gepackt.
+    """
+    context = ""
+    if (source):
+        # Hybride Suche (Vektoren + BM25-Index) in der Chroma-Datenbank mit Filter auf die Quelle
+        similar_docs = hybrid_search(vectorstore, query_embedder, bm25_index, user_input, k=15, source=source, cache=retrieval_cache)
+
+        logging.info(f"Anzahl der gespeicherten Vektoren fuer {source}: {source_registry.chunk_count(source)}")
+        logging.info(f"Die {len(similar_docs)} aehnlichsten Vektoren mit hybridem Score:")
+
+        for doc, score in similar_docs:
+            cleaned_text = doc.page_content[:100].replace("\n", " ")
+            logging.info(f"Score: {score} / Vektor_text : {cleaned_text}")
+        threshold = 1
+        # Kontext aus den Dokumenten extrahieren
+        context, stats = pack_context(similar_docs, ollama_model, threshold=threshold)
+        metrics.context_tokens.inc(stats["packed_tokens"], endpoint="chat", model=ollama_model)
+        metrics.context_tokens_saved.inc(stats["saved_tokens"], endpoint="chat", model=ollama_model)
+        if(context == ""):
+            context = "Keine relevante Informationen gefunden" 
+            logging.info(context)  
+        else:
+            cleaned_context = context[:1000].replace('\n', ' ')
+            logging.info(f"Extrahierter Kontext nach Filterung mit einem Threshold von 1.5: {cleaned_context}...")   
+    else :
+        context = "Bitte laden Sie ein PDF-Dokument hoch und wählen Sie es aus, damit ich Ihre Fragen auf Basis der enthaltenen Informationen beantworten kann (keine Hintergrundinformationen)."
+        logging.info(context)
+    return context
+
+def call (user_input, model, source, sid=None, generation=None):
+    """Beantwortet eine Chat-Nachricht und streamt die Antwort an den Client `sid`.
+
+    Über `generation` kann die Generierung abgebrochen werden (stop, disconnect, neue Nachricht).
+    """
+    sender = BackpressureEmitter(socketio, sid, window=STREAM_ACK_WINDOW, ack_timeout=STREAM_ACK_TIMEOUT)
+    if generation is None:
+        generation = generations.start(sid, model)
+    # Nur echte, normal beendete Modellläufe fließen in die mittlere Dauer ein (keine Cache-Antworten, Timeouts, Fehler)
+    completed = False
     try:
-        boost_terms = ["Thema", "Bachelorarbeit", "HS-betreuer", "Betreuer", "Matrikel", "email", "student"]
-        boost_factor = 0.7
-
-        # Ähnlichkeitssuche in der Chroma-Datenbank durchführen mit Filter
-        filter_criteria = {"source": source} if source else None
-        similar_docs = vectorstore.similarity_search_with_score(user_input, k=15, filter=filter_criteria)
-
-        context = ""
-        if (source):
-            num_vectors = vectorstore._collection.get(where={"source": source})
-
-            logging.info(f"Anzahl der gespeicherten Vektoren fuer {source}: {len(num_vectors['ids'])}")
-            logging.info(f"Die {min(3, len(similar_docs))} aehnlichsten Vektoren mit Score (falls verfuegbar):")
-            
-            boosted_docs = [(doc, boost_score(doc, score, user_input, boost_terms, boost_factor)) for doc, score in similar_docs]
-            boosted_docs = sorted(boosted_docs, key=lambda x: x[1])
-
-            for doc, score in boosted_docs:
-                cleaned_text = doc.page_content[:100].replace("\n", " ")
-                logging.info(f"Score: {score} / Vektor_text : {cleaned_text}")
-            threshold = 1
-            # Kontext aus den Dokumenten extrahieren
-            context = "\n".join([doc.page_content for doc, score in boosted_docs if score <= threshold ])
-            if(context == ""):
-                context = "Keine relevante Informationen gefunden" 
-                logging.info(context)  
-            else:
-                cleaned_context = context[:1000].replace('\n', ' ')
-                logging.info(f"Extrahierter Kontext nach Filterung mit einem Threshold von 1.5: {cleaned_context}...")   
-        else :
-            context = "Bitte laden Sie ein PDF-Dokument hoch und wählen Sie es aus, damit ich Ihre Fragen auf Basis der enthaltenen Informationen beantworten kann (keine Hintergrundinformationen)."
-            logging.info(context) 
+        if replay_cached_answer(sender, user_input, model, source):
+            return
+
+        ollama_model = CHAT_MODELS.get(model, DEFAULT_MODEL)
+        # Embedding und Suche sind CPU-lastig und dürfen die Event-Loop nicht blockieren
+        with metrics.retrieval_latency.time(endpoint="chat"):
+            context = run_blocking(ASYNC_MODE, retrieve_context, user_input, source, ollama_model)
 
         full_prompt = f"""
             Bitte beantworte die folgende Frage präzise und detailliert anhand der bereitgestellten Informationen.  
@@ -403,84 +989,120 @@ def call (user_input, model, source):
             {user_input}  
             """
 
-        model_config = {
-            "Lama3.1": {
-                "model": "llama3.1:8b"
-            },
-            "DeepSeek": {
-                "model": "deepseek-r1:8b"
-            },
-            "Mistral": {
-                "model": "mistral"
-            }
-        }
-
-        if model in model_config:
-            payload = {
-                "model": model_config[model]["model"],
-                "messages": [{"role": "user", "content": full_prompt}]
-            }
-        else:
-            payload = {
-                "model": "llama3.1:8b",
-                "messages": [{"role": "user", "content": full_prompt}]
-            }
-
-        url = "http://localhost:11434/api/chat"
-
-        cpu_before = psutil.cpu_percent(interval=None)
-        ram_before = psutil.virtual_memory().percent
-        logging.info(f"Vor der Anfrage - CPU: {cpu_before}%, RAM: {ram_before}%")
+        messages = [{"role": "user", "content": full_prompt}]
+
+        first_response = True
+        start_time = None
+        answer_tokens = []
+
+        logging.info(f"{model} Antwort:")
+
+        if generation.cancelled.is_set():
+            return
+
+        interval, max_chars = stream_settings.get(sid, (STREAM_FRAME_INTERVAL, STREAM_FRAME_MAX_CHARS))
+        frames = TokenCoalescer(sender, 'response', interval=interval, max_chars=max_chars)
+
+        # CPU/RAM kommen aus dem Ringpuffer des Hintergrund-Samplers (Zeitfenster dieser Anfrage)
+        request_time = time.time()
+        # Der Scheduler bündelt Anfragen pro Modell, damit Ollama nicht ständig Modelle wechselt.
+        # Wird während des Wartens abgebrochen, geht keine Anfrage mehr an Ollama (kein unnötiger Modellwechsel)
+        with model_scheduler.use(ollama_model, cancelled=generation.cancelled):
+            for json_data in ollama.chat_stream(ollama_model, messages, timeout=20, on_connect=generation.attach, cancelled=generation.cancelled):
+                if generation.cancelled.is_set():
+                    break
+                if "message" in json_data and "content" in json_data["message"]:
+                    if first_response:
+                        start_time = time.time()  # Timer starten, wenn erste Antwort kommt
+                        first_response = False  # Timeout ab jetzt nicht mehr relevant
+                        metrics.time_to_first_token.observe(start_time - request_time, model=model)
+
+                    token = json_data["message"]["content"]
+                    answer_tokens.append(token)
+                    frames.add(token)
+                if json_data.get("done"):
+                    # Tatsächliche Prompt-Länge laut Ollama für die Token-Schätzung des Kontexts
+                    token_counter.calibrate(ollama_model, full_prompt, json_data.get("prompt_eval_count"))
+
+        if not generation.cancelled.is_set():
+            frames.flush()
+        logging.info(f"{frames.tokens} Tokens in {frames.frames} Frames gesendet")
+        metrics.tokens_total.inc(frames.tokens, model=model)
+
+        if start_time and not generation.cancelled.is_set():
+            elapsed_time = round(time.time() - start_time, 2)
+            sender.emit('response_time', {'time': elapsed_time, "model": model})
+            metrics.generations_total.inc(model=model, status="completed")
+            completed = True
+            if elapsed_time > 0:
+                metrics.tokens_per_second.observe(frames.tokens / elapsed_time, model=model)
+            logging.info(f"Antwortzeit: {elapsed_time}s")
+
+            # Vollständige Antwort für gleiche Fragen zum selben Dokument merken
+            content_hash = source_registry.content_hash(source) if source else None
+            if content_hash is not None:
+                answer_cache.store(model, content_hash, source, user_input, "".join(answer_tokens), elapsed_time)
+
+        logging.info(f"Während der Anfrage - {format_usage(hardware_sampler.window(request_time))}")
 
-        response = requests.post(url, json=payload, stream=True, timeout=20)
-
-        if response.status_code == 200:
-            first_response = True
-            start_time = None
-
-            logging.info(f"{model} Antwort:")
-
-            # **Während der Verarbeitung - CPU & RAM messen**
-            for line in response.iter_lines(decode_unicode=True):
-                if line:
-                    json_data = json.loads(line)
-
-                    if "message" in json_data and "content" in json_data["message"]:
-                        if first_response:
-                            start_time = time.time()  # Timer starten, wenn erste Antwort kommt
-                            first_response = False  # Timeout ab jetzt nicht mehr relevant
-
-                        # CPU & RAM während der Verarbeitung
-                        cpu_during = psutil.cpu_percent(interval=None)
-                        ram_during = psutil.virtual_memory().percent
-                        logging.info(f"Waehrend der Antwort - CPU: {cpu_during}%, RAM: {ram_during}%")
-
-                        token = json_data["message"]["content"]
-                        logging.info(json_data)
-                        emit('response', {'response': token})
-
-            # **CPU- & RAM-Auslastung NACH der Antwort**
-            if start_time:
-                elapsed_time = round(time.time() - start_time, 2)
-                emit('response_time', {'time': elapsed_time, "model": model})
-                logging.info(f"Antwortzeit: {elapsed_time}s")
-
-            cpu_after = psutil.cpu_percent(interval=None)
-            ram_after = psutil.virtual_memory().percent
-            logging.info(f"Nach der Anfrage - CPU: {cpu_after}%, RAM: {ram_after}%")
-        else:
-            emit('error', {'error': 'Fehler beim Verbinden mit dem Modell. Aktualisiere die Seite und wähle ein anderes Modell aus.'})
-
-    except requests.exceptions.Timeout as e:
-        logging.error(f"Anfragefehler (Timeout): {str(e)}")
-        print("⚠️ Timeout! Der Server hat zu lange gebraucht, um zu starten.")
-        emit('timeout', {
-            'message': 'Der Server hat nicht innerhalb von 15 Sekunden geantwortet. ',
-            'retry_possible': True
-        })
+    except Exception as e:
+        # Schließen der Verbindung beim Abbruch führt zu einem Lesefehler im Stream
+        if generation.cancelled.is_set():
+            logging.info(f"Stream nach Abbruch beendet ({generation.reason}).")
+            return
+        metrics.generations_total.inc(model=model, status="timeout" if isinstance(e, OllamaTimeout) else "error")
+        if isinstance(e, OllamaTimeout):
+            logging.error(f"Anfragefehler (Timeout): {str(e)}")
+            print("⚠️ Timeout! Der Server hat zu lange gebraucht, um zu starten.")
+            sender.emit('timeout', {
+                'message': 'Der Server hat nicht innerhalb von 15 Sekunden geantwortet. ',
+                'retry_possible': True
+            })
+            return
+        logging.error(f"Fehler bei der Generierung: {str(e)}")
+        sender.emit('error', {'error': 'Fehler beim Verbinden mit dem Modell. Aktualisiere die Seite und wähle ein anderes Modell aus.'})
+    finally:
+        if generation.cancelled.is_set():
+            metrics.generations_total.inc(model=model, status="cancelled")
+        generations.finish(generation, completed=completed)
+
+def start_generation(user_input, model, file_path, sid):
+    """Bricht eine laufende Generierung der Session ab und startet die neue im Hintergrund."""
+    generation = generations.start(sid, model)
+    socketio.start_background_task(call, user_input, model, file_path, sid, generation)
+
+@socketio.on('stop')
+def handle_stop(data=None):
+    result = generations.cancel(request.sid, "stop")
+    if result is not None:
+        socketio.emit('stopped', result, to=request.sid)
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    generations.cancel(request.sid, "disconnect")
+    stream_settings.pop(request.sid, None)
+
+@socketio.on('stream_config')
+def handle_stream_config(data):
+    """Bündelungsfenster des Clients setzen: {'interval_ms': 50, 'max_chars': 64}, 0 = jedes Token einzeln."""
+    interval_ms = max(0, min(int(data.get("interval_ms", STREAM_FRAME_INTERVAL * 1000)), 1000))
+    max_chars = max(1, min(int(data.get("max_chars", STREAM_FRAME_MAX_CHARS)), 4096))
+    stream_settings[request.sid] = (interval_ms / 1000, max_chars)
+    logging.info(f"Stream-Konfiguration für {request.sid}: {interval_ms} ms / {max_chars} Zeichen")
+
+@app.route("/api/models", methods=["GET"])
+def model_residency():
+    """Geladene Modelle laut Ollama, aktive und wartende Anfragen pro Modell, Anzahl Modellwechsel."""
+    return jsonify(model_scheduler.stats()), 200
+
+@app.route("/api/generations", methods=["GET"])
+def generation_stats():
+    """Laufende und abgebrochene Generierungen sowie die geschätzte eingesparte Generierungszeit."""
+    return jsonify(generations.stats()), 200
 
 @socketio.on('message')
 def handle_message(data):
+    metrics.socket_events_total.inc(event="message")
     user_input = data['text']
     model = data["model"]
     file_path = data.get("file", "")
@@ -489,10 +1111,12 @@ def handle_message(data):
 
     logging.info(f"Neue Anfrage - Model: {model}, Datei: {file_path if file_path else 'Keine'}")
     logging.info(f"Prompt: {user_input}")
-    call(user_input, model, file_path)
+    # Generierung im Hintergrund, damit der Handler sofort zurückkehrt und andere Sockets nicht warten
+    start_generation(user_input, model, file_path, request.sid)
 
 @socketio.on('continue_request')
 def continue_request(data):
+    metrics.socket_events_total.inc(event="continue_request")
     user_input = data['text']
     model = data["model"]
     file_path = data.get("file", "")
@@ -500,9 +1124,10 @@ def continue_request(data):
         file_path = os.path.join(UPLOAD_FOLDER, file_path)
 
     logging.info(f"Fortgesetzte Anfrage - Model: {model}, Datei: {file_path if file_path else 'Keine'}")
-    call(user_input, model, file_path)
+    start_generation(user_input, model, file_path, request.sid)
 
 if __name__ == '__main__':
+    start_services()
     # Startet die Flask-Anwendung mit SocketIO
     # `threaded=True` ermöglicht die gleichzeitige Bearbeitung mehrerer Anfragen (Multithreading) und eventloop nicht blockieren
     # Standardmäßig ist `threaded=True` bereits aktiv, daher kann es auch weggelassen werden.
@@ -0,0 +1,112 @@
+import re
+import time
+import threading
+import numpy as np
+from collections import OrderedDict
+
+
+def normalize_question(question):
+    """Kleinschreibung, Satzzeichen entfernen, Leerzeichen zusammenfassen."""
+    question = re.sub(r"[^\w@.-]+", " ", question.lower())
+    return " ".join(question.split()).strip(" .")
+
+
+class AnswerCache:
+    """Cache für Chat-Antworten, Schlüssel: (Modell, Inhalts-Hash der Quelle, normalisierte Frage).
+
+    Ohne exakten Treffer kann optional eine nahezu gleiche Frage (Kosinus-Ähnlichkeit der
+    Frage-Embeddings >= `similarity_threshold`) zum selben Modell und Dokument verwendet werden.
+    Einträge laufen nach `ttl` Sekunden ab und werden beim Löschen der Quelle entfernt.
+    """
+
+    def __init__(self, embedder=None, ttl=3600, maxsize=512, similarity_threshold=0.95):
+        self.embedder = embedder
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def lookup(self, model, content_hash, question):
+        """Gibt den passenden Eintrag ({"answer", "time", ...}) zurück oder None."""
+        key = (model, content_hash, normalize_question(question))
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            candidates = [
+                (other_key, other) for other_key, other in self._entries.items()
+                if other_key[0] == model and other_key[1] == content_hash and other["vector"] is not None
+            ]
+
+        if self.embedder is not None and candidates:
+            vector = self._vector(question)
+            best_key, best_entry, best_similarity = None, None, 0.0
+            for other_key, other in candidates:
+                similarity = float(np.dot(vector, other["vector"]))
+                if similarity > best_similarity:
+                    best_key, best_entry, best_similarity = other_key, other, similarity
+            if best_similarity >= self.similarity_threshold:
+                with self._lock:
+                    if best_key in self._entries:
+                        self._entries.move_to_end(best_key)
+                    self.semantic_hits += 1
+                return best_entry
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def store(self, model, content_hash, source, question, answer, elapsed_time):
+        vector = self._vector(question) if self.embedder is not None else None
+        key = (model, content_hash, normalize_question(question))
+        with self._lock:
+            self._entries[key] = {
+                "answer": answer,
+                "time": elapsed_time,
+                "source": source,
+                "question": question,
+                "created": time.time(),
+                "vector": vector,
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def evict_source(self, source):
+        """Entfernt alle Antworten zu einer Quelle, gibt die Anzahl zurück."""
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if entry["source"] == source]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.semantic_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.semantic_hits) / total, 4) if total else 0.0,
+            }
+
+    def _vector(self, question):
+        # Normiert, damit das Skalarprodukt der Kosinus-Ähnlichkeit entspricht
+        vector = np.asarray(self.embedder.embed_query(normalize_question(question)), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self, now):
+        expired = [key for key, entry in self._entries.items() if now - entry["created"] > self.ttl]
+        for key in expired:
+            del self._entries[key]
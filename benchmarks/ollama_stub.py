@@ -0,0 +1,149 @@
+"""Lokaler Ollama-Ersatz für Benchmarks: spricht das NDJSON-Streaming-Protokoll von /api/chat.
+
+Token-Rate, Latenz bis zum ersten Token und Antwortlänge sind einstellbar, damit Messungen
+ohne GPU und ohne echte Modelle reproduzierbar sind.
+
+    python -m benchmarks.ollama_stub --port 11435 --rate 60 --first-token 0.2
+"""
+import re
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "Die Bachelorarbeit behandelt das Thema der automatischen Extraktion von Informationen aus "
+    "Anmeldeformularen und wird von der Hochschule betreut"
+).split()
+
+
+class StubConfig:
+    def __init__(self, rate=50.0, first_token=0.1, tokens=120):
+        self.rate = rate                # Tokens pro Sekunde
+        self.first_token = first_token  # Sekunden bis zum ersten Token
+        self.tokens = tokens            # Anzahl Tokens einer normalen Antwort
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+
+def _answer_tokens(prompt, config):
+    """JSON-Antwort für Extraktions-Prompts (ein Objekt pro Dokument), sonst Fließtext."""
+    if "JSON" in prompt and "Dateiname:" in prompt:
+        sources = re.findall(r"Dateiname: (.+)", prompt)
+        entries = [{
+            "Dateiname": source.strip(),
+            "Thema": "Benchmark-Thema",
+            "Student": "Max Mustermann",
+            "Matrikelnummer": "123456",
+            "E-Mail": "max@example.org",
+            "HS-Betreuer": "Prof. Beispiel",
+            "Externer Betreuer": "Unbekannt",
+        } for source in sources]
+        text = json.dumps(entries, ensure_ascii=False)
+        return [text[i:i + 8] for i in range(0, len(text), 8)]
+    return [WORDS[i % len(WORDS)] + " " for i in range(config.tokens)]
+
+
+def make_handler(config):
+    class OllamaStubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, data, status=200):
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_json(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._send_json({"models": [{"name": name} for name in ("llama3.1:8b", "deepseek-r1:8b", "deepseek-r1:14b", "mistral")]})
+            elif self.path == "/api/ps":
+                self._send_json({"models": []})
+            else:
+                self._send_json({"error": "not found"}, 404)
+
+        def do_POST(self):
+            if self.path == "/api/generate":
+                # Vorladen eines Modells (leere Anfrage mit keep_alive)
+                payload = self._read_json()
+                self._send_json({"model": payload.get("model", "stub"), "response": "", "done": True})
+                return
+            if self.path != "/api/chat":
+                self._send_json({"error": "not found"}, 404)
+                return
+            config.count()
+            payload = self._read_json()
+            prompt = "\n".join(message.get("content", "") for message in payload.get("messages", []))
+            model = payload.get("model", "stub")
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def write_line(data):
+                line = (json.dumps(data) + "\n").encode()
+                self.wfile.write(f"{len(line):X}\r\n".encode() + line + b"\r\n")
+                self.wfile.flush()
+
+            try:
+                time.sleep(config.first_token)
+                delay = 1.0 / config.rate if config.rate > 0 else 0
+                for token in _answer_tokens(prompt, config):
+                    write_line({"model": model, "message": {"role": "assistant", "content": token}, "done": False})
+                    if delay:
+                        time.sleep(delay)
+                write_line({"model": model, "message": {"role": "assistant", "content": ""}, "done": True})
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # Client hat abgebrochen (z. B. Stop-Button)
+                pass
+
+    return OllamaStubHandler
+
+
+class OllamaStub:
+    """Startet den Stub in einem Hintergrund-Thread; `url` für OLLAMA_URL."""
+
+    def __init__(self, host="127.0.0.1", port=0, **config):
+        self.config = StubConfig(**config)
+        self.server = ThreadingHTTPServer((host, port), make_handler(self.config))
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ollama-Stub für Benchmarks")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--rate", type=float, default=50.0, help="Tokens pro Sekunde")
+    parser.add_argument("--first-token", type=float, default=0.1, help="Sekunden bis zum ersten Token")
+    parser.add_argument("--tokens", type=int, default=120, help="Tokens pro Antwort")
+    args = parser.parse_args()
+    stub = OllamaStub(port=args.port, rate=args.rate, first_token=args.first_token, tokens=args.tokens)
+    print(f"Ollama-Stub läuft auf {stub.url}")
+    stub.server.serve_forever()
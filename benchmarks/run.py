@@ -0,0 +1,268 @@
+"""Offline-Benchmarks der wichtigsten Pfade gegen einen lokalen Ollama-Stub und eine Stub-Bewertung.
+
+Gemessen werden: PDFProcessor.extract_text_chunks, /api/embedding (bis der Job fertig ist),
+/api/getjson (Suche + Aggregation + Extraktion), call (Chat Ende-zu-Ende) und /api/testmodel.
+Der Server läuft in einem temporären Arbeitsverzeichnis, die Ergebnisse landen als JSON in
+benchmarks/results und können mit einem früheren Lauf verglichen werden.
+
+    python -m benchmarks.run --sizes 10 100 1000 --rate 60
+    python -m benchmarks.run --sizes 10 --baseline benchmarks/results/20250101-120000.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.ollama_stub import OllamaStub
+from benchmarks.stub_grader import make_stub_grader
+from benchmarks.synthetic_pdfs import generate_forms
+
+CHAT_QUESTIONS = [
+    "Wer ist der HS-Betreuer dieser Bachelorarbeit?",
+    "Wie lautet das Thema der Bachelorarbeit?",
+    "Von wem wird diese Bachelorarbeit durchgeführt?",
+]
+
+
+def summarize(values):
+    values = sorted(values)
+    if not values:
+        return None
+    return {
+        "n": len(values),
+        "mean": round(statistics.mean(values), 4),
+        "p50": round(values[len(values) // 2], 4),
+        "p95": round(values[min(len(values) - 1, int(len(values) * 0.95))], 4),
+        "max": round(values[-1], 4),
+    }
+
+
+def histogram_delta(histogram, before, **labels):
+    """Anzahl und Mittelwert der Beobachtungen seit `before` (Snapshot von `histogram_snapshot`)."""
+    count, total = histogram_snapshot(histogram, **labels)
+    count, total = count - before[0], total - before[1]
+    return {"n": count, "mean": round(total / count, 4) if count else None}
+
+
+def histogram_snapshot(histogram, **labels):
+    key = tuple(str(labels.get(name, "")) for name in histogram.labelnames)
+    series = histogram._series.get(key)
+    return (series["count"], series["sum"]) if series else (0, 0.0)
+
+
+def wait_for_job(client, job_id, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f"/api/jobs/{job_id}").get_json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.05)
+    raise TimeoutError(f"Job {job_id} nicht in {timeout}s fertig")
+
+
+def bench_extract(server, pdfs):
+    processor = server.PDFProcessor(upload_folder=server.UPLOAD_FOLDER)
+    durations = []
+    start = time.perf_counter()
+    for path in pdfs:
+        t = time.perf_counter()
+        processor.extract_text_chunks(path)
+        durations.append(time.perf_counter() - t)
+    total = time.perf_counter() - start
+    return {"total_s": round(total, 3), "files_per_s": round(len(pdfs) / total, 2), "per_file_s": summarize(durations)}
+
+
+def bench_ingest(server, client, pdfs, timeout):
+    handles = [open(path, "rb") for path in pdfs]
+    try:
+        start = time.perf_counter()
+        response = client.post(
+            "/api/embedding",
+            data={"AllPdfs": [(handle, os.path.basename(path)) for handle, path in zip(handles, pdfs)]},
+            content_type="multipart/form-data",
+        )
+        accepted = time.perf_counter() - start
+        job = wait_for_job(client, response.get_json()["job_id"], timeout)
+        total = time.perf_counter() - start
+    finally:
+        for handle in handles:
+            handle.close()
+    result = job["result"] or {}
+    return {
+        "status": job["status"],
+        "accepted_s": round(accepted, 3),
+        "total_s": round(total, 3),
+        "files_per_s": round(len(pdfs) / total, 2),
+        "failed_files": len(result.get("error", [])),
+        "per_file_s": summarize([timing["time"] for timing in result.get("timings", [])]),
+    }
+
+
+def bench_getjson(server, client, repeats):
+    metrics = server.metrics
+    retrieval_before = histogram_snapshot(metrics.retrieval_latency, endpoint="getjson")
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        # Die synthetischen Formulare wären sonst alle vollständig lesbar und würden Suche und Modell überspringen
+        response = client.post("/api/getjson", json={"model": "Lama3.1", "form_fast_path": False})
+        durations.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/getjson: {response.status_code} {response.get_data(as_text=True)[:200]}")
+    return {
+        "total_s": summarize(durations),
+        "retrieval_s": histogram_delta(metrics.retrieval_latency, retrieval_before, endpoint="getjson"),
+    }
+
+
+def bench_call(server, source, model, repeats):
+    metrics = server.metrics
+    ttft_before = histogram_snapshot(metrics.time_to_first_token, model=model)
+    retrieval_before = histogram_snapshot(metrics.retrieval_latency, endpoint="chat")
+    durations = []
+    for i in range(repeats):
+        # Frage leicht variieren, damit der Antwort-Cache nicht greift
+        question = f"{CHAT_QUESTIONS[i % len(CHAT_QUESTIONS)]} ({i})"
+        start = time.perf_counter()
+        server.call(question, model, source)
+        durations.append(time.perf_counter() - start)
+    return {
+        "total_s": summarize(durations),
+        "time_to_first_token_s": histogram_delta(metrics.time_to_first_token, ttft_before, model=model),
+        "retrieval_s": histogram_delta(metrics.retrieval_latency, retrieval_before, endpoint="chat"),
+    }
+
+
+def bench_testmodel(client, filename):
+    start = time.perf_counter()
+    response = client.post("/api/testmodel", json={"file": filename})
+    total = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(f"/api/testmodel: {response.status_code} {response.get_data(as_text=True)[:200]}")
+    cells = sum(len(row) - 1 for row in response.get_json()["results"])
+    return {"total_s": round(total, 3), "cells": cells, "cells_per_s": round(cells / total, 3)}
+
+
+def clear_sources(server):
+    for source in list(server.source_registry.sources()):
+        server.delete_source(source)
+
+
+def compare(current, baseline):
+    """Gibt die relative Änderung aller gemeinsamen Zeitwerte aus (negativ = schneller)."""
+    def flatten(data, prefix=""):
+        for key, value in data.items():
+            path = f"{prefix}{key}"
+            if isinstance(value, dict):
+                yield from flatten(value, path + ".")
+            elif isinstance(value, (int, float)) and not isinstance(value, bool) and (key.endswith("_s") or key in ("mean", "p50", "p95")):
+                yield path, value
+
+    old = dict(flatten(baseline["results"]))
+    print(f"\nVergleich mit {baseline['timestamp']}:")
+    for path, value in flatten(current["results"]):
+        if path in old and old[path]:
+            change = (value - old[path]) / old[path] * 100
+            print(f"  {path:<60} {old[path]:>10.4f} -> {value:>10.4f}  ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline-Benchmarks mit Ollama-Stub")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="Anzahl synthetischer PDFs pro Serie")
+    parser.add_argument("--rate", type=float, default=50.0, help="Tokens pro Sekunde des Stubs")
+    parser.add_argument("--first-token", type=float, default=0.2, help="Latenz bis zum ersten Token (s)")
+    parser.add_argument("--tokens", type=int, default=120, help="Tokens pro Chat-Antwort")
+    parser.add_argument("--grader-latency", type=float, default=0.5, help="Latenz der Stub-Bewertung (s)")
+    parser.add_argument("--repeats", type=int, default=5, help="Wiederholungen für call und getjson")
+    parser.add_argument("--skip", nargs="*", default=[], choices=["extract", "ingest", "getjson", "call", "testmodel"])
+    parser.add_argument("--ingest-timeout", type=float, default=3600)
+    parser.add_argument("--baseline", help="Früheres Ergebnis (JSON) zum Vergleich")
+    parser.add_argument("--keep-workdir", action="store_true")
+    args = parser.parse_args()
+
+    stub = OllamaStub(rate=args.rate, first_token=args.first_token, tokens=args.tokens).start()
+    os.environ["OLLAMA_URL"] = stub.url
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark-stub")
+
+    # Server legt chroma_db, uploads, embedding_cache und app.log relativ zum Arbeitsverzeichnis an
+    workdir = tempfile.mkdtemp(prefix="leli-bench-")
+    os.chdir(workdir)
+    print(f"Arbeitsverzeichnis: {workdir}, Ollama-Stub: {stub.url}")
+
+    import_start = time.perf_counter()
+    import Server as server
+    import evaluation
+    server.start_services()
+    import_time = time.perf_counter() - import_start
+    evaluation.evaluate_response = make_stub_grader(args.grader_latency)
+    client = server.app.test_client()
+
+    report = {
+        "timestamp": time.strftime("%Y%m%d-%H%M%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "async_mode": server.ASYNC_MODE,
+        },
+        "config": vars(args),
+        "results": {"server_import_s": round(import_time, 3), "sizes": {}},
+    }
+
+    try:
+        for size in args.sizes:
+            print(f"\n== {size} PDFs ==")
+            pdf_dir = os.path.join(workdir, f"synthetic_{size}")
+            pdfs = generate_forms(pdf_dir, size, seed=size, prefix=f"form{size}", start_index=size * 10000)
+            results = report["results"]["sizes"][str(size)] = {}
+            clear_sources(server)
+
+            if "extract" not in args.skip:
+                results["extract_text_chunks"] = bench_extract(server, pdfs)
+                print("extract_text_chunks:", results["extract_text_chunks"])
+            if "ingest" not in args.skip:
+                results["handle_embedding"] = bench_ingest(server, client, pdfs, args.ingest_timeout)
+                print("handle_embedding:", results["handle_embedding"])
+            if not server.source_registry.sources():
+                continue
+            if "getjson" not in args.skip:
+                results["getjson"] = bench_getjson(server, client, args.repeats)
+                print("getjson:", results["getjson"])
+            source = sorted(server.source_registry.sources())[0]
+            if "call" not in args.skip:
+                results["call"] = bench_call(server, source, "Lama3.1", args.repeats)
+                print("call:", results["call"])
+            if "testmodel" not in args.skip:
+                results["testmodels"] = bench_testmodel(client, os.path.basename(source))
+                print("testmodels:", results["testmodels"])
+
+        report["results"]["ollama_stub_requests"] = stub.config.requests
+    finally:
+        stub.stop()
+        if not args.keep_workdir:
+            os.chdir(REPO_ROOT)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{report['timestamp']}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nErgebnisse gespeichert: {path}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Erzeugt synthetische Anmeldeformulare zur Bachelorarbeit als PDF (ohne zusätzliche Bibliothek)."""
+import os
+import random
+
+FIRST_NAMES = ["Anna", "Ben", "Clara", "David", "Elif", "Felix", "Greta", "Hamza", "Ida", "Jonas", "Lea", "Mehmet"]
+LAST_NAMES = ["Müller", "Schmidt", "Schneider", "Fischer", "Weber", "Meyer", "Wagner", "Becker", "Yilmaz", "Hoffmann"]
+TOPICS = [
+    "Extraktion von Formulardaten mit lokalen Sprachmodellen",
+    "Hybride Suche in Vektordatenbanken",
+    "Energieeffiziente Inferenz auf Edge-Geräten",
+    "Automatisierte Bewertung von Chatbot-Antworten",
+    "Streaming-Architekturen für Webanwendungen",
+]
+SUPERVISORS = ["Prof. Dr. Ulrich", "Prof. Dr. Wagner", "Prof. Dr. Kaya", "Prof. Dr. Braun"]
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def form_fields(index, rng):
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    return {
+        "Student": f"{first} {last}",
+        "Matrikelnummer": str(100000 + index),
+        "E-Mail": f"{first.lower()}.{index}@stud.example.org",
+        "Thema": rng.choice(TOPICS),
+        "HS-Betreuer": rng.choice(SUPERVISORS),
+        "Externer Betreuer": f"Dr. {rng.choice(LAST_NAMES)}",
+    }
+
+
+def write_form_pdf(path, fields, filler_lines=20):
+    """Schreibt eine einseitige PDF mit Überschrift, Formularfeldern und etwas Fließtext."""
+    lines = ["Anmeldung zur Bachelorarbeit", ""]
+    lines += [f"{name}: {value}" for name, value in fields.items()]
+    lines += [""] + [
+        f"Hinweis {i + 1}: Die Arbeit ist innerhalb der Bearbeitungszeit beim Prüfungsamt einzureichen."
+        for i in range(filler_lines)
+    ]
+    content = ["BT", "/F1 10 Tf", "50 800 Td", "14 TL"]
+    content += [f"({_escape(line)}) '" for line in lines]
+    content.append("ET")
+    stream = "\n".join(content).encode("cp1252")
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode()
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+
+    with open(path, "wb") as f:
+        f.write(output)
+
+
+def generate_forms(directory, count, seed=42, prefix="form", start_index=0):
+    """Erzeugt `count` Formulare in `directory`, gibt die Dateipfade zurück (deterministisch per `seed`).
+
+    Über `start_index` bekommen verschiedene Serien unterschiedliche Inhalte (Matrikelnummern),
+    damit Caches, die über den Dateiinhalt gehen, zwischen den Serien nicht greifen.
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for index in range(start_index, start_index + count):
+        path = os.path.join(directory, f"{prefix}_{index:06d}.pdf")
+        write_form_pdf(path, form_fields(index, rng))
+        paths.append(path)
+    return paths
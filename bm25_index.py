@@ -0,0 +1,200 @@
+import os
+import re
+import json
+import math
+import logging
+import threading
+from collections import Counter, defaultdict
+
+TOKEN_PATTERN = re.compile(r"[\wäöüß@.-]+", re.IGNORECASE)
+
+
+def tokenize(text):
+    """Zerlegt Text in kleingeschriebene Terme; Bindestrich-Wörter (z. B. HS-Betreuer) zusätzlich in ihre Teile."""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        token = token.strip(".-")
+        if not token:
+            continue
+        tokens.append(token)
+        if "-" in token:
+            tokens.extend(part for part in token.split("-") if part)
+    return tokens
+
+
+class BM25Index:
+    """Persistenter invertierter Index mit BM25-Scoring über den Chunk-Texten.
+
+    Der Index wird beim Einfügen der Chunks aufgebaut, zur Anfragezeit kostet die lexikalische
+    Suche nur noch Lookups in den Posting-Listen statt eines Scans über alle Chunk-Texte.
+    Die Posting-Listen liegen pro Quelle vor, eine auf eine Quelle beschränkte Suche berührt also
+    nur deren Chunks. Änderungen werden an ein Log angehängt und erst ab `compact_after` Einträgen
+    in den Snapshot übernommen, statt bei jedem Einfügen den ganzen Index zu schreiben.
+    """
+
+    def __init__(self, path: str, k1=1.5, b=0.75, compact_after=1000):
+        self.path = path
+        self.log_path = path + ".log"
+        self.k1 = k1
+        self.b = b
+        self.compact_after = compact_after
+        self._lock = threading.Lock()
+        self._postings = defaultdict(lambda: defaultdict(dict))  # source -> term -> {chunk_id: tf}
+        self._doc_freq = Counter()           # term -> anzahl chunks (für die IDF, über alle Quellen)
+        self._doc_terms = {}                 # chunk_id -> (source, {term: tf}), auch fürs Entfernen
+        self._doc_len = {}                   # chunk_id -> anzahl terme
+        self._total_len = 0
+        self._log_entries = 0
+        if os.path.exists(path) or os.path.exists(self.log_path):
+            self._load()
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def bootstrap(self, vectorstore):
+        """Baut den Index einmalig aus der Collection auf, falls er noch nicht existiert."""
+        if os.path.exists(self.path) or os.path.exists(self.log_path):
+            return
+        data = vectorstore.get(include=["documents", "metadatas"])
+        self.add(data["ids"], data["documents"], [meta.get("source", "Unbekannt") for meta in data["metadatas"]])
+        with self._lock:
+            self._compact()
+        logging.info(f"BM25-Index aus der Datenbank aufgebaut: {len(self)} Chunks.")
+
+    def _index(self, chunk_id, source, counts):
+        postings = self._postings[source]
+        for term, tf in counts.items():
+            postings[term][chunk_id] = tf
+            self._doc_freq[term] += 1
+        self._doc_terms[chunk_id] = (source, counts)
+        self._doc_len[chunk_id] = sum(counts.values())
+        self._total_len += self._doc_len[chunk_id]
+
+    def _unindex(self, chunk_id):
+        entry = self._doc_terms.pop(chunk_id, None)
+        if entry is None:
+            return
+        source, counts = entry
+        postings = self._postings[source]
+        for term in counts:
+            postings[term].pop(chunk_id, None)
+            if not postings[term]:
+                del postings[term]
+            self._doc_freq[term] -= 1
+            if self._doc_freq[term] <= 0:
+                del self._doc_freq[term]
+        if not postings:
+            del self._postings[source]
+        self._total_len -= self._doc_len.pop(chunk_id)
+
+    def add(self, chunk_ids, texts, sources):
+        with self._lock:
+            added = []
+            for chunk_id, text, source in zip(chunk_ids, texts, sources):
+                if chunk_id in self._doc_terms:
+                    continue
+                counts = dict(Counter(tokenize(text)))
+                self._index(chunk_id, source, counts)
+                added.append([chunk_id, source, counts])
+            if added:
+                self._append({"add": added})
+
+    def remove(self, chunk_ids):
+        with self._lock:
+            removed = [chunk_id for chunk_id in chunk_ids if chunk_id in self._doc_terms]
+            for chunk_id in removed:
+                self._unindex(chunk_id)
+            if removed:
+                self._append({"remove": removed})
+
+    def search(self, query, k=10, source=None):
+        """Liefert die k besten Chunks als Liste von (chunk_id, score), optional auf eine Quelle beschränkt."""
+        return sorted(self.scores(query, source=source).items(), key=lambda x: x[1], reverse=True)[:k]
+
+    def scores(self, query, source=None, chunk_ids=None):
+        """BM25-Scores aller Chunks, die mindestens einen Term der Anfrage enthalten.
+
+        Mit `source` werden nur die Posting-Listen dieser Quelle gelesen, mit `chunk_ids` nur
+        diese Chunks bewertet (z. B. die Kandidaten der Vektorsuche).
+        """
+        with self._lock:
+            num_docs = len(self._doc_terms)
+            if num_docs == 0:
+                return {}
+            avg_len = self._total_len / num_docs
+            scores = defaultdict(float)
+            for term in set(tokenize(query)):
+                doc_freq = self._doc_freq.get(term)
+                if not doc_freq:
+                    continue
+                idf = math.log(1 + (num_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+                for chunk_id, tf in self._matches(term, source, chunk_ids):
+                    norm = tf + self.k1 * (1 - self.b + self.b * self._doc_len[chunk_id] / avg_len)
+                    scores[chunk_id] += idf * tf * (self.k1 + 1) / norm
+            return dict(scores)
+
+    def _matches(self, term, source, chunk_ids):
+        """(chunk_id, tf) eines Terms: über die Kandidaten, die Quelle oder (ohne Filter) alle Quellen."""
+        if chunk_ids is not None:
+            for chunk_id in chunk_ids:
+                entry = self._doc_terms.get(chunk_id)
+                if entry is not None and (source is None or entry[0] == source) and term in entry[1]:
+                    yield chunk_id, entry[1][term]
+            return
+        sources = [source] if source is not None else list(self._postings)
+        for name in sources:
+            postings = self._postings.get(name)
+            if postings and term in postings:
+                yield from postings[term].items()
+
+    def _load(self):
+        legacy = False
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            if "docs" in data:
+                docs = data["docs"]
+            else:
+                # Älteres Format: globale Posting-Listen term -> {chunk_id: tf}
+                legacy = True
+                docs = {chunk_id: [source, {}] for chunk_id, source in data["doc_source"].items()}
+                for term, postings in data["postings"].items():
+                    for chunk_id, tf in postings.items():
+                        if chunk_id in docs:
+                            docs[chunk_id][1][term] = tf
+            for chunk_id, (source, counts) in docs.items():
+                self._index(chunk_id, source, counts)
+        if os.path.exists(self.log_path):
+            with open(self.log_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Abgebrochener letzter Eintrag (z. B. Absturz beim Schreiben)
+                        break
+                    for chunk_id, source, counts in entry.get("add", []):
+                        if chunk_id not in self._doc_terms:
+                            self._index(chunk_id, source, counts)
+                    for chunk_id in entry.get("remove", []):
+                        self._unindex(chunk_id)
+                    self._log_entries += 1
+        if self._log_entries or legacy:
+            self._compact()
+
+    def _append(self, entry):
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._log_entries += 1
+        if self._log_entries >= self.compact_after:
+            self._compact()
+
+    def _compact(self):
+        """Schreibt den vollständigen Index als Snapshot und leert das Log."""
+        tmp_path = self.path + ".part"
+        docs = {chunk_id: [source, counts] for chunk_id, (source, counts) in self._doc_terms.items()}
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"docs": docs}, f)
+        os.replace(tmp_path, self.path)
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+        self._log_entries = 0
@@ -0,0 +1,193 @@
+import os
+import logging
+import threading
+from collections import defaultdict
+
+# Token-Budget für die Hintergrundinformationen im Prompt (ohne Frage und Anweisungen)
+DEFAULT_CONTEXT_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1024"))
+# Abweichende Budgets pro Ollama-Modell
+CONTEXT_BUDGETS = {
+    "llama3.1:8b": DEFAULT_CONTEXT_BUDGET,
+    "deepseek-r1:8b": DEFAULT_CONTEXT_BUDGET,
+    "deepseek-r1:14b": DEFAULT_CONTEXT_BUDGET,
+    "mistral": DEFAULT_CONTEXT_BUDGET,
+}
+# Startwerte Zeichen pro Token (deutscher Text), werden mit prompt_eval_count von Ollama nachjustiert
+CHARS_PER_TOKEN = {
+    "llama3.1": 3.6,
+    "deepseek-r1": 3.6,
+    "mistral": 3.0,
+}
+DEFAULT_CHARS_PER_TOKEN = 3.2
+# Mindestlänge einer erkannten Textüberlappung, wenn kein start_index vorhanden ist
+MIN_TEXT_OVERLAP = 10
+
+
+class TokenCounter:
+    """Schätzt Tokens pro Zielmodell über ein Verhältnis Zeichen/Token.
+
+    Ollama liefert am Ende jeder Antwort `prompt_eval_count`; mit `calibrate` wird das Verhältnis
+    pro Modell als gleitender Mittelwert an den tatsächlichen Tokenizer angepasst.
+    """
+
+    def __init__(self, chars_per_token=CHARS_PER_TOKEN, default=DEFAULT_CHARS_PER_TOKEN, smoothing=0.2):
+        self._ratios = {}
+        self._defaults = chars_per_token
+        self._default = default
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+
+    def ratio(self, model):
+        with self._lock:
+            if model in self._ratios:
+                return self._ratios[model]
+        family = model.split(":", 1)[0]
+        return self._defaults.get(family, self._default)
+
+    def count(self, text, model):
+        if not text:
+            return 0
+        return max(1, round(len(text) / self.ratio(model)))
+
+    def calibrate(self, model, text, prompt_tokens):
+        """Passt das Verhältnis an die von Ollama gemeldete Tokenanzahl eines Prompts an."""
+        if not text or not prompt_tokens:
+            return
+        # Ollama zählt bei wiederverwendetem Prompt-Cache weniger Tokens, daher nur plausible Werte übernehmen
+        observed = min(max(len(text) / prompt_tokens, 2.0), 6.0)
+        current = self.ratio(model)
+        with self._lock:
+            self._ratios[model] = current + self.smoothing * (observed - current)
+
+
+token_counter = TokenCounter()
+
+
+def _join(left, right):
+    """Hängt `right` an `left` an, wenn sich Ende und Anfang überlappen (sonst None)."""
+    max_overlap = min(len(left), len(right))
+    for size in range(max_overlap, MIN_TEXT_OVERLAP - 1, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    if right in left:
+        return left
+    return None
+
+
+def merge_chunks(scored_docs):
+    """Fügt überlappende bzw. direkt benachbarte Chunks derselben Seite wieder zu Abschnitten zusammen.
+
+    `scored_docs`: Liste (Document, Score), kleinerer Score = relevanter. Mit `start_index` in den
+    Metadaten wird über die Positionen zusammengefügt, bei älteren Chunks ohne Position über die
+    Textüberlappung. Rückgabe: Liste von Abschnitten {"text", "score", "chunks", "key"}.
+    """
+    groups = defaultdict(list)
+    for doc, score in scored_docs:
+        metadata = doc.metadata or {}
+        groups[(metadata.get("source"), metadata.get("page"))].append((doc, score))
+
+    spans = []
+    for (source, page), items in groups.items():
+        positioned = [(doc, score) for doc, score in items if doc.metadata.get("start_index") is not None]
+        loose = [(doc, score) for doc, score in items if doc.metadata.get("start_index") is None]
+
+        positioned.sort(key=lambda item: item[0].metadata["start_index"])
+        page_spans = []
+        current = None
+        for doc, score in positioned:
+            start = doc.metadata["start_index"]
+            end = start + len(doc.page_content)
+            # Der Splitter entfernt Leerzeichen an den Chunk-Grenzen, daher kleine Lücken zulassen
+            if current is not None and start <= current["end"] + 1:
+                if end > current["end"]:
+                    overlap = current["end"] - start
+                    separator = " " if overlap < 0 else ""
+                    current["text"] += separator + doc.page_content[max(overlap, 0):]
+                    current["end"] = end
+                current["score"] = min(current["score"], score)
+                current["chunks"] += 1
+            else:
+                current = {"text": doc.page_content, "score": score, "chunks": 1, "end": end, "key": (source, page, start)}
+                page_spans.append(current)
+
+        for doc, score in loose:
+            page_spans.append({"text": doc.page_content, "score": score, "chunks": 1, "end": None, "key": (source, page, len(page_spans))})
+        # Die Chunks kommen nach Score sortiert; zwei Chunks, die erst über einen dritten verbunden
+        # werden, finden sich nur, wenn so lange zusammengefügt wird, bis sich nichts mehr ändert
+        changed = bool(loose)
+        while changed:
+            changed = False
+            for i, span in enumerate(page_spans):
+                for j in range(i + 1, len(page_spans)):
+                    other = page_spans[j]
+                    merged = _join(span["text"], other["text"]) or _join(other["text"], span["text"])
+                    if merged is None:
+                        continue
+                    span["text"] = merged
+                    span["score"] = min(span["score"], other["score"])
+                    span["chunks"] += other["chunks"]
+                    del page_spans[j]
+                    changed = True
+                    break
+                if changed:
+                    break
+        spans.extend(page_spans)
+
+    for span in spans:
+        span.pop("end", None)
+    return spans
+
+
+def pack_context(scored_docs, model, budget=None, threshold=None, counter=token_counter):
+    """Baut den Kontext für `model`: Chunks zusammenfügen, die besten Abschnitte ins Token-Budget packen.
+
+    Die Auswahl erfolgt nach Score, ausgegeben werden die Abschnitte in Dokumentreihenfolge.
+    Passt schon der beste Abschnitt nicht ins Budget, wird er gekürzt.
+    Rückgabe: (context, stats) mit den eingesparten Tokens gegenüber dem bloßen Aneinanderhängen.
+    """
+    if threshold is not None:
+        scored_docs = [(doc, score) for doc, score in scored_docs if score <= threshold]
+    if budget is None:
+        budget = CONTEXT_BUDGETS.get(model, DEFAULT_CONTEXT_BUDGET)
+
+    raw_tokens = counter.count("\n".join(doc.page_content for doc, _ in scored_docs), model)
+    spans = merge_chunks(scored_docs)
+
+    selected = []
+    used = 0
+    dropped = 0
+    truncated = False
+    for span in sorted(spans, key=lambda span: span["score"]):
+        tokens = counter.count(span["text"], model)
+        if used + tokens <= budget:
+            selected.append(span)
+            used += tokens
+        elif not selected:
+            # Zeichen grob über das Verhältnis des Modells kürzen
+            span = dict(span, text=span["text"][:int(budget * counter.ratio(model))])
+            selected.append(span)
+            used = counter.count(span["text"], model)
+            truncated = True
+        else:
+            dropped += 1
+
+    selected.sort(key=lambda span: (str(span["key"][0]), span["key"][1] if span["key"][1] is not None else -1, span["key"][2]))
+    context = "\n".join(span["text"] for span in selected)
+    packed_tokens = counter.count(context, model)
+    stats = {
+        "model": model,
+        "budget": budget,
+        "chunks": len(scored_docs),
+        "spans": len(spans),
+        "selected_spans": len(selected),
+        "dropped_spans": dropped,
+        "truncated": truncated,
+        "raw_tokens": raw_tokens,
+        "packed_tokens": packed_tokens,
+        "saved_tokens": max(raw_tokens - packed_tokens, 0),
+    }
+    logging.info(
+        f"Kontext für {model}: {stats['chunks']} Chunks -> {stats['spans']} Abschnitte, "
+        f"{stats['selected_spans']} im Budget ({packed_tokens}/{budget} Tokens, {stats['saved_tokens']} eingespart)"
+    )
+    return context, stats
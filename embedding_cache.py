@@ -0,0 +1,81 @@
+import os
+import json
+import hashlib
+from contextlib import contextmanager
+from langchain_core.documents import Document
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain.storage import LocalFileStore
+
+
+def file_hash(filepath: str) -> str:
+    """Berechnet den SHA-256-Hash des Dateiinhalts."""
+    sha = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+class EmbeddingCache:
+    """Persistenter, inhaltsadressierter Cache für Chunks und Embeddings.
+
+    - Chunks werden pro Datei-Hash (und Chunk-Parametern) gespeichert, eine umbenannte
+      oder erneut hochgeladene PDF muss daher nicht noch einmal geparst werden.
+    - Embeddings werden pro Chunk-Hash gespeichert (CacheBackedEmbeddings), identische
+      Chunks werden nie zweimal durch das Embedding-Modell geschickt.
+    """
+
+    def __init__(self, cache_dir: str, embedding_model, namespace: str):
+        self.cache_dir = cache_dir
+        self.chunk_dir = os.path.join(cache_dir, "chunks")
+        os.makedirs(self.chunk_dir, exist_ok=True)
+
+        # Namespace trennt die Vektoren verschiedener Embedding-Modelle
+        store = LocalFileStore(os.path.join(cache_dir, "vectors"))
+        self.embeddings = CacheBackedEmbeddings.from_bytes_store(embedding_model, store, namespace=namespace)
+
+    def _chunk_path(self, content_hash, chunk_size, chunk_overlap):
+        return os.path.join(self.chunk_dir, f"{content_hash}_{chunk_size}_{chunk_overlap}.jsonl")
+
+    def load_chunks(self, content_hash, source, chunk_size=200, chunk_overlap=50):
+        """Gibt die gespeicherten Chunks für diesen Inhalt zurück (mit neuer Quelle) oder None."""
+        path = self._chunk_path(content_hash, chunk_size, chunk_overlap)
+        if not os.path.exists(path):
+            return None
+
+        chunks = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                metadata = dict(entry["metadata"], source=source)
+                chunks.append(Document(page_content=entry["page_content"], metadata=metadata))
+        return chunks
+
+    def store_chunks(self, content_hash, chunks, chunk_size=200, chunk_overlap=50):
+        """Speichert die Chunks einer Datei. Die Quelle wird nicht gespeichert, da sie beim Laden neu gesetzt wird."""
+        with self.chunk_writer(content_hash, chunk_size, chunk_overlap) as write:
+            write(chunks)
+
+    @contextmanager
+    def chunk_writer(self, content_hash, chunk_size=200, chunk_overlap=50):
+        """Schreibt die Chunks einer Datei schrittweise (z. B. beim Streaming großer PDFs).
+
+        Der Eintrag wird erst nach erfolgreichem Abschluss sichtbar, bei einem Fehler wird er verworfen.
+        """
+        path = self._chunk_path(content_hash, chunk_size, chunk_overlap)
+        tmp_path = path + ".part"
+        f = open(tmp_path, "w", encoding="utf-8")
+
+        def write(chunks):
+            for chunk in chunks:
+                metadata = {k: v for k, v in chunk.metadata.items() if k != "source"}
+                f.write(json.dumps({"page_content": chunk.page_content, "metadata": metadata}, ensure_ascii=False) + "\n")
+
+        try:
+            yield write
+        except BaseException:
+            f.close()
+            os.remove(tmp_path)
+            raise
+        f.close()
+        os.replace(tmp_path, path)
@@ -0,0 +1,104 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from test_models import query_model, evaluate_response
+from ollama_client import async_ollama
+from model_scheduler import scheduler
+
+
+async def run_evaluation_matrix(models, questions, retrieve_context, on_cell=None,
+                                concurrency_per_model=1, grading_concurrency=4, pack_context=None):
+    """Testet alle Modelle mit allen Fragen in einer einzigen Event-Loop.
+
+    - Der Kontext wird pro Frage nur einmal gesucht (`retrieve_context(question)`, läuft im Thread).
+      Mit `pack_context(retrieved, model_name)` wird das Suchergebnis pro Modell zum Prompt-Kontext
+      (z. B. eigenes Token-Budget); Antwort und Bewertung nutzen denselben Kontext.
+    - Die Matrix läuft modellweise (über den Modell-Scheduler), damit Ollama jedes Modell nur
+      einmal laden muss; pro Modell laufen höchstens `concurrency_per_model` Anfragen gleichzeitig.
+    - Die Bewertung (synchroner OpenAI-Aufruf) läuft im Thread, sodass das Modell schon die nächste
+      Frage beantwortet bzw. das nächste Modell startet, während noch bewertet wird.
+    - `on_cell(cell)` wird für jede fertige Zelle aufgerufen (Reihenfolge = Fertigstellung).
+
+    Rückgabe wie bisher: (results, response_infos) in der Reihenfolge Modell x Frage.
+    """
+    start_time = time.time()
+    contexts = await asyncio.gather(*(asyncio.to_thread(retrieve_context, question) for question, _ in questions))
+
+    model_slots = asyncio.Semaphore(concurrency_per_model)
+    grading_slots = asyncio.Semaphore(grading_concurrency)
+    cells = {}
+    grading_tasks = []
+
+    def context_for(question_index, model_name):
+        if pack_context is None:
+            return contexts[question_index]
+        return pack_context(contexts[question_index], model_name)
+
+    async def grade_cell(model_index, model_name, question_index, times, response, hardware, context):
+        question, expected = questions[question_index]
+        async with grading_slots:
+            bewertung = await asyncio.to_thread(evaluate_response, response, expected, context, question)
+
+        info = OrderedDict([
+            ("Model", model_name),
+            ("Frage", question),
+            ("Response", response),
+            ("Antwortzeit", times),
+            ("Antwort Bewertung", bewertung),
+            ("Hardware Auslastung", hardware)
+        ])
+        cells[(model_index, question_index)] = (times, info)
+        if on_cell is not None:
+            on_cell({
+                "model": model_name,
+                "model_index": model_index,
+                "question_index": question_index,
+                "time": times,
+                "info": info,
+                "done": len(cells),
+                "total": len(models) * len(questions),
+            })
+
+    async def run_cell(model_index, model_name, question_index):
+        question, _ = questions[question_index]
+        logging.info(f"[{model_name}] '{question}'")
+        context = context_for(question_index, model_name)
+        async with model_slots:
+            try:
+                times, response, hardware = await query_model(model_name, question, context)
+            except Exception as e:
+                # Eine fehlerhafte Zelle soll den restlichen Test nicht abbrechen
+                logging.error(f"[{model_name}] '{question}' fehlgeschlagen: {str(e)}")
+                times, response, hardware = "Fehler", "Fehler", "Fehler"
+        # Die Bewertung läuft im Hintergrund weiter, während das Modell die nächsten Fragen beantwortet
+        grading_tasks.append(asyncio.create_task(
+            grade_cell(model_index, model_name, question_index, times, response, hardware, context)
+        ))
+
+    # Modellweise abarbeiten (bereits geladene Modelle zuerst), damit jedes Modell nur einmal geladen wird
+    resident = set(await asyncio.to_thread(scheduler.resident))
+    order = sorted(enumerate(models), key=lambda item: item[1] not in resident)
+    try:
+        for model_index, model_name in order:
+            await asyncio.to_thread(scheduler.enter, model_name)
+            try:
+                await asyncio.gather(*(run_cell(model_index, model_name, question_index) for question_index in range(len(questions))))
+            finally:
+                scheduler.leave(model_name)
+        await asyncio.gather(*grading_tasks)
+    finally:
+        # Nur die Session dieser Event-Loop (dieses Laufs) schließen, parallele Läufe haben ihre eigene
+        await async_ollama.close()
+
+    results = []
+    response_infos = []
+    for model_index, model_name in enumerate(models):
+        row = [model_name]  # Erste Spalte: Modellname
+        for question_index in range(len(questions)):
+            times, info = cells[(model_index, question_index)]
+            row.append(times)
+            response_infos.append(info)
+        results.append(row)
+    logging.info(f"Modelltest ({len(models)} x {len(questions)}) in {time.time() - start_time:.2f}s abgeschlossen")
+    return results, response_infos
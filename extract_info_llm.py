@@ -6,6 +6,123 @@ import os
 import re
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from ollama_client import ollama, OllamaError
+
+# Bei Änderungen am Einzel-Prompt erhöhen, damit gespeicherte Extraktionsergebnisse neu berechnet werden
+EXTRACTION_PROMPT_VERSION = 1
+
+class StreamingJSONExtractor:
+    """Inkrementeller Parser für die Modellausgabe: liefert jedes JSON-Objekt, sobald seine
+    schließende Klammer ankommt.
+
+    Es werden nur geschweifte Klammern außerhalb von Strings gezählt, sodass Listen-Klammern,
+    Code-Fences (```json) und Fließtext vor oder nach dem JSON keine Rolle spielen. `<think>`-Blöcke
+    (z. B. DeepSeek-R1) werden übersprungen. Ein abgeschnittenes letztes Objekt kostet nur
+    dieses Objekt, nicht die bereits gelieferten.
+    """
+
+    THINK_START = "<think>"
+    THINK_END = "</think>"
+
+    def __init__(self):
+        self._pending = ""     # noch nicht verarbeiteter Text (unvollständiges Tag)
+        self._buffer = []      # Zeichen des aktuellen Objekts
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._in_think = False
+        self.skipped = 0       # Objekte, die trotz geschlossener Klammern kein gültiges JSON waren
+
+    def feed(self, text):
+        """Verarbeitet ein Stück Text und gibt die darin abgeschlossenen Objekte zurück."""
+        objects = []
+        text = self._pending + text
+        self._pending = ""
+        i = 0
+        while i < len(text):
+            if self._in_think:
+                end = text.find(self.THINK_END, i)
+                if end == -1:
+                    # Ende des Tags könnte über zwei Tokens verteilt sein
+                    self._pending = text[max(i, len(text) - len(self.THINK_END) + 1):]
+                    return objects
+                self._in_think = False
+                i = end + len(self.THINK_END)
+                continue
+
+            char = text[i]
+            if char == "<" and not self._in_string:
+                rest = text[i:]
+                if rest.startswith(self.THINK_START):
+                    self._in_think = True
+                    i += len(self.THINK_START)
+                    continue
+                if self.THINK_START.startswith(rest) or self.THINK_END.startswith(rest):
+                    self._pending = rest
+                    return objects
+
+            if self._depth > 0:
+                self._buffer.append(char)
+                if self._in_string:
+                    if self._escape:
+                        self._escape = False
+                    elif char == "\\":
+                        self._escape = True
+                    elif char == '"':
+                        self._in_string = False
+                elif char == '"':
+                    self._in_string = True
+                elif char == "{":
+                    self._depth += 1
+                elif char == "}":
+                    self._depth -= 1
+                    if self._depth == 0:
+                        parsed = self._parse("".join(self._buffer))
+                        self._buffer = []
+                        if parsed is not None:
+                            objects.append(parsed)
+            elif char == "{":
+                self._depth = 1
+                self._buffer = [char]
+            i += 1
+        return objects
+
+    def _parse(self, candidate):
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            # Häufiger Modellfehler: Komma vor der schließenden Klammer
+            try:
+                return json.loads(re.sub(r",\s*([}\]])", r"\1", candidate))
+            except json.JSONDecodeError as e:
+                self.skipped += 1
+                logging.warning(f"Ungültiges JSON-Objekt in der Modellantwort übersprungen: {e}")
+                return None
+
+    @property
+    def truncated(self):
+        """True, wenn die Ausgabe mitten in einem Objekt endet."""
+        return self._depth > 0
+
+
+def parse_json_objects(text):
+    """Alle vollständigen JSON-Objekte einer kompletten Antwort (gleiche Regeln wie im Stream)."""
+    return StreamingJSONExtractor().feed(text)
+
+
+def stream_json_objects(model_name, messages, timeout=40, on_text=None):
+    """Streamt die Modellantwort und liefert jedes JSON-Objekt, sobald es vollständig ist."""
+    extractor = StreamingJSONExtractor()
+    for json_data in ollama.chat_stream(model_name, messages, timeout=timeout):
+        if "message" in json_data and "content" in json_data["message"]:
+            content = json_data["message"]["content"]
+            if on_text is not None:
+                on_text(content)
+            yield from extractor.feed(content)
+    if extractor.truncated:
+        logging.warning("Modellantwort endet mitten in einem JSON-Objekt (abgeschnitten).")
+
 
 def clean_documents(documents):
     cleaned_docs = []
@@ -23,8 +140,11 @@ def clean_documents(documents):
 
     return "\n".join(cleaned_docs)
 
-def extract_information_with_model(documents, model_name, num_source):
-    """ Extrahiert Name, Betreuer und Thema mithilfe des Modells aus den Dokumenten """
+def extract_information_with_model(documents, model_name, num_source, on_object=None):
+    """ Extrahiert Name, Betreuer und Thema mithilfe des Modells aus den Dokumenten
+
+    `on_object(obj)` wird für jedes Extraktionsobjekt aufgerufen, sobald es vollständig generiert ist.
+    """
     
     if not documents:
         return json.dumps({"Thema": "Unbekannt, keine Relevante Infos gefunden", "Betreuer": "Unbekannt, keine Relevante Infos gefunden", "Student": "Unbekannt, keine Relevante Infos gefunden"}), "Unbekannt"
@@ -70,22 +190,25 @@ def extract_information_with_model(documents, model_name, num_source):
         ]
         """
 
-    payload = {
-        "model": model_name,
-        "messages": [{"role": "user", "content": prompt}]
-    }
+    messages = [{"role": "user", "content": prompt}]
     start_time = time.time()
     try:
-        response = requests.post("http://localhost:11434/api/chat", json=payload, stream=True, timeout = 40)
-        response_text = ""
         logging.info(f"{model_name} Antwort:")
-        if response.status_code == 200:
-            for line in response.iter_lines(decode_unicode=True):
-                if line:
-                    json_data = json.loads(line)
-                    logging.info(json_data)
-                    if "message" in json_data and "content" in json_data["message"]:
-                        response_text += json_data["message"]["content"]  
+        parts = []
+        try:
+            for obj in stream_json_objects(model_name, messages, timeout=40, on_text=parts.append):
+                logging.info(f"Extraktionsobjekt fertig: {obj}")
+                if on_object is not None:
+                    on_object(obj)
+        except OllamaError as e:
+            logging.error(str(e))
+        except requests.exceptions.RequestException as e:
+            # Abbruch mitten im Stream (Timeout, Verbindungsabbruch): die bereits gelieferten Objekte
+            # bleiben gültig, nur ohne jede Ausgabe gilt die ganze Anfrage als fehlgeschlagen
+            if not parts:
+                raise
+            logging.error(f"Stream abgebrochen, Teilantwort wird verwendet: {str(e)}")
+        response_text = "".join(parts)
         end_time = time.time()
         elapsed_time = f"{round(end_time - start_time, 2)}s"
         logging.info(f"Antwortszeit: {elapsed_time}s")
@@ -93,16 +216,96 @@ def extract_information_with_model(documents, model_name, num_source):
         print(response_text)
         return response_text, elapsed_time
                  
-    except requests.exceptions.Timeout as e:
+    except requests.exceptions.RequestException as e:
         print(f"Fehler bei der Anfrage an das Modell: {e}")
         return json.dumps({
             "Thema": "Unbekannt, Modelverbindung fehlgeschlagen",
             "HS-Betreuer": "Unbekannt, Modelverbindung fehlgeschlagen",
             "Student": "Unbekannt, Modelverbindung fehlgeschlagen",
-            "Message": "Server timeout",
+            "Message": "Server timeout" if isinstance(e, requests.exceptions.Timeout) else "Verbindungsfehler",
         }), "Unbekannt"
     
 
+def extract_information_for_source(source, text, model_name, timeout=40):
+    """Extrahiert die Informationen aus genau einem Anmeldeformular, gibt (JSON-Objekt, Antwortzeit, ok) zurück.
+
+    Fehler (Timeout, Ollama-Fehler, kein gültiges JSON) betreffen nur diese Datei und werden im
+    Ergebnis vermerkt (ok = False).
+    """
+    prepared_document = clean_documents({source: text})
+    prompt = f"""
+        **WICHTIG: Halte dich exakt an diese Anweisungen.**
+
+        Du erhältst den Text **eines einzigen Bachelorarbeit-Anmeldeformulars**.
+        Extrahiere daraus folgende Informationen:
+
+        - **Thema der Bachelorarbeit**
+        - **Name des Studenten**
+        - **Matrikelnummer des Studenten**
+        - **E-Mail-Adresse des Studenten**
+        - **Name des Hochschulbetreuers (HS-Betreuer)**
+        - **Name des externen Betreuers (Externe Betreuer)**
+
+        **Antwortformat (zwingend einzuhalten!):**
+        - Gib ausschließlich **ein gültiges JSON-Objekt** zurück, keine Liste.
+        - Keine Erklärungen, keine zusätzlichen Sätze, keine Einleitungen, keine Kommentare.
+
+        ```json
+        {{
+            "Thema": "Thema oder 'Unbekannt' falls nicht vorhanden",
+            "Student": "Vollständiger Name oder 'Unbekannt' falls nicht vorhanden",
+            "Matrikelnummer": "Matrikelnummer oder 'Unbekannt' falls nicht vorhanden",
+            "E-Mail": "E-Mail-Adresse oder 'Unbekannt' falls nicht vorhanden",
+            "HS-Betreuer": "Name des Hochschulbetreuers oder 'Unbekannt' falls nicht vorhanden",
+            "Externer Betreuer": "Name des externen Betreuers oder 'Unbekannt' falls nicht vorhanden"
+        }}
+        ```
+
+        **Anmeldeformular:**
+        {prepared_document}
+        """
+
+    messages = [{"role": "user", "content": prompt}]
+    start_time = time.time()
+    try:
+        # Das erste vollständige Objekt genügt, der Stream wird danach geschlossen
+        result = next(stream_json_objects(model_name, messages, timeout=timeout), None)
+        elapsed_time = f"{round(time.time() - start_time, 2)}s"
+        if result is None:
+            raise ValueError("Es wurde in der Antwort des Modells kein JSON gefunden")
+        ok = True
+    except (requests.exceptions.RequestException, OllamaError, ValueError) as e:
+        elapsed_time = f"{round(time.time() - start_time, 2)}s"
+        logging.error(f"Extraktion für {source} fehlgeschlagen: {str(e)}")
+        result = {
+            "Thema": "Unbekannt, Extraktion fehlgeschlagen",
+            "Student": "Unbekannt, Extraktion fehlgeschlagen",
+            "HS-Betreuer": "Unbekannt, Extraktion fehlgeschlagen",
+            "Message": str(e),
+        }
+        ok = False
+
+    result["Dateiname"] = os.path.basename(source)
+    result["Antwortzeit"] = elapsed_time
+    logging.info(f"Extraktion für {source} in {elapsed_time}")
+    return result, elapsed_time, ok
+
+def extract_information_per_source(documents, model_name, max_workers=2, timeout=40):
+    """Fan-out: extrahiert jede Quelle einzeln mit begrenzter Parallelität.
+
+    Liefert (source, Ergebnis, ok) in der Reihenfolge der Fertigstellung, eine langsame oder
+    fehlgeschlagene Datei hält die anderen also nicht auf.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(extract_information_for_source, source, text, model_name, timeout): source
+            for source, text in documents.items()
+        }
+        for future in as_completed(futures):
+            result, _, ok = future.result()
+            yield futures[future], result, ok
+
+
 def extract_json_from_text(text):
     """Extrahiert den JSON-Teil aus dem Text und gibt ihn als Python-Objekt zurück."""
     # Entferne den Markdown-Codeblock (``` ... ```)
@@ -164,26 +367,17 @@ def save_model_response_to_json(response_data, elapsed_time, num_source, output_
         print(f"Fehler beim Parsen des JSON: {e}")
 
 def save_model_response_to_json_output(response_data, elapsed_time, num_source):
-    cleaned_response = extract_json_from_text(response_data)
-    
-    try:
-        if isinstance(cleaned_response, str):  
-            json_data = json.loads(cleaned_response)  # String in JSON umwandeln
-        else:
-            json_data = cleaned_response  # Falls es schon ein Dict oder eine Liste ist, direkt nutzen
-
-        # Falls es ein einzelnes Dict ist, in eine Liste verpacken
-        if isinstance(json_data, dict):  
-            json_data = [json_data]  
+    # Jedes vollständige Objekt zählt einzeln, abgeschnittene oder fehlerhafte Teile kosten nur sich selbst
+    json_data = parse_json_objects(response_data)
+    if not json_data:
+        logging.info("Kein JSON gefunden!")
+        json_data = [{"message": "Es wurde in der Antwort des Modells kein JSON gefunden: Model hat nicht wie gefordert geantwortet"}]
 
-        for data in json_data: 
-            data["Antwortzeit"] = elapsed_time
-            data["Anzahl der untersuchten Dateien"] = num_source
-        
-        return json_data
-    except json.JSONDecodeError as e:
-        print(f"Fehler beim Parsen des JSON: {e}")
-        return None 
+    for data in json_data: 
+        data["Antwortzeit"] = elapsed_time
+        data["Anzahl der untersuchten Dateien"] = num_source
+    
+    return json_data
 
 if __name__ == "__main__":
     
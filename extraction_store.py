@@ -0,0 +1,80 @@
+import os
+import json
+import time
+import logging
+import threading
+
+
+class ExtractionStore:
+    """Persistente Extraktionsergebnisse pro Dokument.
+
+    Schlüssel: (Inhalts-Hash der Quelle, Modell, Prompt-Version). Ein erneuter Klick auf
+    "Extract all Infos" muss das Modell damit nur für neue oder geänderte Dokumente aufrufen.
+    Beim Löschen einer Quelle werden ihre Ergebnisse entfernt, eine neue Prompt-Version macht
+    alte Ergebnisse automatisch ungültig.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._results = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._results = json.load(f)
+
+    @staticmethod
+    def _key(content_hash, model, prompt_version):
+        return f"{content_hash}|{model}|{prompt_version}"
+
+    def get(self, content_hash, model, prompt_version):
+        """Gespeichertes Ergebnis (Kopie) oder None."""
+        if content_hash is None:
+            return None
+        with self._lock:
+            entry = self._results.get(self._key(content_hash, model, prompt_version))
+            return None if entry is None else dict(entry["result"])
+
+    def put(self, content_hash, model, prompt_version, source, result):
+        if content_hash is None:
+            return
+        with self._lock:
+            self._results[self._key(content_hash, model, prompt_version)] = {
+                "source": source,
+                "created": time.time(),
+                "result": result,
+            }
+            self._save()
+
+    def evict_source(self, source):
+        """Entfernt alle Ergebnisse einer Quelle, gibt die Anzahl zurück."""
+        with self._lock:
+            keys = [key for key, entry in self._results.items() if entry["source"] == source]
+            for key in keys:
+                del self._results[key]
+            if keys:
+                self._save()
+            return len(keys)
+
+    def prune(self, valid_hashes):
+        """Entfernt Ergebnisse zu Inhalten, die keiner Quelle mehr gehören (z. B. nach einem Neustart)."""
+        valid_hashes = set(valid_hashes)
+        with self._lock:
+            keys = [key for key in self._results if key.split("|", 1)[0] not in valid_hashes]
+            for key in keys:
+                del self._results[key]
+            if keys:
+                self._save()
+        if keys:
+            logging.info(f"{len(keys)} verwaiste Extraktionsergebnisse entfernt.")
+        return len(keys)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._results)
+
+    def _save(self):
+        tmp_path = self.path + ".part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._results, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
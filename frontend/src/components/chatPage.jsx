@@ -36,18 +36,22 @@ function ChatPage() {
   useEffect(() => {
     // Die Socket-Verbindung wird geöffnet, sobald die Komponente gerendert wird,
     // Event-Listener: Die Callback-Funktion wird ausgeführt, wenn eine Nachricht ankommt (läuft asynchron).
-    socket.on('response', (data) => {
+    // `ack` wird vom Server regelmäßig mitgeschickt (Backpressure): Bestätigen, sobald die Nachricht verarbeitet ist
+    // Der Server sendet gebündelte Frames ({frame, count}) oder einzelne Antworten ({response})
+    socket.on('response', (data, ack) => {
+      if (typeof ack === 'function') ack();
+      const text = data.frame ?? data.response ?? '';
       setMessages((prevMessages) => {
         const lastMessage = prevMessages[prevMessages.length - 1];
         if (lastMessage && lastMessage.sender === 'bot' && !lastMessage.complete) {
           // letzte Bot-Nachricht noch unvollständig -> text anhängen
           return [
             ...prevMessages.slice(0, -1),
-            { ...lastMessage, text: lastMessage.text + data.response },
+            { ...lastMessage, text: lastMessage.text + text },
           ];
         }
         // Falls die letzte Nachricht vom User stammt, wird eine neue Bot-Nachricht erstellt.
-        return [...prevMessages, { sender: 'bot', text: data.response, complete: false }];
+        return [...prevMessages, { sender: 'bot', text: text, complete: false }];
       });
     });
     socket.on('response_time', (data) => {
@@ -63,6 +67,19 @@ function ChatPage() {
         return prevMessages;
       });
     });
+    // Generierung wurde auf Wunsch abgebrochen: bisherige Antwort als (abgebrochen) vollständig markieren
+    socket.on('stopped', (data) => {
+      setMessages((prevMessages) => {
+        const lastMessage = prevMessages[prevMessages.length - 1];
+        if (lastMessage && lastMessage.sender === 'bot') {
+          return [
+            ...prevMessages.slice(0, -1),
+            { ...lastMessage, complete: true, stopped: true, time: data.elapsed }
+          ];
+        }
+        return [...prevMessages, { sender: 'bot', text: 'Generierung abgebrochen.', complete: true, stopped: true, time: data.elapsed }];
+      });
+    });
     socket.on('timeout', () => {
       console.log("Timeout-Event empfangen!");
       setTimeoutState(true)
@@ -70,6 +87,8 @@ function ChatPage() {
     // in Produktion wird nicht benötigt
     socket.on("connect", () => {
       console.log("Verbunden mit dem Server", socket.id);
+      // Bündelungsfenster für Antwort-Tokens (max. alle 50 ms bzw. ab 64 Zeichen ein Frame)
+      socket.emit('stream_config', { interval_ms: 50, max_chars: 64 });
       setServerConnected(true);
     });
 
@@ -91,6 +110,7 @@ function ChatPage() {
       socket.off('response');
       socket.off('error');
       socket.off('response_time');
+      socket.off('stopped');
       socket.off('timeout');
       socket.off("connect");
       socket.off("connect_error");
@@ -98,6 +118,16 @@ function ChatPage() {
     };
   }, []);
 
+  // Läuft gerade eine Generierung? (letzte Nachricht vom User oder unvollständige Bot-Antwort)
+  const lastMsg = messages[messages.length - 1];
+  const isGenerating = serverconnected && !timeout && !!lastMsg &&
+    (lastMsg.sender === 'user' || (lastMsg.sender === 'bot' && !lastMsg.complete));
+
+  // Laufende Generierung serverseitig abbrechen, der Server antwortet mit 'stopped'
+  const stopGeneration = () => {
+    socket.emit('stop');
+  };
+
   // Scrollen bei jeder Änderung von messages
   useEffect(() => {
     scrollToBottom();
@@ -208,7 +238,7 @@ function ChatPage() {
   }
   return (
     <header className="App-header">
-      <Sidebar selectedFile={selectedFile} setSelectedFile={setSelectedFile} Model={Model} serverconnected={serverconnected} />
+      <Sidebar selectedFile={selectedFile} setSelectedFile={setSelectedFile} Model={Model} serverconnected={serverconnected} socket={socket} />
       <div className="hinweise p-4 bg-gray-100 rounded-xl shadow-md text-gray-800 space-y-4">
         <div>
           <h2 className="text-xl font-bold mb-2">📄 PDF-Abfragen</h2>
@@ -245,7 +275,7 @@ function ChatPage() {
           <option value="DeepSeek">DeepSeek</option>
           <option value="Mistral">Mistral</option>
         </select>
-        <TestModels selectedFile={selectedFile} />
+        <TestModels selectedFile={selectedFile} socket={socket} />
       </div>
       <h1 className="main-title">LLMs Test Umgebung</h1>
 
@@ -299,6 +329,9 @@ function ChatPage() {
             )}
         </div>
         <button onClick={sendTextInputMessage}>Send</button>
+        {isGenerating && (
+          <button className="stop" onClick={stopGeneration}>Stop</button>
+        )}
       </div>
 
       <div className="response-list">
@@ -312,9 +345,12 @@ function ChatPage() {
                   .replace(/\*\*(.*?)\*\*/g, '<strong>$1</strong>'),  // Markdown -> HTML
               }}
             ></p>
-            {msg.sender === 'bot' && msg.complete && (
+            {msg.sender === 'bot' && msg.complete && !msg.stopped && (
               <div className="infos"><p >⏳ Antwortzeit: {msg.time} Sekunden  </p><p> Model : {msg.model}</p></div>
             )}
+            {msg.sender === 'bot' && msg.stopped && (
+              <div className="infos"><p>⏹ Abgebrochen nach {msg.time} Sekunden</p></div>
+            )}
           </div>
         ))}
         {timeout && (
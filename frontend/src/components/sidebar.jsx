@@ -1,12 +1,102 @@
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import "../styles/Sidebar.css";
 
-function Sidebar({ selectedFile, setSelectedFile, Model, serverconnected }) {
+const STAGE_LABELS = {
+  saved: "hochgeladen",
+  parsed: "gelesen",
+  chunked: "gechunkt",
+  embedded: "eingebettet",
+  persisted: "gespeichert",
+  failed: "fehlgeschlagen",
+};
+// Abfrageintervall für den Job-Status: ohne Socket-Verbindung häufig, sonst nur als Rückfall, falls ingest_done ausbleibt
+const JOB_POLL_INTERVAL = 2000;
+const JOB_POLL_INTERVAL_WITH_SOCKET = 10000;
+
+function Sidebar({ selectedFile, setSelectedFile, Model, serverconnected, socket }) {
   const [isCollapsed, setIsCollapsed] = useState(false);
   const [pdfFiles, setPdfFiles] = useState(() => {
     const storedPdfs = localStorage.getItem("pdfs");
     return storedPdfs ? JSON.parse(storedPdfs) : [];
   });
+  // Fortschritt der Hintergrund-Verarbeitung pro Datei: { dateiname: stage }
+  const [uploadProgress, setUploadProgress] = useState({});
+  // Bereits abgeschlossene Jobs (Ergebnis kann per Socket und per Abfrage ankommen, wird aber nur einmal übernommen)
+  const finishedJobs = useRef(new Set());
+
+  // Dokumentliste mit dem Quellenverzeichnis des Servers abgleichen (Server ist maßgeblich)
+  useEffect(() => {
+    if (!serverconnected) return;
+    fetch("http://localhost:5000/api/sources")
+      .then((response) => response.ok ? response.json() : Promise.reject(response.statusText))
+      .then((result) => {
+        const serverFiles = result.sources.map(({ name, url }) => ({ name, url }));
+        setPdfFiles(serverFiles);
+        localStorage.setItem("pdfs", JSON.stringify(serverFiles));
+      })
+      .catch((error) => console.error("Fehler beim Laden der Dokumentliste:", error));
+  }, [serverconnected]);
+
+  const finishIngestJob = (result) => {
+    if (finishedJobs.current.has(result.job_id)) return;
+    finishedJobs.current.add(result.job_id);
+    console.log("Verarbeitung abgeschlossen:", result);
+    if (result.timings) {
+      console.table(result.timings); // Verarbeitungsdauer pro Datei
+    }
+    setPdfFiles((prevFiles) => {
+      const newFiles = result.files.filter(file => !prevFiles.some(prevFile => prevFile.name === file.name));
+      const allFiles = [...prevFiles, ...newFiles];
+      localStorage.setItem("pdfs", JSON.stringify(allFiles));
+      return allFiles;
+    });
+    setUploadProgress((prev) => {
+      const remaining = { ...prev };
+      result.files.forEach(file => delete remaining[file.name]);
+      result.error.forEach(name => delete remaining[name]);
+      return remaining;
+    });
+    if (result.error.length > 0) {
+      alert(result.error.join("\n") + "\nwurden nicht richtig gelesen, daher sind sie nicht beigefügt.");
+    }
+  };
+
+  // Job-Status über /api/jobs abfragen, bis der Job fertig ist (ohne Socket-Verbindung oder falls ingest_done verloren geht)
+  const pollIngestJob = (jobId, interval) => {
+    const poll = async () => {
+      if (finishedJobs.current.has(jobId)) return;
+      try {
+        const response = await fetch(`http://localhost:5000/api/jobs/${jobId}`);
+        if (!response.ok) throw new Error(response.statusText);
+        const job = await response.json();
+        setUploadProgress((prev) => ({ ...prev, ...job.files }));
+        if (job.status === "done") {
+          finishIngestJob({ job_id: jobId, ...job.result });
+          return;
+        }
+        if (job.status === "failed") {
+          finishIngestJob({ job_id: jobId, files: [], error: Object.keys(job.files), message: job.result?.error });
+          return;
+        }
+      } catch (error) {
+        console.error("Fehler beim Abfragen des Jobs:", error);
+      }
+      setTimeout(poll, interval);
+    };
+    setTimeout(poll, interval);
+  };
+
+  // Fortschritt und Abschluss der Ingestion-Jobs vom Server empfangen
+  useEffect(() => {
+    socket.on("ingest_progress", (data) => {
+      setUploadProgress((prev) => ({ ...prev, [data.file]: data.stage }));
+    });
+    socket.on("ingest_done", finishIngestJob);
+    return () => {
+      socket.off("ingest_progress");
+      socket.off("ingest_done");
+    };
+  }, [socket]);
 
   useEffect(() => {
     const handleClickOutsideSidebar = (event) => {
@@ -48,6 +138,9 @@ function Sidebar({ selectedFile, setSelectedFile, Model, serverconnected }) {
     // Erstellt ein FormData-Objekt, das verwendet wird, um Formulardaten (einschließlich Dateien) zu speichern und an den Server zu senden (Dateien wie Bilder und PDFs können nicht in json form umgewandelt).
     const formData = new FormData();
     newFiles.forEach(file => formData.append("AllPdfs", file));
+    if (socket.id) {
+      formData.append("sid", socket.id); // Fortschritt wird per Socket.IO an diesen Client gesendet
+    }
 
     try {
       const response = await fetch("http://localhost:5000/api/embedding", {
@@ -59,17 +152,18 @@ function Sidebar({ selectedFile, setSelectedFile, Model, serverconnected }) {
         throw new Error(`Fehler beim Upload: ${response.statusText}`);
       }
 
+      // Server antwortet sofort mit einer Job-ID, die Verarbeitung läuft im Hintergrund
       const result = await response.json();
-      console.log("Upload erfolgreich:", result);
+      console.log("Upload erfolgreich, Job:", result.job_id);
+      pollIngestJob(result.job_id, socket.id ? JOB_POLL_INTERVAL_WITH_SOCKET : JOB_POLL_INTERVAL);
+      // Kleine Jobs können schon vor dieser Antwort fertig gemeldet worden sein
+      if (finishedJobs.current.has(result.job_id)) return;
 
-      setPdfFiles((prevFiles) => {
-        const allFiles = [...prevFiles, ...result.files];
-        localStorage.setItem("pdfs", JSON.stringify(allFiles));
-        return allFiles;
+      setUploadProgress((prev) => {
+        const progress = { ...prev };
+        result.files.forEach(name => progress[name] = "saved");
+        return progress;
       });
-      if (result.error.length > 0) {
-        alert(result.error.split(",").join("\n") + "\nwurden nicht richtig gelesen, daher sind sie nicht beigefügt.");
-      }
     } catch (error) {
       console.error("Fehler:", error);
       alert("Upload fehlgeschlagen!");
@@ -104,6 +198,36 @@ function Sidebar({ selectedFile, setSelectedFile, Model, serverconnected }) {
     }
   };
 
+  // Sammelt die Ergebnisse einer Fan-out-Extraktion, zeigt den Fortschritt im Button
+  const waitForExtraction = (runId, button) => {
+    let cancel;
+    const promise = new Promise((resolve, reject) => {
+      const results = [];
+      const handleResult = (data) => {
+        if (data.run_id !== runId) return;
+        results.push(data.result);
+        button.innerHTML = `${data.done}/${data.total} Dateien...<span class="loader"></span>`;
+      };
+      const handleDone = (data) => {
+        if (data.run_id !== runId) return;
+        cancel();
+        if (data.error && data.results.length === 0) {
+          reject(new Error(data.error));
+          return;
+        }
+        resolve(data.results ?? results);
+      };
+      cancel = () => {
+        socket.off('extraction_result', handleResult);
+        socket.off('extraction_done', handleDone);
+      };
+      socket.on('extraction_result', handleResult);
+      socket.on('extraction_done', handleDone);
+    });
+    promise.cancel = cancel;
+    return promise;
+  };
+
   const createJson = async () => {
     const button = document.getElementById("createjson"); //DOM direkt Manipulieren, keine useState ist nötig
     const originalText = button.innerHTML;
@@ -111,15 +235,25 @@ function Sidebar({ selectedFile, setSelectedFile, Model, serverconnected }) {
     button.disabled = true;
     button.innerHTML = `Wird geladen...<span class="loader"></span>`;
     try {
+      // Mit Socket-Verbindung: jede Datei einzeln extrahieren, Ergebnisse kommen pro Datei.
+      // Die Listener werden vor dem Request registriert, damit kein frühes Ergebnis verloren geht.
+      const perSource = socket && socket.connected;
+      const runId = perSource ? crypto.randomUUID() : null;
+      const extraction = perSource ? waitForExtraction(runId, button) : null;
       const response = await fetch("http://localhost:5000/api/getjson", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
         },
-        body: JSON.stringify({ model: Model }),
+        body: JSON.stringify(perSource ? { model: Model, mode: "per_source", sid: socket.id, run_id: runId } : { model: Model }),
       });
 
-      const results = await response.json();
+      let results = await response.json();
+      if (response.status === 202) {
+        results = await extraction;
+      } else if (extraction) {
+        extraction.cancel();
+      }
 
       // Prüfen, ob results ein Array ist und model hinzufügen
       if (Array.isArray(results)) {
@@ -205,6 +339,15 @@ function Sidebar({ selectedFile, setSelectedFile, Model, serverconnected }) {
           </div>
         ))}
 
+        {Object.entries(uploadProgress).map(([name, stage]) => (
+          <div className="pdfs upload-progress" key={`progress-${name}`}>
+            <img src="./pdf-icon.png" alt="PDF" className="pdf-icon" />
+            <p title={name} style={{ color: "white" }}>
+              {name} ({STAGE_LABELS[stage] || stage}...)
+            </p>
+          </div>
+        ))}
+
         <input
           id="fileInput"
           type="file"
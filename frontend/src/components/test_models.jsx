@@ -1,25 +1,57 @@
-import React, { useState } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import "../styles/test_models.css";
 import JSZip from "jszip";
 
-function TestModels({ selectedFile }) {
-    const handleClick = async () => {
-        const button = document.getElementById("testModels");
-        const originalText = button.innerHTML;
+function TestModels({ selectedFile, socket }) {
+    const [running, setRunning] = useState(false);
+    const [progress, setProgress] = useState(null);   // { done, total, last }
+    const runIdRef = useRef(null);
+
+    // Ergebnisse kommen Zelle für Zelle per Socket, am Ende die komplette Matrix
+    useEffect(() => {
+        if (!socket) return;
+        const handleCell = (cell) => {
+            if (cell.run_id !== runIdRef.current) return;
+            setProgress({ done: cell.done, total: cell.total, last: `${cell.model}: ${cell.info["Frage"]} (${cell.time})` });
+        };
+        const handleDone = (data) => {
+            if (data.run_id !== runIdRef.current) return;
+            runIdRef.current = null;
+            setRunning(false);
+            setProgress(null);
+            if (data.error || !Array.isArray(data.results) || data.results.length === 0) {
+                console.error("Fehler beim testen:", data.error);
+                alert("Testen fehlgeschlagen!");
+                return;
+            }
+            console.log(data)
+            downloadCSVandJSON(data)
+        };
+        socket.on('testmodel_cell', handleCell);
+        socket.on('testmodel_done', handleDone);
+        return () => {
+            socket.off('testmodel_cell', handleCell);
+            socket.off('testmodel_done', handleDone);
+        };
+    }, [socket]);
 
-        button.disabled = true;
-        button.innerHTML = `Wird geladen...<span class="loader"></span>`;
+    const handleClick = async () => {
+        if (running) return;
         try {
             if (!selectedFile) {
                 alert("Bitte wählen Sie eine PDF aus.");
                 return;
             }
+            // run_id vor dem Request festlegen, damit auch Events ankommen, die vor der 202-Antwort gesendet werden
+            const runId = crypto.randomUUID();
+            runIdRef.current = runId;
+            setRunning(true);
             const request = await fetch("http://localhost:5000/api/testmodel", {
                 method: "POST",
                 headers: {
                     "Content-Type": "application/json"
                 },
-                body: JSON.stringify({ file: selectedFile })
+                body: JSON.stringify({ file: selectedFile, sid: socket?.id, run_id: runId })
             });
 
             if (!request.ok) {
@@ -28,6 +60,17 @@ function TestModels({ selectedFile }) {
             
             const response = await request.json()
 
+            // 202: Test läuft im Hintergrund, Ergebnisse folgen per Socket
+            if (request.status === 202) {
+                // testmodel_done kann schon vor der Antwort angekommen sein, dann ist der Lauf bereits beendet
+                if (runIdRef.current === runId) {
+                    setProgress((prev) => prev ?? { done: 0, total: response.models.length * response.questions.length, last: null });
+                }
+                return;
+            }
+            runIdRef.current = null;
+            setRunning(false);
+
             if (!Array.isArray(response.results) || response.results.length === 0) {
                 throw new Error("Ungültige oder leere Antwort vom Server.");
             }
@@ -37,9 +80,8 @@ function TestModels({ selectedFile }) {
         } catch (error) {
             console.error("Fehler beim testen:", error);
             alert("Testen fehlgeschlagen!");
-        } finally {
-            button.disabled = false;
-            button.innerHTML = originalText;
+            runIdRef.current = null;
+            setRunning(false);
         }
     }
     return (
@@ -47,8 +89,12 @@ function TestModels({ selectedFile }) {
              <button
             id="testModels"
             onClick={handleClick}
+            disabled={running}
         >
-            Modelle testen</button>
+            {running ? (
+                <>{progress ? `${progress.done}/${progress.total}` : "Wird geladen..."}<span className="loader"></span></>
+            ) : "Modelle testen"}</button>
+            {running && progress?.last && <div className="progress">Zuletzt fertig: {progress.last}</div>}
             <div class="hide">Es werden alle Modelle getestet und es kann eine Weile dauern. Im Log kann verfolgt werden, was im Hintergrund passiert.</div>
         </div>
     );
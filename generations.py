@@ -0,0 +1,114 @@
+import time
+import logging
+import threading
+
+
+class Generation:
+    """Eine laufende Generierung eines Clients, die von außen abgebrochen werden kann."""
+
+    def __init__(self, sid, model):
+        self.sid = sid
+        self.model = model
+        self.started = time.time()
+        self.cancelled = threading.Event()
+        self.reason = None
+        self._closer = None
+        self._lock = threading.Lock()
+
+    def attach(self, response):
+        """Merkt sich die Upstream-Verbindung; wurde schon abgebrochen, wird sie sofort geschlossen."""
+        with self._lock:
+            self._closer = response.close
+            close_now = self.cancelled.is_set()
+        if close_now:
+            response.close()
+
+    def cancel(self, reason):
+        with self._lock:
+            if self.cancelled.is_set():
+                return False
+            self.reason = reason
+            self.cancelled.set()
+            closer = self._closer
+        # Schließen der Verbindung beendet die Generierung in Ollama und gibt den Modell-Slot frei
+        if closer is not None:
+            try:
+                closer()
+            except Exception as e:
+                logging.warning(f"Upstream-Verbindung konnte nicht geschlossen werden: {str(e)}")
+        return True
+
+    @property
+    def elapsed(self):
+        return time.time() - self.started
+
+
+class GenerationRegistry:
+    """Laufende Generierungen pro Socket-Session.
+
+    Pro Session läuft höchstens eine Generierung; eine neue Nachricht bricht die vorherige ab.
+    Aus der mittleren Dauer abgeschlossener Generierungen pro Modell wird geschätzt, wie viel
+    Generierungszeit durch Abbrüche eingespart wurde.
+    """
+
+    def __init__(self):
+        self._by_sid = {}
+        self._avg_duration = {}
+        self._lock = threading.Lock()
+        self.cancelled = 0
+        self.saved_seconds = 0.0
+
+    def start(self, sid, model):
+        generation = Generation(sid, model)
+        with self._lock:
+            previous = self._by_sid.get(sid)
+            self._by_sid[sid] = generation
+        if previous is not None:
+            self._cancel(previous, "new_message")
+        return generation
+
+    def cancel(self, sid, reason):
+        """Bricht die laufende Generierung der Session ab; liefert {"elapsed", "estimated_saved"} oder None."""
+        with self._lock:
+            generation = self._by_sid.get(sid)
+        if generation is None:
+            return None
+        return self._cancel(generation, reason)
+
+    def _cancel(self, generation, reason):
+        if not generation.cancel(reason):
+            return None
+        elapsed = generation.elapsed
+        with self._lock:
+            avg = self._avg_duration.get(generation.model)
+            estimated_saved = max(0.0, avg - elapsed) if avg is not None else 0.0
+            self.cancelled += 1
+            self.saved_seconds += estimated_saved
+        logging.info(
+            f"Generierung ({generation.model}) abgebrochen ({reason}) nach {elapsed:.2f}s, "
+            f"geschätzte Einsparung: {estimated_saved:.2f}s"
+        )
+        return {"elapsed": round(elapsed, 2), "estimated_saved": round(estimated_saved, 2)}
+
+    def finish(self, generation, completed=False):
+        """Entfernt die Generierung; nur vollständige Modellläufe (`completed`) fließen in die mittlere Dauer ein.
+
+        Antworten aus dem Cache sowie Timeouts und Fehler würden die Schätzung der Einsparung verfälschen.
+        """
+        with self._lock:
+            if self._by_sid.get(generation.sid) is generation:
+                del self._by_sid[generation.sid]
+            if completed and not generation.cancelled.is_set():
+                duration = generation.elapsed
+                avg = self._avg_duration.get(generation.model)
+                # Gleitender Mittelwert, damit sich die Schätzung an Modell und Hardware anpasst
+                self._avg_duration[generation.model] = duration if avg is None else 0.8 * avg + 0.2 * duration
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._by_sid),
+                "cancelled": self.cancelled,
+                "estimated_saved_seconds": round(self.saved_seconds, 2),
+                "avg_duration_per_model": {model: round(avg, 2) for model, avg in self._avg_duration.items()},
+            }
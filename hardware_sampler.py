@@ -0,0 +1,133 @@
+import os
+import time
+import logging
+import threading
+import psutil
+from collections import deque
+
+
+class HardwareSampler:
+    """Ein einziger Hintergrund-Sampler für CPU, RAM und einzelne Prozesse (Server, Ollama).
+
+    Die Messwerte landen in einem Ringpuffer. Anfragen messen nicht selbst, sondern fragen nur
+    das Zeitfenster ihrer Laufzeit ab, dadurch überschneiden sich parallele Messungen nicht und
+    kosten praktisch nichts.
+    """
+
+    def __init__(self, interval=1.0, capacity=3600, process_names=("ollama",), refresh_every=30):
+        self.interval = interval
+        self.process_names = tuple(process_names)
+        self.refresh_every = refresh_every
+        self._samples = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._started = False
+        self._processes = {}
+        self._tick = 0
+
+    def start(self, start_worker=None):
+        """Startet den Sampler einmalig, `start_worker` z. B. `socketio.start_background_task`."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        if start_worker is None:
+            threading.Thread(target=self._run, daemon=True, name="hardware-sampler").start()
+        else:
+            start_worker(self._run)
+
+    def _run(self):
+        psutil.cpu_percent(interval=None)  # erster Wert ist immer 0, dient nur als Referenz
+        while True:
+            try:
+                self._sample()
+            except Exception as e:
+                logging.warning(f"Hardware-Messung fehlgeschlagen: {str(e)}")
+            time.sleep(self.interval)
+
+    def _refresh_processes(self):
+        """Sucht die beobachteten Prozesse (teuer, deshalb nur alle `refresh_every` Messungen)."""
+        processes = {"server": self._processes.get("server") or psutil.Process(os.getpid())}
+        for proc in psutil.process_iter(["name"]):
+            name = (proc.info.get("name") or "").lower()
+            for wanted in self.process_names:
+                if wanted in name:
+                    key = f"{wanted}:{proc.pid}"
+                    processes[key] = self._processes.get(key) or proc
+        self._processes = processes
+
+    def _sample(self):
+        if self._tick % self.refresh_every == 0:
+            self._refresh_processes()
+        self._tick += 1
+
+        processes = {}
+        for key, proc in list(self._processes.items()):
+            try:
+                with proc.oneshot():
+                    processes[key] = (proc.cpu_percent(interval=None), proc.memory_info().rss / (1024 * 1024))
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                self._processes.pop(key, None)
+
+        sample = (time.time(), psutil.cpu_percent(interval=None), psutil.virtual_memory().percent, processes)
+        with self._lock:
+            self._samples.append(sample)
+
+    def latest(self):
+        with self._lock:
+            return self._samples[-1] if self._samples else None
+
+    def window(self, start, end=None):
+        """Zusammenfassung der Messwerte zwischen `start` und `end` (time.time()).
+
+        Ist das Fenster kürzer als das Messintervall, wird die nächstliegende Messung verwendet.
+        """
+        end = time.time() if end is None else end
+        with self._lock:
+            samples = [sample for sample in self._samples if start <= sample[0] <= end]
+            if not samples and self._samples:
+                samples = [min(self._samples, key=lambda sample: abs(sample[0] - end))]
+        if not samples:
+            return None
+
+        # Mehrere Prozesse gleichen Namens (z. B. Ollama-Server und Runner) pro Messung summieren
+        per_process = {}
+        for _, _, _, processes in samples:
+            totals = {}
+            for key, (cpu, rss_mb) in processes.items():
+                name = key.split(":")[0]
+                cpu_total, rss_total = totals.get(name, (0.0, 0.0))
+                totals[name] = (cpu_total + cpu, rss_total + rss_mb)
+            for name, (cpu, rss_mb) in totals.items():
+                stats = per_process.setdefault(name, {"cpu": [], "rss_mb": []})
+                stats["cpu"].append(cpu)
+                stats["rss_mb"].append(rss_mb)
+
+        return {
+            "samples": len(samples),
+            "avg_cpu": sum(sample[1] for sample in samples) / len(samples),
+            "max_cpu": max(sample[1] for sample in samples),
+            "avg_ram": sum(sample[2] for sample in samples) / len(samples),
+            "max_ram": max(sample[2] for sample in samples),
+            "processes": {
+                name: {
+                    "avg_cpu": round(sum(stats["cpu"]) / len(stats["cpu"]), 2),
+                    "max_rss_mb": round(max(stats["rss_mb"]), 1),
+                }
+                for name, stats in per_process.items()
+            },
+        }
+
+
+def format_usage(usage):
+    """Kurzer Text für Logs und den Modelltest."""
+    if usage is None:
+        return "CPU/RAM nicht verfügbar"
+    text = f"Durchschnittliche CPU: {usage['avg_cpu']:.2f}%, RAM: {usage['avg_ram']:.2f}%"
+    ollama = usage["processes"].get("ollama")
+    if ollama is not None:
+        text += f", Ollama CPU: {ollama['avg_cpu']:.2f}%, Ollama RAM: {ollama['max_rss_mb']:.0f} MB"
+    return text
+
+
+# Gemeinsamer Sampler für Server und Modelltests
+sampler = HardwareSampler()
@@ -0,0 +1,83 @@
+import os
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from PDFProce import PDFProcessor
+
+# Prozess-Pool wird erst beim ersten Upload erstellt und danach wiederverwendet,
+# damit die Startkosten der Worker-Prozesse nicht bei jedem Request anfallen.
+_executor = None
+_executor_workers = 0
+# Der Server hat beim ersten Upload bereits Threads (Socket.IO, Hardware-Sampler, Modell-Clients);
+# ein fork würde deren Locks im gesperrten Zustand kopieren. Unter Windows gibt es nur spawn.
+_MP_CONTEXT = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def _mp_context():
+    context = multiprocessing.get_context(_MP_CONTEXT)
+    if _MP_CONTEXT == "forkserver":
+        # Der Forkserver lädt nur dieses Modul (PDF-Parser), nicht das Hauptskript: er bleibt
+        # single-threaded, und die Worker starten ohne erneuten Import von pypdf/langchain.
+        # Die Worker importieren das Hauptskript als `__mp_main__`, Server.py hat beim Import
+        # daher keine Seiteneffekte (siehe start_services).
+        context.set_forkserver_preload(["ingestion"])
+    return context
+
+
+def _get_executor(max_workers):
+    global _executor, _executor_workers
+    if _executor is None or _executor_workers < max_workers:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=_mp_context())
+        _executor_workers = max_workers
+    return _executor
+
+
+def _reset_executor():
+    global _executor, _executor_workers
+    _executor = None
+    _executor_workers = 0
+
+
+def parse_pdf(upload_folder, filepath):
+    """Liest und chunkt eine PDF-Datei (läuft im Worker-Prozess) und misst die Dauer."""
+    start_time = time.time()
+    try:
+        chunks = PDFProcessor(upload_folder=upload_folder).extract_text_chunks(filepath)
+        error = None
+    except Exception as e:
+        chunks = None
+        error = str(e)
+    return filepath, chunks, round(time.time() - start_time, 2), error
+
+
+def parse_pdfs_parallel(filepaths, upload_folder, max_workers=None):
+    """Verarbeitet mehrere PDFs parallel in einem Prozess-Pool.
+
+    Liefert pro Datei ein Tupel (filepath, chunks, dauer, fehler) in der Reihenfolge der Fertigstellung.
+    """
+    if not filepaths:
+        return
+
+    max_workers = max_workers or min(len(filepaths), os.cpu_count() or 1)
+
+    # Eine einzelne Datei lohnt den Umweg über den Prozess-Pool nicht
+    if max_workers == 1 or len(filepaths) == 1:
+        for filepath in filepaths:
+            yield parse_pdf(upload_folder, filepath)
+        return
+
+    executor = _get_executor(max_workers)
+    futures = {executor.submit(parse_pdf, upload_folder, filepath): filepath for filepath in filepaths}
+    for future in as_completed(futures):
+        try:
+            yield future.result()
+        except Exception as e:
+            # z. B. abgestürzter Worker-Prozess, der Pool wird beim nächsten Upload neu erstellt
+            if isinstance(e, BrokenProcessPool):
+                _reset_executor()
+            logging.error(f"Worker-Fehler bei {futures[future]}: {str(e)}")
+            yield futures[future], None, 0, str(e)
@@ -0,0 +1,75 @@
+import time
+import uuid
+import queue
+import logging
+import threading
+from collections import OrderedDict
+
+
+class JobQueue:
+    """Warteschlange für Hintergrund-Jobs mit einem Worker und abfragbarem Status.
+
+    Der Worker wird über `start_worker` gestartet (z. B. `socketio.start_background_task`),
+    damit er zum async_mode von Flask-SocketIO passt.
+    """
+
+    def __init__(self, start_worker, max_finished=100):
+        self._queue = queue.Queue()
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._start_worker = start_worker
+        self._worker_started = False
+        self._max_finished = max_finished
+
+    def submit(self, func, *args, **kwargs):
+        """Reiht einen Job ein und gibt sofort seine ID zurück. `func` erhält die Job-ID als erstes Argument."""
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "status": "queued",
+            "created": time.time(),
+            "files": {},
+            "result": None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._prune()
+            if not self._worker_started:
+                self._worker_started = True
+                self._start_worker(self._run)
+        self._queue.put((job_id, func, args, kwargs))
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return None if job is None else dict(job, files=dict(job["files"]))
+
+    def set_file_stage(self, job_id, name, stage):
+        with self._lock:
+            self._jobs[job_id]["files"][name] = stage
+
+    def _prune(self):
+        # Nur die letzten abgeschlossenen Jobs behalten
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in ("done", "failed")]
+        for job_id in finished[:max(0, len(finished) - self._max_finished)]:
+            del self._jobs[job_id]
+
+    def _run(self):
+        while True:
+            job_id, func, args, kwargs = self._queue.get()
+            with self._lock:
+                job = self._jobs[job_id]
+                job["status"] = "running"
+            try:
+                result = func(job_id, *args, **kwargs)
+                with self._lock:
+                    job["status"] = "done"
+                    job["result"] = result
+            except Exception as e:
+                logging.error(f"Hintergrund-Job {job_id} fehlgeschlagen: {str(e)}")
+                with self._lock:
+                    job["status"] = "failed"
+                    job["result"] = {"error": str(e)}
+            finally:
+                self._queue.task_done()
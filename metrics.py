@@ -0,0 +1,185 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# Standard-Grenzen (Sekunden) für Latenz-Histogramme
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Grenzen für Laufzeiten ganzer Dateien (Sekunden)
+DURATION_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+# Grenzen für Generierungsgeschwindigkeit (Tokens pro Sekunde)
+RATE_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 40, 60, 80, 120, 200)
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monoton steigender Zähler, optional mit Labels."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name + "_total"
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name, _format_labels(self.labelnames, key), value
+
+
+class Histogram:
+    """Histogramm mit festen Bucket-Grenzen (kumulativ wie im Prometheus-Format)."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Misst die Laufzeit des Blocks in Sekunden."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, dict(series, counts=list(series["counts"]))) for key, series in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["counts"]):
+                cumulative += count
+                yield self.name + "_bucket", _format_labels(self.labelnames, key, ("le", _format_value(bound))), cumulative
+            yield self.name + "_sum", _format_labels(self.labelnames, key), series["sum"]
+            yield self.name + "_count", _format_labels(self.labelnames, key), series["count"]
+
+
+class MetricsRegistry:
+    """Sammlung aller Metriken, Ausgabe im Prometheus-Textformat."""
+
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class TimedEmbeddings:
+    """Wrapper um ein Embedding-Modell, der die Dauer jedes Modellaufrufs im Histogramm erfasst."""
+
+    def __init__(self, embedding_model, histogram):
+        self.embedding_model = embedding_model
+        self.histogram = histogram
+
+    def embed_query(self, text):
+        with self.histogram.time(kind="query"):
+            return self.embedding_model.embed_query(text)
+
+    def embed_documents(self, texts):
+        with self.histogram.time(kind="documents"):
+            return self.embedding_model.embed_documents(texts)
+
+
+# Gemeinsame Metriken des Servers
+registry = MetricsRegistry()
+
+time_to_first_token = registry.histogram(
+    "leli_time_to_first_token_seconds", "Zeit bis zum ersten Token einer Chat-Antwort", ["model"]
+)
+tokens_per_second = registry.histogram(
+    "leli_tokens_per_second", "Generierungsgeschwindigkeit einer Chat-Antwort", ["model"], buckets=RATE_BUCKETS
+)
+retrieval_latency = registry.histogram(
+    "leli_retrieval_latency_seconds", "Dauer der Kontextsuche (Vektoren + BM25)", ["endpoint"]
+)
+embedding_latency = registry.histogram(
+    "leli_embedding_latency_seconds", "Dauer eines Aufrufs des Embedding-Modells", ["kind"]
+)
+ingestion_duration = registry.histogram(
+    "leli_ingestion_duration_seconds", "Verarbeitungsdauer pro hochgeladener Datei (Parsen bis Persistieren)", ["mode"], buckets=DURATION_BUCKETS
+)
+ingestion_parse_duration = registry.histogram(
+    "leli_ingestion_parse_duration_seconds", "Dauer von Parsen und Chunken einer Datei im Prozess-Pool", buckets=DURATION_BUCKETS
+)
+model_response_time = registry.histogram(
+    "leli_model_response_seconds", "Antwortzeit eines Modells im Modelltest", ["model"], buckets=DURATION_BUCKETS
+)
+generations_total = registry.counter(
+    "leli_generations", "Chat-Generierungen pro Modell und Ergebnis", ["model", "status"]
+)
+tokens_total = registry.counter(
+    "leli_generated_tokens", "Generierte Tokens pro Modell", ["model"]
+)
+http_requests_total = registry.counter(
+    "leli_http_requests", "HTTP-Anfragen pro Endpunkt", ["endpoint", "method", "status"]
+)
+context_tokens = registry.counter(
+    "leli_context_tokens", "Tokens der Hintergrundinformationen im Prompt", ["endpoint", "model"]
+)
+context_tokens_saved = registry.counter(
+    "leli_context_tokens_saved", "Durch Zusammenfügen und Token-Budget eingesparte Prompt-Tokens", ["endpoint", "model"]
+)
+socket_events_total = registry.counter(
+    "leli_socket_events", "Empfangene Socket.IO-Events", ["event"]
+)
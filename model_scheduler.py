@@ -0,0 +1,141 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from ollama_client import ollama, CONNECT_TIMEOUT, KEEP_ALIVE
+
+# Wie viele Modelle gleichzeitig im Speicher bleiben dürfen (gleicher Name wie die Ollama-Variable)
+MAX_RESIDENT_MODELS = int(os.getenv("OLLAMA_MAX_LOADED_MODELS", "1"))
+# Beim Start vorzuladende Modelle, kommagetrennt
+PRELOAD_MODELS = [model.strip() for model in os.getenv("OLLAMA_PRELOAD_MODELS", "llama3.1:8b").split(",") if model.strip()]
+
+
+class ModelScheduler:
+    """Verteilt Arbeit so auf die Modelle, dass Ollama möglichst selten Modelle entlädt und neu lädt.
+
+    Höchstens `max_resident` verschiedene Modelle sind gleichzeitig in Benutzung. Wird ein Platz
+    frei, kommt das Modell mit den meisten wartenden Anfragen als Nächstes an die Reihe, wartende
+    Arbeit wird also nach Modell gebündelt. Ein aktives Modell nimmt neue Anfragen nur an, solange
+    kein anderes Modell länger als `max_wait` Sekunden wartet, damit niemand verhungert.
+    """
+
+    def __init__(self, client=ollama, max_resident=MAX_RESIDENT_MODELS, keep_alive=KEEP_ALIVE, max_wait=30.0, ps_ttl=5.0):
+        self.client = client
+        self.max_resident = max(1, max_resident)
+        self.keep_alive = keep_alive
+        self.max_wait = max_wait
+        self.ps_ttl = ps_ttl
+        self._active = {}        # Modell -> Anzahl laufender Anfragen
+        self._waiting = {}       # Modell -> Liste der Wartebeginne
+        self._cond = threading.Condition()
+        self._ps_cache = (0.0, [])
+        self.switches = 0
+        self._last_models = set()
+
+    def resident(self):
+        """Aktuell von Ollama geladene Modelle (/api/ps), kurz zwischengespeichert."""
+        fetched, models = self._ps_cache
+        if time.time() - fetched < self.ps_ttl:
+            return models
+        try:
+            response = self.client.session.get(f"{self.client.base_url}/api/ps", timeout=CONNECT_TIMEOUT)
+            response.raise_for_status()
+            models = [model["name"] for model in response.json().get("models", [])]
+        except Exception as e:
+            logging.warning(f"Geladene Modelle konnten nicht abgefragt werden: {str(e)}")
+        self._ps_cache = (time.time(), models)
+        return models
+
+    def preload(self, models=PRELOAD_MODELS):
+        """Lädt Modelle vorab (leere Anfrage an /api/generate) und hält sie per keep_alive im Speicher."""
+        for model in models[:self.max_resident]:
+            start_time = time.time()
+            try:
+                with self.use(model):
+                    response = self.client.session.post(
+                        f"{self.client.base_url}/api/generate",
+                        json={"model": model, "keep_alive": self.keep_alive},
+                        timeout=(CONNECT_TIMEOUT, 300),
+                    )
+                    response.raise_for_status()
+                logging.info(f"Modell {model} vorgeladen in {time.time() - start_time:.2f}s")
+            except Exception as e:
+                logging.warning(f"Modell {model} konnte nicht vorgeladen werden: {str(e)}")
+        self._ps_cache = (0.0, [])
+
+    def _can_run(self, model, now):
+        if model in self._active:
+            # Aktives Modell: weiter annehmen, solange kein anderes Modell zu lange wartet
+            return not any(
+                other != model and other not in self._active and now - starts[0] > self.max_wait
+                for other, starts in self._waiting.items() if starts
+            )
+        if len(self._active) >= self.max_resident:
+            return False
+        # Freier Platz: zuerst das Modell mit den meisten (bei Gleichstand den ältesten) Wartenden
+        candidates = [(len(starts), -starts[0], other) for other, starts in self._waiting.items() if starts and other not in self._active]
+        return not candidates or max(candidates)[2] == model
+
+    def enter(self, model, cancelled=None):
+        """Wartet auf einen Platz für `model`.
+
+        Wird `cancelled` (threading.Event) während des Wartens gesetzt, wird abgebrochen, ohne einen
+        Platz zu belegen; Rückgabe dann False.
+        """
+        now = time.time()
+        with self._cond:
+            starts = self._waiting.setdefault(model, [])
+            starts.append(now)
+            while not self._can_run(model, time.time()):
+                if cancelled is not None and cancelled.is_set():
+                    starts.remove(now)
+                    self._cond.notify_all()
+                    return False
+                self._cond.wait(timeout=1.0 if cancelled is None else 0.1)
+            starts.remove(now)
+            if model not in self._active and model not in self._last_models:
+                self.switches += 1
+            self._active[model] = self._active.get(model, 0) + 1
+            self._last_models = set(self._active)
+        waited = time.time() - now
+        if waited > 0.5:
+            logging.info(f"Anfrage für {model} hat {waited:.2f}s auf das Modell gewartet")
+        return True
+
+    def leave(self, model):
+        with self._cond:
+            self._active[model] -= 1
+            if self._active[model] == 0:
+                del self._active[model]
+            self._cond.notify_all()
+
+    @contextmanager
+    def use(self, model, cancelled=None):
+        """Blockiert, bis `model` laufen darf, und gibt den Platz danach wieder frei.
+
+        Liefert False, wenn während des Wartens `cancelled` gesetzt wurde (dann ist kein Platz belegt).
+        """
+        entered = self.enter(model, cancelled)
+        try:
+            yield entered
+        finally:
+            if entered:
+                self.leave(model)
+
+    def stats(self):
+        with self._cond:
+            active = dict(self._active)
+            waiting = {model: len(starts) for model, starts in self._waiting.items() if starts}
+        return {
+            "max_resident": self.max_resident,
+            "keep_alive": self.keep_alive,
+            "active": active,
+            "waiting": waiting,
+            "switches": self.switches,
+            "resident": self.resident(),
+        }
+
+
+# Gemeinsamer Scheduler für Chat, Extraktion und Modelltests
+scheduler = ModelScheduler()
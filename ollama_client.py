@@ -0,0 +1,223 @@
+import os
+import json
+import asyncio
+import logging
+import threading
+import weakref
+import requests
+import aiohttp
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+
+# Gemeinsame Konfiguration für alle Ollama-Aufrufe (Server, Extraktion, Modelltests)
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+CONNECT_TIMEOUT = 5
+# Maximale Anzahl gleichzeitiger Generierungen pro Modell
+MAX_CONCURRENCY_PER_MODEL = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "2"))
+POOL_SIZE = 16
+# Wie lange Ollama ein Modell nach der letzten Anfrage im Speicher hält (verhindert ständiges Neuladen)
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+# Anzeigename im Frontend -> Ollama-Modell
+DEFAULT_MODEL = "llama3.1:8b"
+CHAT_MODELS = {
+    "Lama3.1": "llama3.1:8b",
+    "DeepSeek": "deepseek-r1:8b",
+    "Mistral": "mistral",
+}
+EXTRACTION_MODELS = {
+    "Lama3.1": "llama3.1:8b",
+    "DeepSeek": "deepseek-r1:14b",
+    "Mistral": "mistral",
+}
+TEST_MODELS = [
+    "llama3.1:8b",
+    "deepseek-r1:8b",
+    "mistral",
+]
+
+
+class OllamaError(Exception):
+    """Ollama hat mit einem Fehlerstatus geantwortet."""
+
+    def __init__(self, status, message=""):
+        super().__init__(f"Ollama-Fehler {status}: {message}")
+        self.status = status
+
+
+class OllamaTimeout(requests.exceptions.ReadTimeout):
+    """Ollama hat nicht rechtzeitig geantwortet (Verbindungsaufbau, erste Antwort oder Pause zwischen zwei Zeilen).
+
+    Beide Clients werfen diese Ausnahme statt der unterschiedlichen Fehler von requests
+    (`ConnectionError` um einen `ReadTimeoutError` bei einem Hänger mitten im Stream) und aiohttp
+    (`asyncio.TimeoutError`). Als `requests.exceptions.Timeout` greifen auch bestehende Handler.
+    """
+
+
+class ModelLimits:
+    """Gemeinsames Limit gleichzeitiger Generierungen pro Modell für den synchronen und den asynchronen Client.
+
+    Die Semaphoren sind threadbasiert und gehören zu keiner Event-Loop, sodass Chat (Threads) und
+    Modelltests (je eine eigene Loop) dasselbe Limit teilen.
+    """
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY_PER_MODEL):
+        self.max_concurrency = max_concurrency
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, model):
+        with self._lock:
+            if model not in self._semaphores:
+                self._semaphores[model] = threading.BoundedSemaphore(self.max_concurrency)
+            return self._semaphores[model]
+
+    def acquire(self, model, cancelled=None):
+        """Belegt einen Platz; mit `cancelled` (threading.Event) abbrechbar, Rückgabe dann False."""
+        semaphore = self._semaphore(model)
+        if cancelled is None:
+            return semaphore.acquire()
+        while not semaphore.acquire(timeout=0.1):
+            if cancelled.is_set():
+                return False
+        return True
+
+    async def acquire_async(self, model, poll_interval=0.05):
+        # Nicht blockierend versuchen, damit die Event-Loop frei bleibt und ein Abbruch keinen Platz belegt
+        semaphore = self._semaphore(model)
+        while not semaphore.acquire(blocking=False):
+            await asyncio.sleep(poll_interval)
+
+    def release(self, model):
+        self._semaphore(model).release()
+
+
+class OllamaClient:
+    """Synchroner Ollama-Client mit Keep-Alive-Verbindungspool und Limit pro Modell."""
+
+    def __init__(self, base_url=OLLAMA_URL, limits=None, pool_size=POOL_SIZE):
+        self.base_url = base_url
+        self.limits = limits or ModelLimits()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def chat_stream(self, model, messages, timeout=20, on_connect=None, cancelled=None, **payload):
+        """Streamt /api/chat und liefert jede NDJSON-Zeile als dict.
+
+        `timeout` gilt für den Verbindungsaufbau bis zur ersten Antwort und zwischen zwei Zeilen.
+        `on_connect(response)` erhält die offene Antwort, z. B. um sie bei einem Abbruch zu schließen.
+        Ist `cancelled` (threading.Event) vor dem Senden gesetzt, auch während des Wartens auf das
+        Limit, wird keine Anfrage gesendet und nichts geliefert.
+        Wirft `OllamaTimeout`, wenn eine dieser Fristen überschritten wird, bzw. `OllamaError` bei Fehlerstatus.
+        """
+        payload = {"model": model, "messages": messages, "stream": True, "keep_alive": KEEP_ALIVE, **payload}
+        if not self.limits.acquire(model, cancelled):
+            return
+        try:
+            if cancelled is not None and cancelled.is_set():
+                return
+            try:
+                response = self.session.post(
+                    f"{self.base_url}/api/chat", json=payload, stream=True, timeout=(CONNECT_TIMEOUT, timeout)
+                )
+            except requests.exceptions.Timeout as e:
+                raise OllamaTimeout(str(e)) from e
+            if on_connect is not None:
+                on_connect(response)
+            try:
+                if response.status_code != 200:
+                    raise OllamaError(response.status_code, response.text[:200])
+                for line in response.iter_lines(decode_unicode=True):
+                    if line:
+                        yield json.loads(line)
+            except requests.exceptions.ConnectionError as e:
+                # requests meldet einen Hänger mitten im Stream als ConnectionError um einen ReadTimeoutError
+                if any(isinstance(arg, ReadTimeoutError) for arg in e.args):
+                    raise OllamaTimeout(str(e)) from e
+                raise
+            finally:
+                # Verbindung geht zurück in den Pool (bzw. wird bei Abbruch geschlossen)
+                response.close()
+        finally:
+            self.limits.release(model)
+
+    def chat(self, model, messages, timeout=20, **payload):
+        """Komplette Antwort als Text."""
+        return "".join(
+            data["message"]["content"]
+            for data in self.chat_stream(model, messages, timeout=timeout, **payload)
+            if "message" in data and "content" in data["message"]
+        )
+
+
+class AsyncOllamaClient:
+    """Asynchroner Ollama-Client (aiohttp) mit einer Session pro Event-Loop und Limit pro Modell.
+
+    aiohttp-Sessions gehören zu der Loop, in der sie angelegt wurden. Laufen mehrere Loops parallel
+    (z. B. zwei Modelltests in eigenen Threads), bekommt jede ihre eigene Session; das Limit pro
+    Modell ist dagegen prozessweit und wird mit dem synchronen Client geteilt.
+    """
+
+    def __init__(self, base_url=OLLAMA_URL, limits=None, pool_size=POOL_SIZE):
+        self.base_url = base_url
+        self.limits = limits or ModelLimits()
+        self.pool_size = pool_size
+        self._sessions = weakref.WeakKeyDictionary()  # Event-Loop -> Session
+        self._lock = threading.Lock()
+
+    def _session(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            session = self._sessions.get(loop)
+            if session is None or session.closed:
+                connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+                session = self._sessions[loop] = aiohttp.ClientSession(connector=connector)
+            return session
+
+    async def chat_stream(self, model, messages, timeout=20, **payload):
+        """Asynchrones Gegenstück zu `OllamaClient.chat_stream`, wirft ebenfalls `OllamaTimeout` bzw. `OllamaError`."""
+        session = self._session()
+        payload = {"model": model, "messages": messages, "stream": True, "keep_alive": KEEP_ALIVE, **payload}
+        client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=CONNECT_TIMEOUT, sock_read=timeout)
+
+        await self.limits.acquire_async(model)
+        try:
+            async with session.post(f"{self.base_url}/api/chat", json=payload, timeout=client_timeout) as response:
+                if response.status != 200:
+                    raise OllamaError(response.status, (await response.text())[:200])
+                async for line in response.content:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError as e:
+                        logging.warning(f"Fehler beim JSON-Parsing: {e}")
+        except asyncio.TimeoutError as e:
+            # aiohttp (ServerTimeoutError) meldet Zeitüberschreitungen als asyncio.TimeoutError
+            raise OllamaTimeout(str(e) or "Zeitüberschreitung beim Lesen von Ollama") from e
+        finally:
+            self.limits.release(model)
+
+    async def chat(self, model, messages, timeout=20, **payload):
+        parts = []
+        async for data in self.chat_stream(model, messages, timeout=timeout, **payload):
+            if "message" in data and "content" in data["message"]:
+                parts.append(data["message"]["content"])
+        return "".join(parts)
+
+    async def close(self):
+        """Schließt nur die Session der laufenden Event-Loop (Sessions anderer Loops bleiben offen)."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            session = self._sessions.pop(loop, None)
+        if session is not None and not session.closed:
+            await session.close()
+
+
+# Gemeinsame Instanzen für alle Module, mit einem gemeinsamen Limit pro Modell
+model_limits = ModelLimits()
+ollama = OllamaClient(limits=model_limits)
+async_ollama = AsyncOllamaClient(limits=model_limits)
@@ -0,0 +1,78 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-sicherer LRU-Cache mit Größenlimit und Trefferzählern."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, predicate=None):
+        """Entfernt alle Einträge, deren Schlüssel `predicate` erfüllt (ohne predicate: alle). Gibt die Anzahl zurück."""
+        with self._lock:
+            keys = [key for key in self._data if predicate is None or predicate(key)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+class CachedQueryEmbeddings:
+    """Wrapper um ein Embedding-Modell, der Anfrage-Embeddings in einem LRU-Cache hält.
+
+    Gedacht für Suchanfragen (Chat-Prompts, feste Teilanfragen von getjson/testmodel),
+    nicht für das Einbetten von Dokumenten.
+    """
+
+    def __init__(self, embedding_model, maxsize=1024):
+        self.embedding_model = embedding_model
+        self.cache = LRUCache(maxsize)
+
+    def embed_query(self, text):
+        vector = self.cache.get(text)
+        if vector is None:
+            vector = self.embedding_model.embed_query(text)
+            self.cache.put(text, vector)
+        return vector
+
+    def embed_documents(self, texts):
+        """Bettet mehrere Anfragen ein, nur die nicht gecachten werden gemeinsam an das Modell geschickt."""
+        vectors = [self.cache.get(text) for text in texts]
+        missing = [text for text, vector in zip(texts, vectors) if vector is None]
+        if missing:
+            computed = dict(zip(missing, self.embedding_model.embed_documents(missing)))
+            for text, vector in computed.items():
+                self.cache.put(text, vector)
+            vectors = [computed[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        return vectors
@@ -0,0 +1,139 @@
+import numpy as np
+from langchain_core.documents import Document
+
+# Anteil, um den ein perfekter lexikalischer Treffer (höchster BM25-Score) die Vektor-Distanz verkleinert
+LEXICAL_WEIGHT = 0.3
+
+
+def l2_distances(query_vectors, doc_vectors):
+    """Quadrierte euklidische Distanz zwischen allen Anfragen und Dokumenten.
+
+    Entspricht dem Score, den Chroma im Standard-Space "l2" zurückgibt. Ergebnis: Matrix [anfragen x dokumente].
+    """
+    q = np.asarray(query_vectors, dtype=np.float32)
+    d = np.asarray(doc_vectors, dtype=np.float32)
+    distances = (q ** 2).sum(axis=1)[:, None] - 2 * q @ d.T + (d ** 2).sum(axis=1)[None, :]
+    return np.maximum(distances, 0)
+
+
+def fuse_scores(distances, bm25_scores):
+    """Kombiniert Vektor-Distanzen mit BM25-Scores derselben Anfrage.
+
+    Die BM25-Scores werden auf das Maximum der Kandidaten normiert und verkleinern die Distanz
+    um höchstens LEXICAL_WEIGHT. Das Ergebnis bleibt auf der Skala von Chroma (kleiner = ähnlicher),
+    sodass bestehende Schwellwerte weiter gelten.
+    """
+    bm25_scores = np.asarray(bm25_scores, dtype=np.float32)
+    max_score = bm25_scores.max() if bm25_scores.size else 0
+    if max_score <= 0:
+        return np.asarray(distances, dtype=np.float32)
+    return np.asarray(distances, dtype=np.float32) * (1 - LEXICAL_WEIGHT * bm25_scores / max_score)
+
+
+def _fetch_missing(collection, candidates, chunk_ids):
+    """Lädt Text, Metadaten und Embedding für Chunks, die nur die lexikalische Suche gefunden hat."""
+    missing = [chunk_id for chunk_id in chunk_ids if chunk_id not in candidates]
+    if not missing:
+        return
+    result = collection.get(ids=missing, include=["documents", "metadatas", "embeddings"])
+    for chunk_id, text, metadata, embedding in zip(result["ids"], result["documents"], result["metadatas"], result["embeddings"]):
+        candidates[chunk_id] = (text, metadata, embedding)
+
+
+def hybrid_search(vectorstore, embedding_model, bm25_index, query, k=10, source=None, cache=None):
+    """Hybride Suche: Top-k der Vektorsuche und Top-k aus dem BM25-Index, gemeinsam bewertet.
+
+    Liefert eine Liste von (Document, score), aufsteigend sortiert, score wie bei
+    `similarity_search_with_score` (kleiner = ähnlicher). Mit `cache` (LRUCache) werden
+    Ergebnisse unter (art, anfrage, quelle, k) zwischengespeichert.
+    """
+    cache_key = ("hybrid", query, source, k)
+    if cache is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    query_vector = embedding_model.embed_query(query)
+    collection = vectorstore._collection
+
+    result = collection.query(
+        query_embeddings=[query_vector],
+        n_results=k,
+        where={"source": source} if source else None,
+        include=["documents", "metadatas", "embeddings"],
+    )
+    candidates = {
+        chunk_id: (text, metadata, embedding)
+        for chunk_id, text, metadata, embedding in zip(result["ids"][0], result["documents"][0], result["metadatas"][0], result["embeddings"][0])
+    }
+    _fetch_missing(collection, candidates, [chunk_id for chunk_id, _ in bm25_index.search(query, k=k, source=source)])
+
+    if not candidates:
+        return []
+
+    ids = list(candidates)
+    distances = l2_distances([query_vector], [candidates[chunk_id][2] for chunk_id in ids])[0]
+    bm25_scores = bm25_index.scores(query, source=source, chunk_ids=set(ids))
+    fused = fuse_scores(distances, [bm25_scores.get(chunk_id, 0.0) for chunk_id in ids])
+
+    ranked = sorted(zip(ids, fused), key=lambda x: x[1])[:k]
+    results = [
+        (Document(page_content=candidates[chunk_id][0], metadata=candidates[chunk_id][1], id=chunk_id), float(score))
+        for chunk_id, score in ranked
+    ]
+    if cache is not None:
+        cache.put(cache_key, results)
+    return results
+
+
+def top_k_per_source(vectorstore, embedding_model, bm25_index, queries, sources, k=10, cache=None):
+    """Sucht pro Quelle die k ähnlichsten Chunks je Teilanfrage (Vektorsuche und BM25-Index).
+
+    Alle Teilanfragen werden in einem Batch eingebettet und pro Quelle in einer einzigen
+    Chroma-Abfrage gesucht. Für die Vereinigung der Kandidaten werden anschließend die hybriden
+    Scores zu allen Teilanfragen berechnet, damit die gewichtete Aggregation vollständig bleibt.
+
+    Liefert pro Quelle: (source, ids, texte, scores[anfragen x kandidaten]).
+    Mit `cache` (LRUCache) werden die Ergebnisse pro Quelle zwischengespeichert.
+    """
+    query_vectors = None
+    collection = vectorstore._collection
+
+    for source in sources:
+        cache_key = ("per_source", tuple(queries), source, k)
+        if cache is not None:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                continue
+
+        if query_vectors is None:
+            query_vectors = embedding_model.embed_documents(queries)
+
+        result = collection.query(
+            query_embeddings=query_vectors,
+            n_results=k,
+            where={"source": source},
+            include=["documents", "metadatas", "embeddings"],
+        )
+
+        candidates = {}
+        for ids, texts, metadatas, embeddings in zip(result["ids"], result["documents"], result["metadatas"], result["embeddings"]):
+            for chunk_id, text, metadata, embedding in zip(ids, texts, metadatas, embeddings):
+                candidates[chunk_id] = (text, metadata, embedding)
+        for query in queries:
+            _fetch_missing(collection, candidates, [chunk_id for chunk_id, _ in bm25_index.search(query, k=k, source=source)])
+
+        if not candidates:
+            continue
+
+        ids = list(candidates)
+        texts = [candidates[chunk_id][0] for chunk_id in ids]
+        distances = l2_distances(query_vectors, [candidates[chunk_id][2] for chunk_id in ids])
+        for i, query in enumerate(queries):
+            bm25_scores = bm25_index.scores(query, source=source, chunk_ids=set(ids))
+            distances[i] = fuse_scores(distances[i], [bm25_scores.get(chunk_id, 0.0) for chunk_id in ids])
+
+        if cache is not None:
+            cache.put(cache_key, (source, ids, texts, distances))
+        yield source, ids, texts, distances
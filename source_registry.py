@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from collections import defaultdict
+
+
+class SourceRegistry:
+    """Verzeichnis aller Quellen (PDFs) in einer Chroma-Collection.
+
+    Pro Quelle werden Chunk-IDs, Anzahl der Chunks, Dateigröße, Änderungszeit der Datei,
+    Zeitpunkt des Einfügens und der Hash des Inhalts gespeichert. Das Verzeichnis wird beim Einfügen und Löschen aktualisiert,
+    sodass Fragen wie "welche Quellen / welche Chunks" ohne `vectorstore.get()` beantwortet werden.
+    Viele Änderungen am Stück (Ordnerabgleich, Upload) gehören in `with registry.batch():`, dann wird
+    die Datei nur einmal am Ende geschrieben statt nach jeder Datei.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._sources = {}
+        self._batch_depth = 0
+        self._dirty = False
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._sources = json.load(f)
+
+    def bootstrap(self, vectorstore):
+        """Baut das Verzeichnis einmalig aus der Collection auf, falls es noch nicht existiert."""
+        if os.path.exists(self.path):
+            return
+        data = vectorstore.get(include=["metadatas"])
+        chunk_ids = defaultdict(list)
+        for chunk_id, metadata in zip(data["ids"], data["metadatas"]):
+            chunk_ids[metadata.get("source", "Unbekannt")].append(chunk_id)
+
+        with self._lock:
+            for source, ids in chunk_ids.items():
+                num_bytes = os.path.getsize(source) if os.path.exists(source) else 0
+                self._sources[source] = self._entry(ids, num_bytes, None)
+            self._save()
+        logging.info(f"Quellenverzeichnis aus der Datenbank aufgebaut: {len(chunk_ids)} Quellen.")
+
+    @staticmethod
+    def _entry(chunk_ids, num_bytes, content_hash):
+        return {
+            "chunk_ids": list(chunk_ids),
+            "chunks": len(chunk_ids),
+            "bytes": num_bytes,
+            "mtime_ns": None,
+            "ingested_at": time.time(),
+            "content_hash": content_hash,
+        }
+
+    def add(self, source, chunk_ids, num_bytes=None, content_hash=None, mtime_ns=None):
+        """Registriert neue Chunks einer Quelle. Bei bestehender Quelle werden die IDs ergänzt."""
+        with self._lock:
+            entry = self._sources.get(source)
+            if entry is None:
+                entry = self._sources[source] = self._entry([], 0, None)
+            entry["chunk_ids"].extend(chunk_ids)
+            entry["chunks"] = len(entry["chunk_ids"])
+            entry["ingested_at"] = time.time()
+            if num_bytes is not None:
+                entry["bytes"] = num_bytes
+            if content_hash is not None:
+                entry["content_hash"] = content_hash
+            if mtime_ns is not None:
+                entry["mtime_ns"] = mtime_ns
+            self._changed()
+
+    def update_file_info(self, source, num_bytes, mtime_ns, content_hash=None):
+        """Aktualisiert Größe, Änderungszeit (und Hash) ohne die Chunks anzufassen, z. B. nach `touch`."""
+        with self._lock:
+            entry = self._sources.get(source)
+            if entry is None:
+                return
+            entry["bytes"] = num_bytes
+            entry["mtime_ns"] = mtime_ns
+            if content_hash is not None:
+                entry["content_hash"] = content_hash
+            self._changed()
+
+    def remove(self, source):
+        """Entfernt eine Quelle und gibt ihren Eintrag zurück (oder None)."""
+        with self._lock:
+            entry = self._sources.pop(source, None)
+            if entry is not None:
+                self._changed()
+            return entry
+
+    def get(self, source):
+        with self._lock:
+            entry = self._sources.get(source)
+            return None if entry is None else dict(entry, chunk_ids=list(entry["chunk_ids"]))
+
+    def content_hash(self, source):
+        with self._lock:
+            entry = self._sources.get(source)
+            return None if entry is None else entry["content_hash"]
+
+    def chunk_count(self, source):
+        with self._lock:
+            entry = self._sources.get(source)
+            return 0 if entry is None else entry["chunks"]
+
+    def sources(self):
+        with self._lock:
+            return list(self._sources)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sources)
+
+    def to_list(self):
+        """Übersicht aller Quellen ohne Chunk-IDs (z. B. für das Frontend)."""
+        with self._lock:
+            return [
+                {"source": source, **{k: v for k, v in entry.items() if k != "chunk_ids"}}
+                for source, entry in self._sources.items()
+            ]
+
+    def summary(self):
+        with self._lock:
+            num_chunks = sum(entry["chunks"] for entry in self._sources.values())
+            return f"{len(self._sources)} Quellen, {num_chunks} Chunks"
+
+    @contextmanager
+    def batch(self):
+        """Speichert alle Änderungen innerhalb des Blocks einmal am Ende (verschachtelbar)."""
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if self._batch_depth == 0 and self._dirty:
+                    self._save()
+
+    def _changed(self):
+        # Aufruf mit gehaltenem Lock
+        if self._batch_depth:
+            self._dirty = True
+        else:
+            self._save()
+
+    def _save(self):
+        self._dirty = False
+        tmp_path = self.path + ".part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._sources, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,106 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+
+class StartupReport:
+    """Dauer der einzelnen Startphasen (Imports, Verzeichnisse, Laden der Modelle) für Log und /readyz."""
+
+    def __init__(self):
+        self.started = time.time()
+        self._phases = []
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            self._phases.append((name, round(seconds, 3)))
+        logging.info(f"Startphase '{name}': {seconds:.3f}s")
+
+    @contextmanager
+    def phase(self, name):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start_time)
+
+    def as_dict(self):
+        with self._lock:
+            phases = list(self._phases)
+        return {
+            "uptime": round(time.time() - self.started, 3),
+            "phases": [{"name": name, "seconds": seconds} for name, seconds in phases],
+        }
+
+
+# Gemeinsamer Bericht des Servers
+report = StartupReport()
+
+
+class _LazyProxy:
+    """Reicht Attributzugriffe an das Objekt der LazyResource weiter und baut es dabei bei Bedarf."""
+
+    def __init__(self, resource):
+        object.__setattr__(self, "_resource", resource)
+
+    def __getattr__(self, name):
+        return getattr(self._resource.get(), name)
+
+    def __repr__(self):
+        return f"<lazy {self._resource.name}: {self._resource.state}>"
+
+
+class LazyResource:
+    """Teures Objekt (Modell, Datenbank, API-Client), das erst bei der ersten Nutzung gebaut wird.
+
+    Der Aufbau läuft genau einmal (thread-sicher), seine Dauer landet im Startbericht. Schlägt er
+    fehl, wird es beim nächsten Zugriff erneut versucht. Mit `proxy()` kann das Objekt wie bisher
+    als Modulvariable verwendet werden, `warm_up()` baut es vorab (z. B. in einem Hintergrund-Task).
+    """
+
+    def __init__(self, name, factory, startup_report=report):
+        self.name = name
+        self.factory = factory
+        self.startup_report = startup_report
+        self.state = "pending"
+        self.error = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def get(self):
+        if self.state == "ready":
+            return self._value
+        with self._lock:
+            if self.state != "ready":
+                self.state = "loading"
+                start_time = time.perf_counter()
+                try:
+                    self._value = self.factory()
+                except Exception as e:
+                    self.state = "failed"
+                    self.error = str(e)
+                    raise
+                self.error = None
+                self.state = "ready"
+                self.startup_report.record(self.name, time.perf_counter() - start_time)
+        return self._value
+
+    def warm_up(self):
+        """Baut das Objekt vorab; Fehler werden nur geloggt (der nächste Zugriff versucht es erneut)."""
+        try:
+            self.get()
+            return True
+        except Exception as e:
+            logging.error(f"{self.name} konnte nicht geladen werden: {str(e)}")
+            return False
+
+    def proxy(self):
+        return _LazyProxy(self)
+
+    def status(self):
+        return {"state": self.state, "error": self.error}
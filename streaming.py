@@ -0,0 +1,81 @@
+import time
+import logging
+import threading
+
+
+def run_blocking(async_mode, func, *args):
+    """Führt CPU-lastige Arbeit (z. B. Embedding und Suche) außerhalb der Event-Loop aus.
+
+    Bei eventlet/gevent läuft die Funktion in einem echten Thread des Threadpools, damit die
+    Greenlets der anderen Verbindungen weiterlaufen. Im Threading-Modus wird sie direkt aufgerufen.
+    """
+    if async_mode == "eventlet":
+        from eventlet import tpool
+        return tpool.execute(func, *args)
+    if async_mode == "gevent":
+        import gevent
+        return gevent.get_hub().threadpool.apply(func, args)
+    return func(*args)
+
+
+class BackpressureEmitter:
+    """Sendet Events an genau einen Client und bremst bei langsamen Clients.
+
+    Nach jeweils `window` Events wird eine Bestätigung (Socket.IO-Ack) angefordert und bis zu
+    `ack_timeout` Sekunden darauf gewartet. Solange wird nicht weiter vom Modell gelesen, der
+    Rückstau wirkt also bis zur Ollama-Verbindung zurück.
+    """
+
+    def __init__(self, socketio, sid, window=32, ack_timeout=5.0):
+        self.socketio = socketio
+        self.sid = sid
+        self.window = window
+        self.ack_timeout = ack_timeout
+        self._sent = 0
+
+    def emit(self, event, data):
+        self._sent += 1
+        if self.sid is not None and self._sent % self.window == 0:
+            acked = threading.Event()
+            self.socketio.emit(event, data, to=self.sid, callback=lambda *args: acked.set())
+            if not acked.wait(self.ack_timeout):
+                logging.warning(f"Client {self.sid} hat {self.ack_timeout}s nicht bestätigt, sende weiter.")
+        else:
+            self.socketio.emit(event, data, to=self.sid)
+        # Anderen Greenlets die Möglichkeit geben zu senden (im Threading-Modus ohne Wirkung)
+        self.socketio.sleep(0)
+
+
+class TokenCoalescer:
+    """Sammelt Tokens und sendet sie gebündelt als ein Frame.
+
+    Gesendet wird, sobald seit dem letzten Frame `interval` Sekunden vergangen sind oder
+    `max_chars` Zeichen gepuffert sind. `flush()` sendet den Rest am Ende der Antwort.
+    Frame-Format: {'frame': text, 'count': anzahl_tokens}.
+    """
+
+    def __init__(self, sender, event="response", interval=0.05, max_chars=64):
+        self.sender = sender
+        self.event = event
+        self.interval = interval
+        self.max_chars = max_chars
+        self._buffer = []
+        self._chars = 0
+        self._last_flush = time.monotonic()
+        self.frames = 0
+        self.tokens = 0
+
+    def add(self, token):
+        self._buffer.append(token)
+        self._chars += len(token)
+        self.tokens += 1
+        if self._chars >= self.max_chars or time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self.sender.emit(self.event, {'frame': "".join(self._buffer), 'count': len(self._buffer)})
+            self.frames += 1
+            self._buffer = []
+            self._chars = 0
+        self._last_flush = time.monotonic()
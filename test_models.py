@@ -1,18 +1,26 @@
 import time
 import json
 import logging
-import psutil 
 import asyncio
-import aiohttp
+from ollama_client import async_ollama, OllamaError, OllamaTimeout
+from hardware_sampler import sampler, format_usage
+import metrics
 import re
-from openai import OpenAI
 import os
-from dotenv import load_dotenv
+from startup import LazyResource
 
-load_dotenv()
 
-api_key = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key = api_key)
+def create_grader_client():
+    # openai und dotenv erst bei der ersten Bewertung laden, nicht schon beim Import des Servers
+    from openai import OpenAI
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    api_key = os.getenv("OPENAI_API_KEY")
+    return OpenAI(api_key = api_key)
+
+# OpenAI-Client für die Bewertung der Antworten
+client = LazyResource("grader_client", create_grader_client).proxy()
 # Methode	        Modell Berechnung	                                Senden an Client	                    Vorteil
 # stream=True	    Stückweise während des Sendens	                    Token für Token	Frühe Antwort,          Echtzeit-Effekt
 # stream=False	    Alles auf einmal, komplette Berechnung zuerst	    Alles auf einmal	                    Weniger Netzwerk-Overhead
@@ -21,25 +29,6 @@ client = OpenAI(api_key = api_key)
 # stream=True (Token für Token)	        50 (für 50 Tokens)	200 ms	        10 Sekunden
 # stream=False (einmal senden)	        1	200 ms	                        200 ms
 
-async def monitor_system(stop_event, results):
-    """Überwacht die CPU- und RAM-Auslastung während der Anfrage und berechnet den Durchschnitt"""
-    cpu_values = []
-    ram_values = []
-
-    while not stop_event.is_set():
-        cpu_during = psutil.cpu_percent(interval=None)
-        ram_during = psutil.virtual_memory().percent
-        
-        cpu_values.append(cpu_during)
-        ram_values.append(ram_during)
-
-        logging.info(f"Während der Anfrage - CPU: {cpu_during}%, RAM: {ram_during}%")
-        await asyncio.sleep(1)
-
-    results["avg_cpu"] = sum(cpu_values) / len(cpu_values) if cpu_values else 0
-    results["avg_ram"] = sum(ram_values) / len(ram_values) if ram_values else 0
-
-
 async def query_model(model_name, question, context):
     """Sendet eine Anfrage an das Modell und misst die Antwortzeiten."""
     try:
@@ -62,50 +51,33 @@ async def query_model(model_name, question, context):
             **Frage:**  
             {question}
         """
-        payload = {"model": model_name, "messages": [{"role": "user", "content": full_prompt}]}
-        url = "http://localhost:11434/api/chat"
+        messages = [{"role": "user", "content": full_prompt}]
 
-        stop_event = asyncio.Event()
-        results = {}
-
-        # Starte das CPU/RAM-Monitoring parallel
-        monitor_task = asyncio.create_task(monitor_system(stop_event, results))
+        # CPU/RAM misst der gemeinsame Hintergrund-Sampler, hier wird nur das Zeitfenster abgefragt
+        sampler.start()
         start_request_time = time.time()
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=payload, timeout=20) as response:
-                if response.status != 200:
-                    stop_event.set()  # Überwachung beenden
-                    await monitor_task  
-                    return ["Fehler", "Fehler", "Fehler"], ""
-
-                json_strings = await response.text()
-
-                stop_event.set()
-                await monitor_task 
-                end_time = time.time()
-
-                json_strings = json_strings.strip().split("\n")  # Zeilenweises JSON
-
-                response_text = ""
-                for json_str in json_strings:
-                    try:
-                        json_data = json.loads(json_str)
-                        if "message" in json_data and "content" in json_data["message"]:
-                            response_text += json_data["message"]["content"]
-                        logging.info(json_data)  
-                    except json.JSONDecodeError as e:
-                        print("Fehler beim JSON-Parsing:", e)
- 
+        response_text = ""
+        try:
+            async for json_data in async_ollama.chat_stream(model_name, messages, timeout=20):
+                if "message" in json_data and "content" in json_data["message"]:
+                    response_text += json_data["message"]["content"]
+                logging.info(json_data)
+        except OllamaError as e:
+            logging.error(str(e))
+            return "Fehler", "Fehler", "Fehler"
+        end_time = time.time()
+
         model_processing_time = round(end_time - start_request_time, 2)
         logging.info(f"Modell-Antwortszeit (bis komplette Antwort): {model_processing_time}")
+        metrics.model_response_time.observe(model_processing_time, model=model_name)
 
-        avg_cpu = results.get("avg_cpu", 0)
-        avg_ram = results.get("avg_ram", 0)
+        usage = sampler.window(start_request_time, end_time)
+        logging.info(f"Während der Anfrage - {format_usage(usage)}")
 
-        return f"{model_processing_time}s", response_text, f"Durchschnittliche CPU: {avg_cpu:.2f}%, RAM: {avg_ram:.2f}%"
+        return f"{model_processing_time}s", response_text, format_usage(usage)
 
-    except asyncio.TimeoutError:
+    except OllamaTimeout:
         return "⚠️ Timeout", "keine Antwort", "CPU/RAM nicht verfügbar"
 
 def extract_json_from_text(text):